@@ -9,12 +9,23 @@ HexoDash - 220x230 1.0.3
 2025.10.07 21:02:08
 """
 
-import os, sys, threading, subprocess, signal, tempfile, shutil, re, locale
+import time
+StartT = time.perf_counter()  # 启动计时起点（见 StartupTimer）
+
+import os, sys, threading, subprocess, signal, tempfile, shutil, re, locale, queue
 import tkinter as Tk
-from tkinter import messagebox, scrolledtext
+from tkinter import messagebox, filedialog
 from tkinter import font as tkfont
 from tkinter import ttk
-import time
+import codecs, json, shlex, unicodedata, stat, hashlib, fnmatch, select, struct
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+import gzip
+from array import array
+from datetime import datetime
+from collections import OrderedDict
+# scrolledtext、进程池、http.server 等第一帧用不到的模块在用到时才导入，见 StartupTimer
+
+AppVersion = "1.0.3"
 
 # =============== 可调常量（布局的像素/字体调整） ===============
 WinW, WinH       = 220, 230                     # 主窗口尺寸
@@ -49,6 +60,19 @@ InfoBtnSize      = 18                           # 尾部参数信息按钮尺寸
 
 BtnY, BtnW, BtnH = WinH - 36, 78, 26            # 底部按钮Y/宽/高
 BtnLeftX, BtnRightX = 14, WinW - 14 - BtnW      # 左右按钮X
+MoreBtnW         = 24                           # 中间“更多”菜单按钮宽
+MoreBtnX         = (WinW - MoreBtnW) // 2       # 中间“更多”菜单按钮X
+
+# 任务队列（有任务时主窗口向下展开）
+MaxConcurrentJobs = 3                           # 新建、预览等互不影响的任务最多同时运行几个
+QueueRowH        = 20                           # 队列每行高度
+QueueMaxRows     = 5                            # 最多显示几行（其余合并为“…另有 n 个”）
+StartupKeep      = 50                           # .hexodash/startup.jsonl 保留最近几次启动
+HistoryKeep      = 500                          # 运行历史保留最近几次（连同日志）
+HistoryPlotRuns  = 60                           # 生成耗时趋势图画最近几次
+HistoryPlotH     = 150                          # 趋势图高度
+MultiSite_W, MultiSite_H = 720, 520             # 多站点运行窗口
+ProfileMaxRows   = 2000                         # 性能分析表最多显示几行
 
 # 终端窗口（黑底 & 保留颜色码渲染）
 TermFontFamily     = "Lucida Console"           # 终端字体
@@ -58,6 +82,74 @@ TermDefaultFg      = "#E6E6E6"                  # 默认前景（浅灰）
 TermNew_W,   TermNew_H   = 220, 85              # 新建功能终端
 TermCombo_W, TermCombo_H = 400, 250             # 组合命令终端
 TermLive_W,  TermLive_H  = 400, 250             # 实时终端
+ReadChunkBytes     = 65536                      # 子进程输出单次读取上限（字节）
+TermFrameMs        = 40                         # 实时终端渲染帧间隔（毫秒）
+TermFrameMaxChars  = 200_000                    # 单帧最多渲染字符数（超出留到下一帧）
+TermStatsMs        = 500                        # 渲染统计刷新间隔（毫秒）
+AnsiMaxExtTags     = 512                        # 每个终端控件最多创建的 256色/真彩色 标签数
+TermScrollbackLines = 5000                      # 实时终端窗口内保留的最多行数（更早的输出只留在日志文件）
+FindChunkLines     = 20000                      # 查找时每次从日志读多少行（读完一块就刷新一次结果）
+FindDebounceMs     = 150                        # 查找框停止输入多久后开始检索
+FindHitBg, FindCurBg = "#5c4a00", "#d19a00"      # 可见命中 / 当前命中的底色
+
+# 常驻 Hexo 进程
+WorkerScript       = "HexoWorker.js"            # 随程序打包的 Node 端脚本
+WorkerCommands     = {"new": "new", "n": "new", "clean": "clean",
+                      "generate": "generate", "g": "generate", "deploy": "deploy", "d": "deploy"}
+WorkerGlobalOpts   = {"--debug", "--safe", "--silent", "--draft", "--drafts"}   # 需在启动 Hexo 时给出的参数
+WorkerGlobalValOpts = {"--config", "--output"}                                  # 同上，带值
+
+# 原生清理
+TrashWorkers       = 8                          # 后台删除 public 的线程数
+TrashReportSec     = 0.3                        # 后台删除进度刷新间隔（秒）
+
+# 改动检测
+StateDirName       = ".hexodash"                # 站点根目录下的 HexoDash 状态目录（清单、缓存）
+ScanWorkers        = 8                          # 扫描/哈希文件树的线程数
+ManifestShowFiles  = 10                         # 决策时最多列出的触发文件数
+ConfigPatterns     = ("_config*.yml", "_config*.yaml", "package.json", "package-lock.json")
+
+# 逐步耗时
+TimelineH          = 16                         # 实时终端顶部时间线高度
+TimelineColors     = {"new": "#23D18B", "clean": "#E5E510", "generate": "#3B8EEA",
+                      "deploy": "#D670D6", "server": "#29B8DB"}
+
+# 原生预览
+ServeDefaultPort   = 4000                       # 与 hexo server 默认一致
+ServeDefaultHost   = "0.0.0.0"
+ServeCacheBytes    = 64 * 2**20                 # 内存缓存总量上限（LRU）
+ServeCacheFileMax  = 1 * 2**20                  # 超过此大小的文件不进缓存
+ServeStatsSec      = 1.0                        # 终端底栏请求统计刷新间隔（秒）
+
+# 文件监听（代替 hexo generate --watch）
+WatchDebounceMs    = 300                        # 最后一个事件之后安静多久才算一批改动结束（尾部参数 --debounce 可改）
+WatchMaxWaitSec    = 5.0                        # 持续有事件时最多攒多久就开始生成
+WatchPollSec       = 1.0                        # 轮询模式的扫描间隔（秒）
+WatchSkipDirs      = {"node_modules", ".git"}
+WatchIgnore        = ("*.swp", "*.swo", "*.swx", "*~", ".#*", "#*#", "*.tmp", "*.temp", "4913", ".DS_Store",
+                      "Thumbs.db", "~$*", ".~*", "*.crdownload", "*.kate-swp", "___jb_*___", ".*.sw?")
+
+# 文章索引
+IndexExts          = (".md", ".markdown", ".html")   # source/_posts、_drafts 里参与索引的文件
+IndexHeadBytes     = 16384                      # 读取文件开头多少字节来找 front matter
+IndexProcessMin    = 2000                       # 待解析文件超过这个数用进程池（否则线程池）
+IndexSuggestRows   = 8                          # 边输入边搜索时最多显示几条
+
+# 生成后处理
+PostExts           = (".html", ".css", ".js", ".xml", ".json", ".svg")   # 参与预压缩的文件类型
+CompressMinBytes   = 256                        # 更小的文件不值得压缩
+CompressBatch      = 32                         # 每个进程任务处理的文件数
+SearchProcessMin   = 200                        # 待提取页面超过这个数用进程池
+SearchSkipDirs     = ("archives", "tags", "categories", "page")   # 列表页，不进搜索索引
+MinifyExts         = (".html", ".css", ".js")   # 参与压缩代码的文件类型（*.min.* 跳过）
+MinifyBatch        = 16                         # 每个进程任务处理的文件数
+MinifyKeepCache    = 2                          # 压缩结果缓存保留最近几次运行用到的条目
+MinifyRules        = b"rules-4"                 # 压缩规则版本：改了规则就换一个，按输入哈希存的旧结果随之作废
+
+# 进程管理
+StopStages         = (("INT", 2.0), ("TERM", 1.0), ("KILL", 1.0))   # 逐级升级：信号与每级最多等待秒数
+ProcScanSec        = 1.0                        # 给运行中进程树拍快照的间隔（秒）
+ProcPollSec        = 0.05                       # 停止时检查进程是否已退出的间隔（秒）
 
 # =============== 图标资源路径 ===============
 def ResourcePath(rel_path: str) -> str:
@@ -67,16 +159,92 @@ def ResourcePath(rel_path: str) -> str:
         base = os.path.abspath(".")
     return os.path.join(base, rel_path)
 
+_IconCache = {}  # 图标名 -> 可用的 .ico 路径；None 表示这个平台设置不了，别再试
+
 def SetupIcon(win: Tk.Misc, ico_name: str = "Hexo.ico"):
+    """每个进程只解析、复制一次图标，之后的窗口直接复用"""
+    if ico_name not in _IconCache:
+        try:
+            src = ResourcePath(ico_name)
+            dst = os.path.join(tempfile.gettempdir(), f"HexoDash_icon_{os.getpid()}.ico")
+            if not os.path.exists(dst) or os.path.getmtime(src) > os.path.getmtime(dst):
+                shutil.copy2(src, dst)
+            _IconCache[ico_name] = dst
+        except Exception as e:
+            print(f"警告：设置窗口图标失败，将使用默认图标。原因：{e}")
+            _IconCache[ico_name] = None
+    dst = _IconCache[ico_name]
+    if dst is None: return
     try:
-        src = ResourcePath(ico_name)
-        tmp = tempfile.gettempdir()
-        dst = os.path.join(tmp, f"HexoDash_icon_{os.getpid()}.ico")
-        if not os.path.exists(dst) or os.path.getmtime(src) > os.path.getmtime(dst):
-            shutil.copy2(src, dst)
         win.iconbitmap(dst)
     except Exception as e:
         print(f"警告：设置窗口图标失败，将使用默认图标。原因：{e}")
+        _IconCache[ico_name] = None
+
+_FontCache = {}  # (Tk 根对象 id, 字体参数) -> (根对象, tkfont.Font)
+
+def CachedFont(win: Tk.Misc, **spec) -> tkfont.Font:
+    """同一个 Tk 根窗口下相同参数的字体只创建一次（弹窗、日志视图每次打开都要用）"""
+    root = win._root()
+    key = (id(root), tuple(sorted(spec.items())))
+    hit = _FontCache.get(key)
+    if hit is None:
+        hit = _FontCache[key] = (root, tkfont.Font(root=root, **spec))
+    return hit[1]
+
+class StartupTimer:
+    """启动各阶段耗时：boot（进程创建到 Python 开始执行，onefile 解包就在这里，需要 psutil）、import、ui、
+       first_paint（主循环跑起来后的第一个空闲回调）、ready（文章索引也加载完）。
+       每次启动追加一行到 .hexodash/startup.jsonl，只保留最近 StartupKeep 次"""
+    def __init__(self):
+        self.Marks = {"import": time.perf_counter() - StartT}
+        self.Time = datetime.now().isoformat(timespec="seconds")
+        self.Boot = None
+        try:
+            import psutil  # 可选依赖
+            self.Boot = max(0.0, time.time() - (time.perf_counter() - StartT) - psutil.Process().create_time())
+        except Exception:
+            pass
+        self.Saved = False
+
+    def Mark(self, phase: str):
+        if phase not in self.Marks: self.Marks[phase] = time.perf_counter() - StartT
+
+    @staticmethod
+    def BuildKind() -> str:
+        """source / onefile（每次启动解包到临时目录）/ onedir（资源就在 exe 旁边）"""
+        if not getattr(sys, "frozen", False): return "source"
+        exe_dir = os.path.dirname(os.path.abspath(sys.executable))
+        return "onedir" if os.path.abspath(getattr(sys, "_MEIPASS", exe_dir)).startswith(exe_dir) else "onefile"
+
+    def Record(self) -> dict:
+        rec = {"time": self.Time, "version": AppVersion, "build": self.BuildKind()}
+        if self.Boot is not None: rec["boot_ms"] = round(self.Boot * 1000, 1)
+        for k, v in self.Marks.items(): rec[k + "_ms"] = round(v * 1000, 1)
+        return rec
+
+    def Save(self):
+        if self.Saved: return
+        self.Saved = True
+        path = StatePath(BaseDir, "startup.jsonl")
+        try:
+            with open(path, encoding="utf-8") as f: lines = f.read().splitlines()[-(StartupKeep - 1):]
+        except OSError:
+            lines = []
+        lines.append(json.dumps(self.Record(), ensure_ascii=False))
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f: f.write("\n".join(lines) + "\n")
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def History() -> list:
+        try:
+            with open(StatePath(BaseDir, "startup.jsonl"), encoding="utf-8") as f:
+                return [json.loads(l) for l in f if l.strip()]
+        except (OSError, ValueError):
+            return []
 
 # =============== 子进程（静默） ===============
 def AppDir() -> str:
@@ -84,7 +252,7 @@ def AppDir() -> str:
     except Exception: return os.getcwd()
 BaseDir = AppDir()
 
-def SilentPopen(cmd: str, new_group: bool = False) -> subprocess.Popen:
+def SilentPopen(cmd: str, new_group: bool = False, stdin=None, cwd: str = None) -> subprocess.Popen:
     """静默启动一个子进程（不显示终端窗口）。支持在 Linux/macOS 上创建新的进程组以便终止。"""
     creation_flags = 0
     startupinfo = None
@@ -99,7 +267,7 @@ def SilentPopen(cmd: str, new_group: bool = False) -> subprocess.Popen:
         if new_group:
             preexec_fn = os.setsid
     return subprocess.Popen(
-        cmd, shell=True, cwd=BaseDir,
+        cmd, shell=True, cwd=cwd or BaseDir, stdin=stdin,
         stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
         startupinfo=startupinfo, creationflags=creation_flags, preexec_fn=preexec_fn
     )
@@ -115,13 +283,320 @@ def _decode_best(b: bytes) -> str:
             pass
     return b.decode("utf-8", errors="replace")
 
+def _detect_encoding(sample: bytes, final: bool = True):
+    """按 _decode_best 同样的优先级判定一次编码；样本以不完整的 UTF-8 字符结尾、还分不清时返回 None"""
+    if sample.startswith(codecs.BOM_UTF8): return "utf-8-sig"
+    try:
+        dec = codecs.getincrementaldecoder("utf-8")("strict")
+        dec.decode(sample, False)
+        return "utf-8" if final or not dec.getstate()[0] else None
+    except UnicodeDecodeError:
+        pass
+    try:
+        codecs.getincrementaldecoder("gb18030")("strict").decode(sample, False)
+        return "gb18030"
+    except UnicodeDecodeError:
+        return locale.getpreferredencoding(False) or "utf-8"
+
+class StreamDecoder:
+    """单个输出流的增量解码器：纯 ASCII 阶段直接解码，首次出现非 ASCII 字节时判定一次编码，
+       之后走 codecs 增量解码器，跨块截断的 UTF-8/GBK 多字节字符留到下一块再拼；\r\n 统一为 \n。"""
+    def __init__(self):
+        self.Encoding = None
+        self.Dec = None
+        self.Head = b""  # 判定编码前暂存的字节
+        self.CR = False  # 上一块以 \r 结尾，等下一块确认是不是 \r\n
+
+    def Decode(self, b: bytes, final: bool = False) -> str:
+        if self.Dec is None:
+            b, self.Head = self.Head + b, b""
+            if b.isascii() and not final:
+                return self._Newlines(b.decode("ascii"), final)
+            self.Encoding = _detect_encoding(b, final)
+            if self.Encoding is None:
+                self.Head = b
+                return ""
+            self.Dec = codecs.getincrementaldecoder(self.Encoding)("replace")
+        return self._Newlines(self.Dec.decode(b, final), final)
+
+    def _Newlines(self, s: str, final: bool) -> str:
+        if self.CR:
+            s, self.CR = "\r" + s, False
+        if s.endswith("\r") and not final:
+            s, self.CR = s[:-1], True
+        return s.replace("\r\n", "\n") if "\r" in s else s
+
 def RunShell(cmd: str) -> tuple[int, str]:
     p = SilentPopen(cmd)
     out, _ = p.communicate()
     return p.returncode, _decode_best(out or b"")
 
+def WaitUsage(proc: subprocess.Popen) -> tuple[int, dict]:
+    """等待子进程结束并取资源用量 {"cpu": 秒, "rss_mb": 峰值}：
+       POSIX 用 wait4（含它等待过的子孙进程，RSS 为其中最大的单个进程）；
+       其它平台装了 psutil 时按 0.2 秒采样整棵进程树（RSS 为树的合计峰值），否则只返回退出码。"""
+    if hasattr(os, "wait4"):
+        try:
+            _, status, ru = os.wait4(proc.pid, 0)
+        except ChildProcessError:  # 已被 poll() 回收
+            return proc.wait(), {}
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        rss = ru.ru_maxrss / (2**20 if sys.platform == "darwin" else 1024)
+        return proc.returncode, {"cpu": ru.ru_utime + ru.ru_stime, "rss_mb": rss}
+    try:
+        import psutil  # 可选依赖
+        root = psutil.Process(proc.pid)
+    except Exception:
+        return proc.wait(), {}
+    peak, cpu = 0, {}
+    while proc.poll() is None:
+        try:
+            procs = [root] + root.children(recursive=True)
+            peak = max(peak, sum(p.memory_info().rss for p in procs))
+            for p in procs:
+                t = p.cpu_times(); cpu[p.pid] = t.user + t.system
+        except Exception:
+            pass
+        time.sleep(0.2)
+    return proc.returncode, {"cpu": sum(cpu.values()), "rss_mb": peak / 2**20}
+
+# =============== 进程管理 ===============
+def _proc_stat(pid: int):
+    """(ppid, pgid, 启动时刻, 是否僵尸)，进程不存在时返回 None；启动时刻用来识别 PID 复用。
+       Linux 读 /proc，其它平台用 psutil（可选），都没有时只能判断 POSIX 进程是否存在。"""
+    if sys.platform.startswith("linux"):
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f: data = f.read()
+        except OSError:
+            return None
+        fields = data[data.rindex(b")") + 2:].split()
+        return int(fields[1]), int(fields[2]), int(fields[19]), fields[0] in (b"Z", b"X")
+    try:
+        import psutil  # 可选依赖
+        p = psutil.Process(pid)
+        return p.ppid(), (os.getpgid(pid) if os.name != "nt" else None), p.create_time(), p.status() == psutil.STATUS_ZOMBIE
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    if os.name != "nt":
+        try: return None, os.getpgid(pid), None, False
+        except OSError: return None
+    return None
+
+def _proc_table() -> dict:
+    """全部进程 {pid: (ppid, pgid, 启动时刻, 是否僵尸)}；拿不到时为空（只靠进程组 / taskkill /T）"""
+    table = {}
+    if sys.platform.startswith("linux"):
+        for name in os.listdir("/proc"):
+            if name.isdigit():
+                st = _proc_stat(int(name))
+                if st is not None: table[int(name)] = st
+        return table
+    try:
+        import psutil  # 可选依赖
+        for p in psutil.process_iter(["ppid", "create_time", "status"]):
+            try: pgid = os.getpgid(p.pid) if os.name != "nt" else None
+            except OSError: continue
+            table[p.pid] = (p.info["ppid"], pgid, p.info["create_time"], p.info["status"] == psutil.STATUS_ZOMBIE)
+    except Exception:
+        pass
+    return table
+
+def _descendants(table: dict, root: int) -> dict:
+    """root 的所有子孙 {pid: 启动时刻}；POSIX 下同进程组（pgid == root）的也算"""
+    kids = {}
+    for pid, st in table.items():
+        kids.setdefault(st[0], []).append(pid)
+    found, todo = {}, [root]
+    while todo:
+        for pid in kids.get(todo.pop(), ()):
+            if pid not in found:
+                found[pid] = table[pid][2]; todo.append(pid)
+    for pid, st in table.items():
+        if st[1] == root and pid != root: found.setdefault(pid, st[2])
+    return found
+
+def _pid_alive(pid: int, start) -> bool:
+    st = _proc_stat(pid)
+    return st is not None and not st[3] and (start is None or st[2] is None or st[2] == start)
+
+class ProcSupervisor:
+    """登记 HexoDash 启动的子进程并跟踪整棵进程树。结束进程在后台线程里逐级升级
+       （POSIX：进程组 SIGINT→SIGTERM→SIGKILL；Windows：CTRL_BREAK→taskkill /T /F），界面线程从不等待。
+       on_state("stopping"/"stopped", info) 通知界面，info["stages"] 是每一级的用时与是否已结束。
+       进程退出后仍存活的子孙（脱离父进程的 node 等）视为孤儿，窗口关闭时由 Reap 结束。"""
+    def __init__(self):
+        self.Lock = threading.Lock()
+        self.Entries = {}     # pid -> 记录
+        self.History = []     # 最近的停止报告
+        self.Scanner = None
+
+    def Track(self, proc: subprocess.Popen, cmd: str = "", owner=None) -> subprocess.Popen:
+        with self.Lock: self.Add(proc, cmd, owner)
+        return proc
+
+    def Add(self, proc: subprocess.Popen, cmd: str, owner) -> dict:
+        """（持锁调用）新建记录，必要时启动快照线程"""
+        e = self.Entries[proc.pid] = {"proc": proc, "cmd": cmd, "owner": owner, "tree": {},
+                                      "exited": threading.Event(), "waited": False,
+                                      "stopper": None, "callbacks": []}
+        if self.Scanner is None:
+            self.Scanner = threading.Thread(target=self.ScanLoop, daemon=True)
+            self.Scanner.start()
+        return e
+
+    def Entry(self, proc: subprocess.Popen):
+        e = self.Entries.get(proc.pid)
+        return e if e is not None and e["proc"] is proc else None
+
+    def ScanLoop(self):
+        """定期记下每个运行中进程的子孙：父进程一退出孙进程就被过继，只有事先记下才找得回来"""
+        while True:
+            with self.Lock:
+                live = [e for e in self.Entries.values() if not e["exited"].is_set()]
+                if not live:
+                    self.Scanner = None
+                    return
+            table = _proc_table()
+            for e in live: self.Refresh(e, table)
+            time.sleep(ProcScanSec)
+
+    def Refresh(self, e: dict, table: dict = None):
+        tree = _descendants(_proc_table() if table is None else table, e["proc"].pid)
+        with self.Lock: e["tree"].update(tree)
+
+    def Exited(self, e: dict) -> bool:
+        if e["exited"].is_set(): return True
+        return not e["waited"] and e["proc"].poll() is not None
+
+    def Survivors(self, e: dict) -> dict:
+        with self.Lock: tree = list(e["tree"].items())
+        return {pid: start for pid, start in tree if _pid_alive(pid, start)}
+
+    def Gone(self, e: dict) -> bool:
+        return self.Exited(e) and not self.Survivors(e)
+
+    def Drop(self, e: dict):
+        with self.Lock:
+            if self.Entries.get(e["proc"].pid) is e: del self.Entries[e["proc"].pid]
+
+    def Wait(self, proc: subprocess.Popen) -> tuple[int, dict]:
+        """（后台线程）代替 proc.wait()：等待结束并取资源用量（WaitUsage），同时通知停止线程"""
+        e = self.Entry(proc)
+        if e is None: return WaitUsage(proc)
+        e["waited"] = True
+        try:
+            return WaitUsage(proc)
+        finally:
+            self.Refresh(e)
+            e["exited"].set()
+            if e["stopper"] is None and not self.Survivors(e): self.Drop(e)
+
+    def Join(self, proc: subprocess.Popen, timeout: float) -> bool:
+        """等待进程自行退出（不发信号），超时返回 False"""
+        e = self.Entry(proc)
+        if e is None: return proc.poll() is not None
+        if e["waited"]: return e["exited"].wait(timeout)
+        try: proc.wait(timeout=timeout); return True
+        except subprocess.TimeoutExpired: return False
+
+    def Stop(self, proc: subprocess.Popen, on_state=None) -> threading.Thread:
+        """不阻塞：在后台线程结束 proc 及其整棵进程树；对同一进程重复调用只会追加回调"""
+        with self.Lock:
+            e = self.Entries.get(proc.pid)
+            if e is None or e["proc"] is not proc:
+                e = self.Add(proc, "", None)
+            if on_state is not None: e["callbacks"].append(on_state)
+            if e["stopper"] is not None: return e["stopper"]
+            e["stopper"] = t = threading.Thread(target=self.StopLoop, args=(e,), daemon=True)
+        t.start()
+        return t
+
+    def Signal(self, e: dict, sig: str):
+        proc, survivors = e["proc"], self.Survivors(e)
+        if os.name != "nt":
+            try: os.killpg(proc.pid, getattr(signal, "SIG" + sig))
+            except OSError: pass
+            for pid in survivors:
+                try: os.kill(pid, getattr(signal, "SIG" + sig))
+                except OSError: pass
+            return
+        if sig == "INT":  # 同进程组收到 Ctrl+Break，给 node 一个自行退出的机会
+            try: os.kill(proc.pid, signal.CTRL_BREAK_EVENT)
+            except Exception: pass
+            return
+        pids = ([] if self.Exited(e) else [proc.pid]) + list(survivors)
+        for pid in pids:
+            try:
+                subprocess.run(f"taskkill /PID {pid} /T /F", shell=True, cwd=BaseDir,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+            except Exception:
+                pass
+        try: proc.terminate()
+        except Exception: pass
+
+    def StopLoop(self, e: dict):
+        proc, t0 = e["proc"], time.perf_counter()
+        orphans = self.Exited(e)
+        self.Notify(e, "stopping", {"pid": proc.pid, "cmd": e["cmd"], "orphans": orphans})
+        self.Refresh(e)
+        stages = []
+        for sig, timeout in StopStages:
+            if self.Gone(e): break
+            if os.name == "nt" and sig == "KILL": break  # taskkill /F 已在 TERM 这一级
+            t = time.perf_counter()
+            self.Signal(e, sig)
+            while not self.Gone(e) and time.perf_counter() - t < timeout:
+                time.sleep(ProcPollSec)
+            stages.append({"stage": "SIG" + sig, "secs": round(time.perf_counter() - t, 3), "done": self.Gone(e)})
+        left = self.Survivors(e)
+        info = {"pid": proc.pid, "cmd": e["cmd"], "orphans": orphans, "stages": stages,
+                "total": round(time.perf_counter() - t0, 3), "survivors": sorted(left)}
+        with self.Lock:
+            self.History = (self.History + [info])[-50:]
+            e["stopper"] = None
+        if self.Exited(e) and not left: self.Drop(e)
+        self.Notify(e, "stopped", info)
+
+    def Notify(self, e: dict, state: str, info: dict):
+        for cb in list(e["callbacks"]):
+            try: cb(state, info)
+            except Exception: pass
+
+    def Reap(self, owner, on_state=None) -> int:
+        """（不阻塞）结束 owner 名下已退出进程留下的孤儿，返回发现的孤儿进程树数目"""
+        with self.Lock: mine = [e for e in self.Entries.values() if e["owner"] is owner]
+        n = 0
+        for e in mine:
+            if not self.Exited(e) or e["stopper"] is not None: continue
+            if self.Survivors(e):
+                n += 1; self.Stop(e["proc"], on_state)
+            else:
+                self.Drop(e)
+        return n
+
+    def Shutdown(self, timeout: float = 5.0):
+        """程序退出时：结束所有登记的进程树（含孤儿），最多等 timeout 秒"""
+        with self.Lock: procs = [e["proc"] for e in self.Entries.values()]
+        threads = [self.Stop(p) for p in procs]
+        deadline = time.perf_counter() + timeout
+        for t in threads: t.join(max(0, deadline - time.perf_counter()))
+
+def FormatStop(info: dict) -> str:
+    """停止报告的一行摘要，如 "SIGINT 0.12s → 已结束" """
+    parts = [f"{x['stage']} {x['secs']:.2f}s" for x in info.get("stages", [])]
+    tail = f"仍有 {len(info['survivors'])} 个进程未结束" if info.get("survivors") else "已结束"
+    return " → ".join(parts + [tail])
+
+Supervisor = ProcSupervisor()
+
 # =============== ANSI颜色渲染 ===============
-_ansi_pat = re.compile(r'\x1b\[([0-9;]*)m')
+# 完整的转义序列：CSI（含光标移动/擦除）、OSC（窗口标题等）、其它两字节转义
+_ansi_pat = re.compile(r'\x1b\[([0-9;?]*)([@-~])|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[()*+][0-~]|\x1b[@-Z\\^_]')
+# 被读块截断的序列前缀（留到下次 feed 再拼）；OSC 可能正好断在结尾的 ESC \ 中间
+_ansi_partial = re.compile(r'\x1b(?:\[[0-9;?]*|\][^\x07\x1b]*\x1b?|[()*+])?')
 
 ANSI_FG = {
     30:"#000000", 31:"#CD3131", 32:"#0DBC79", 33:"#E5E510",
@@ -144,6 +619,7 @@ def _ensure_tag(txt: Tk.Text, name: str, **cfg):
     txt.tag_config(name, **cfg)
 
 def setup_ansi_tags(txt: Tk.Text):
+    """基础 16 色标签立即创建；256色/真彩色标签由 ensure_ext_tag 按需创建"""
     txt.configure(bg=TermBg, fg=TermDefaultFg,
                   insertbackground=TermDefaultFg,
                   font=(TermFontFamily, TermFontSize))
@@ -155,57 +631,467 @@ def setup_ansi_tags(txt: Tk.Text):
         _ensure_tag(txt, f"fg_{code}", foreground=col)
     for code, col in ANSI_BG.items():
         _ensure_tag(txt, f"bg_{code}", background=col)
+    txt.AnsiExtTags = set()  # 已创建的扩展颜色标签
+
+def ensure_ext_tag(txt: Tk.Text, kind: str, rgb: tuple[int, int, int]) -> str:
+    """返回扩展颜色标签名（kind 为 fg/bg），超过 AnsiMaxExtTags 后退回最接近的基础色"""
+    name = f"{kind}x_{rgb[0]:02x}{rgb[1]:02x}{rgb[2]:02x}"
+    made = getattr(txt, "AnsiExtTags", None)
+    if made is None: made = txt.AnsiExtTags = set()
+    if name in made: return name
+    if len(made) >= AnsiMaxExtTags:
+        return _nearest_basic(kind, rgb)
+    made.add(name)
+    _ensure_tag(txt, name, **{"foreground" if kind == "fg" else "background": f"#{name[-6:]}"})
+    return name
+
+def _hex_rgb(col: str) -> tuple[int, int, int]:
+    return int(col[1:3], 16), int(col[3:5], 16), int(col[5:7], 16)
+
+def _nearest_basic(kind: str, rgb: tuple[int, int, int]) -> str:
+    table = ANSI_FG if kind == "fg" else ANSI_BG
+    code = min(table, key=lambda c: sum((x - y) ** 2 for x, y in zip(_hex_rgb(table[c]), rgb)))
+    return f"{kind}_{code}"
+
+def _xterm_rgb(n: int) -> tuple[int, int, int]:
+    """xterm 256 色号转 RGB"""
+    if n < 8:  return _hex_rgb(ANSI_FG[30 + n])
+    if n < 16: return _hex_rgb(ANSI_FG[82 + n])
+    if n < 232:
+        n -= 16
+        lv = (0, 95, 135, 175, 215, 255)
+        return lv[n // 36], lv[n // 6 % 6], lv[n % 6]
+    g = 8 + (n - 232) * 10
+    return g, g, g
+
+class AnsiParser:
+    """流式 ANSI 解析器：跨 Feed() 保留被截断的转义序列（流结束时 final=True 丢弃残留的半截序列），
+       按样式状态缓存标签元组，支持 256色/真彩色，丢弃光标移动/擦除等非 SGR 序列。"""
+    def __init__(self, txt: Tk.Text):
+        self.Txt = txt
+        self.Reset()
+        self.TagCache = {}  # (fg, bg, bold, ul) -> 标签元组
+        self.SgrCache = {}  # (fg, bg, bold, ul, 参数) -> 应用 SGR 后的 (fg, bg, bold, ul)
+
+    def Reset(self):
+        self.Fg, self.Bg, self.Bold, self.Ul = "fg_default", "bg_default", False, False
+        self.Pending = ""
+
+    def Tags(self) -> tuple:
+        key = (self.Fg, self.Bg, self.Bold, self.Ul)
+        tags = self.TagCache.get(key)
+        if tags is None:
+            tags = (self.Fg, self.Bg) + (("bold_on",) if self.Bold else ()) + (("ul_on",) if self.Ul else ())
+            self.TagCache[key] = tags
+        return tags
+
+    def Feed(self, s: str, final: bool = False) -> list[tuple[str, tuple]]:
+        """解析一段输出，返回相邻同样式已合并的 (文本, 标签) 段"""
+        if self.Pending:
+            s, self.Pending = self.Pending + s, ""
+        if "\x1b" not in s:  # 快速路径：无转义
+            return [(s, self.Tags())] if s else []
+        runs, buf, tags, pos = [], [], self.Tags(), 0
+        for m in _ansi_pat.finditer(s):
+            start = m.start()
+            if start > pos: buf.append(s[pos:start])
+            pos = m.end()
+            if m.group(2) != "m": continue
+            key = (self.Fg, self.Bg, self.Bold, self.Ul, m.group(1))
+            st = self.SgrCache.get(key)
+            if st is None:
+                self.Sgr(key[4])
+                st = self.SgrCache[key] = (self.Fg, self.Bg, self.Bold, self.Ul)
+            else:
+                self.Fg, self.Bg, self.Bold, self.Ul = st
+            new = self.Tags()
+            if new is not tags:
+                if buf: runs.append(("".join(buf), tags)); buf = []
+                tags = new
+        rest = s[pos:]
+        for i in (rest.rfind("\x1b]"), rest.rfind("\x1b")):  # 截断的 OSC（末尾可能还有半个 ESC \）；截断的 CSI/两字节转义
+            if i != -1 and len(rest) - i < 256 and _ansi_partial.fullmatch(rest, i):
+                rest = rest[:i]
+                if not final: self.Pending = s[pos + i:]  # 结束时不会再有后半截，直接丢弃
+                break
+        if rest: buf.append(rest)
+        if buf: runs.append(("".join(buf), tags))
+        return runs
+
+    def Sgr(self, params: str):
+        ps = [int(x) if x.isdigit() else 0 for x in params.split(";")] if params else [0]
+        i, n = 0, len(ps)
+        while i < n:
+            p = ps[i]
+            if p == 0: self.Reset()
+            elif p == 1: self.Bold = True
+            elif p == 22: self.Bold = False
+            elif p == 4: self.Ul = True
+            elif p == 24: self.Ul = False
+            elif p in ANSI_FG: self.Fg = f"fg_{p}"
+            elif p in ANSI_BG: self.Bg = f"bg_{p}"
+            elif p == 39: self.Fg = "fg_default"
+            elif p == 49: self.Bg = "bg_default"
+            elif p in (38, 48) and i + 1 < n:
+                kind, rgb = ("fg" if p == 38 else "bg"), None
+                if ps[i + 1] == 5 and i + 2 < n:
+                    rgb = _xterm_rgb(ps[i + 2] & 0xFF); i += 2
+                elif ps[i + 1] == 2 and i + 4 < n:
+                    rgb = tuple(min(255, x) for x in ps[i + 2:i + 5]); i += 4
+                else:
+                    i += 1
+                if rgb is not None:
+                    tag = ensure_ext_tag(self.Txt, kind, rgb)
+                    if kind == "fg": self.Fg = tag
+                    else: self.Bg = tag
+            i += 1
+
+def insert_runs(txt: Tk.Text, runs: list[tuple[str, tuple]]):
+    """一次 Tk 调用插入全部段（Text.insert 支持 文本/标签 成对传入）"""
+    if not runs: return
+    args = []
+    for seg, tags in runs:
+        args += (seg, tags)
+    txt.insert("end", *args)
+
+def insert_ansi(txt: Tk.Text, s: str, ansi: AnsiParser, final: bool = False):
+    """final：s 之后不会再有输出（一次性渲染整段文本）"""
+    insert_runs(txt, ansi.Feed(s, final))
 
-def insert_ansi(txt: Tk.Text, s: str, st: dict):
-    pos = 0
-    for m in _ansi_pat.finditer(s):
-        if m.start() > pos:
-            seg = s[pos:m.start()]
-            tags = [st["fg"], st["bg"]]
-            if st["bold"]: tags.append("bold_on")
-            if st["ul"]:   tags.append("ul_on")
-            txt.insert("end", seg, tuple(tags))
-        params = m.group(1)
-        if params == "" or params == "0":
-            st.update(fg="fg_default", bg="bg_default", bold=False, ul=False)
+# =============== 运行日志（落盘 + 懒加载） ===============
+class LogStore:
+    """运行输出存储：全部写入临时文件并维护行首偏移索引，内存里只留索引。
+       支持按行号懒读取、分块流式读取；Close() 后删除文件。
+       单独的 \r（进度条帧）与终端里一样覆盖当前行，只保留最后一帧。"""
+    def __init__(self):
+        fd, self.Path = tempfile.mkstemp(prefix="HexoDash_log_", suffix=".log")
+        self.F = os.fdopen(fd, "w+b")
+        self.Lock = threading.Lock()
+        self.Offsets = array("q", [0])  # 每行起始字节偏移
+        self.Size = 0
+        self.Refs = 1                     # Retain() 加一，Close() 减到 0 才真正删除
+
+    def Append(self, s: str):
+        with self.Lock:
+            if self.F.closed: return
+            for k, seg in enumerate(s.split("\r")):
+                if k: self.Size = self.Offsets[-1]  # 回到行首：丢掉还没换行的这一行
+                self._Write(seg.encode("utf-8", "replace"))
+
+    def _Write(self, b: bytes):
+        self.F.seek(self.Size); self.F.write(b)
+        i = b.find(b"\n")
+        while i != -1:
+            self.Offsets.append(self.Size + i + 1)
+            i = b.find(b"\n", i + 1)
+        self.Size += len(b)
+
+    def LineCount(self) -> int:
+        with self.Lock:
+            return len(self.Offsets) - (1 if self.Offsets[-1] == self.Size else 0)
+
+    def CompleteLines(self) -> int:
+        """已经以换行结束的行数（最后一行可能还在写）"""
+        with self.Lock:
+            return len(self.Offsets) - 1
+
+    def ReadLines(self, start: int, count: int) -> str:
+        with self.Lock:
+            n = len(self.Offsets)
+            if self.F.closed or start >= n: return ""
+            a = self.Offsets[start]
+            b = self.Offsets[start + count] if start + count < n else self.Size
+            self.F.seek(a)
+            return self.F.read(b - a).decode("utf-8", "replace")
+
+    def IterBytes(self, size: int = 1 << 20):
+        """按块读出原始字节（UTF-8）"""
+        pos = 0
+        while True:
+            with self.Lock:
+                if self.F.closed: return
+                self.F.seek(pos); b = self.F.read(min(size, self.Size - pos))
+            if not b: break
+            pos += len(b)
+            yield b
+
+    def IterChunks(self, size: int = 1 << 20):
+        """按块流式读出全部内容（多字节字符跨块也能正确解码）"""
+        dec = codecs.getincrementaldecoder("utf-8")("replace")
+        for b in self.IterBytes(size):
+            s = dec.decode(b)
+            if s: yield s
+        tail = dec.decode(b"", final=True)
+        if tail: yield tail
+
+    def Text(self) -> str:
+        return "".join(self.IterChunks())
+
+    def Retain(self) -> "LogStore":
+        """另一个持有者（如运行历史的后台写入）也要读，用完各自 Close()"""
+        with self.Lock: self.Refs += 1
+        return self
+
+    def Close(self):
+        with self.Lock:
+            self.Refs -= 1
+            if self.Refs > 0: return
+            try: self.F.close()
+            except Exception: pass
+        try: os.remove(self.Path)
+        except Exception: pass
+
+class LogView:
+    """只读日志视图：只渲染可见窗口内的行，滚动条映射到 LogStore 的总行数"""
+    def __init__(self, master: Tk.Misc, log: LogStore):
+        self.Log, self.Top = log, 0
+        self.Only = None   # 只看错误/警告时为命中行号，视图只渲染这些行
+        self.Find = None   # FindBar
+        self.Sb = Tk.Scrollbar(master, command=self.OnScroll)
+        self.Sb.pack(side="right", fill="y")
+        self.Txt = Tk.Text(master, wrap="word")
+        self.Txt.pack(side="left", fill="both", expand=True)
+        setup_ansi_tags(self.Txt)
+        self.LineH = max(1, CachedFont(self.Txt, font=self.Txt.cget("font")).metrics("linespace"))
+        self.Txt.bind("<Configure>", lambda e: self.Render())
+        self.Txt.bind("<MouseWheel>", self.OnWheel)
+        self.Txt.bind("<Button-4>", self.OnWheel)
+        self.Txt.bind("<Button-5>", self.OnWheel)
+        self.Render()
+
+    def Rows(self) -> int:
+        return max(1, self.Txt.winfo_height() // self.LineH)
+
+    def Total(self) -> int:
+        return len(self.Only) if self.Only is not None else self.Log.LineCount()
+
+    def Render(self):
+        total, rows = self.Total(), self.Rows()
+        self.Top = max(0, min(self.Top, total - rows))
+        self.Txt.configure(state="normal")
+        self.Txt.delete("1.0", "end")
+        if self.Only is None:
+            text = self.Log.ReadLines(self.Top, rows)
         else:
-            for p in (int(x) if x else 0 for x in params.split(";")):
-                if p == 0: st.update(fg="fg_default", bg="bg_default", bold=False, ul=False)
-                elif p == 1: st["bold"] = True
-                elif p == 22: st["bold"] = False
-                elif p == 4: st["ul"] = True
-                elif p == 24: st["ul"] = False
-                elif p in ANSI_FG: st["fg"] = f"fg_{p}"
-                elif p in ANSI_BG: st["bg"] = f"bg_{p}"
-                elif p == 39: st["fg"] = "fg_default"
-                elif p == 49: st["bg"] = "bg_default"
-        pos = m.end()
-    if pos < len(s):
-        seg = s[pos:]
-        tags = [st["fg"], st["bg"]]
-        if st["bold"]: tags.append("bold_on")
-        if st["ul"]:   tags.append("ul_on")
-        txt.insert("end", seg, tuple(tags))
-
-def terminal_popup(parent: Tk.Misc, title: str, content: str, w: int, h: int):
-    """黑底、支持颜色码的结果弹窗（尺寸可传入）。"""
+            text = "".join(self.Log.ReadLines(n, 1) for n in self.Only[self.Top:self.Top + rows])
+        insert_ansi(self.Txt, text, AnsiParser(self.Txt), final=True)
+        self.Txt.configure(state="disabled")
+        if total: self.Sb.set(self.Top / total, min(1.0, (self.Top + rows) / total))
+        else: self.Sb.set(0.0, 1.0)
+        if self.Find is not None: self.Find.Mark()
+
+    def LineOf(self, ln: int) -> int:
+        """文本控件第 ln 行（从 1 起）对应的日志行号"""
+        i = self.Top + ln - 1
+        if self.Only is None: return i
+        return self.Only[i] if i < len(self.Only) else -1
+
+    def Goto(self, line: int) -> bool:
+        if self.Only is not None:
+            import bisect
+            line = bisect.bisect_left(self.Only, line)
+        self.Top = max(0, line - self.Rows() // 3)
+        self.Render()
+        return True
+
+    def Filter(self, hits):
+        """hits 为 None 时恢复完整视图"""
+        self.Only = hits
+        self.Render()
+
+    def OnScroll(self, *args):
+        if args[0] == "moveto":
+            self.Top = int(float(args[1]) * self.Total())
+        elif args[0] == "scroll":
+            self.Top += int(args[1]) * (self.Rows() if args[2] == "pages" else 1)
+        self.Render()
+
+    def OnWheel(self, e):
+        up = getattr(e, "num", 0) == 4 or getattr(e, "delta", 0) > 0
+        self.Top += -3 if up else 3
+        self.Render()
+        return "break"
+
+# =============== 查找 ===============
+_level_pat = re.compile(r"\b(ERROR|FATAL|WARN(?:ING)?)\b")
+
+class LogSearch:
+    """在 LogStore 上后台查找：按行首偏移索引分块读出、去掉颜色码后匹配，Hits 为命中行号（升序）。
+       日志只会追加，Poll() 只扫上次之后的新行（live 时只扫已经写完换行的行）；换条件后旧的扫描作废。
+       on_update() 在 UI 线程调用，Hits 也只在 UI 线程修改"""
+    def __init__(self, root: Tk.Misc, log: LogStore, on_update, live: bool):
+        self.Root, self.Log, self.OnUpdate, self.Live = root, log, on_update, live
+        self.Hits = array("q")
+        self.Pat, self.Levels = None, False
+        self.Gen, self.Scanned, self.Busy = 0, 0, False
+
+    @property
+    def Active(self) -> bool:
+        return self.Pat is not None or self.Levels
+
+    def Set(self, text: str, regex: bool, case: bool, levels: bool) -> str:
+        """换查找条件，返回正则错误（没有错误返回空串）"""
+        self.Gen += 1
+        self.Hits, self.Scanned, self.Busy = array("q"), 0, False
+        self.Pat, self.Levels, err = None, levels, ""
+        if text:
+            try:
+                self.Pat = re.compile(text if regex else re.escape(text), 0 if case else re.I)
+            except re.error as e:
+                err = f"正则有误：{e}"
+        self.Poll()
+        return err
+
+    def Poll(self):
+        if not self.Active or self.Busy: return
+        total = self.Log.CompleteLines() if self.Live else self.Log.LineCount()
+        if total <= self.Scanned: return
+        self.Busy = True
+        threading.Thread(target=self.Scan, args=(self.Gen, self.Scanned, total, self.Pat, self.Levels), daemon=True).start()
+
+    def Scan(self, gen: int, start: int, total: int, pat, levels: bool):
+        """（后台线程）扫描 [start, total) 行，每块结果交给 UI 线程合并"""
+        for a in range(start, total, FindChunkLines):
+            if gen != self.Gen: return
+            n = min(FindChunkLines, total - a)
+            found = array("q")
+            for i, ln in enumerate(self.Log.ReadLines(a, n).split("\n")[:n]):
+                ln = _ansi_pat.sub("", ln)
+                if levels and not _level_pat.search(ln): continue
+                if pat is not None and not pat.search(ln): continue
+                found.append(a + i)
+            self.Deliver(gen, found, a + n, a + n >= total)
+
+    def Deliver(self, gen: int, found, scanned: int, last: bool):
+        def Apply():
+            if gen != self.Gen: return
+            self.Hits.extend(found)
+            self.Scanned = scanned
+            if last: self.Busy = False
+            self.OnUpdate()
+            if last: self.Poll()  # 扫描期间又来了新行
+        try: self.Root.after(0, Apply)
+        except Exception: pass
+
+class FindBar:
+    """查找栏（Ctrl+F 打开，Esc 关闭）：输入后在后台检索整份日志，支持正则、区分大小写和“仅错误/警告”；
+       回车 / F3 下一个，Shift+回车 上一个。只给可见区域内的命中加高亮。
+       view 需提供 Txt、Goto(日志行号) -> 是否还在视图内、LineOf(文本行) -> 日志行号，可选 Filter(命中行号或 None)"""
+    def __init__(self, master: Tk.Misc, root: Tk.Misc, log: LogStore, view, live: bool, before: Tk.Misc = None):
+        self.View, self.Before, self.Cur, self._After = view, before, -1, None
+        self.Search = LogSearch(root, log, self.OnUpdate, live)
+        self.Frame = f = Tk.Frame(master)
+        self.Query = Tk.StringVar(f)
+        self.Regex, self.Case, self.Levels = Tk.BooleanVar(f, False), Tk.BooleanVar(f, False), Tk.BooleanVar(f, False)
+        self.Ent = ttk.Entry(f, textvariable=self.Query, width=18)
+        self.Ent.pack(side="left", fill="x", expand=True)
+        for text, var in ((".*", self.Regex), ("Aa", self.Case), ("仅错误/警告", self.Levels)):
+            Tk.Checkbutton(f, text=text, variable=var, command=self.OnChange).pack(side="left", padx=(4, 0))
+        Tk.Button(f, text="▲", width=2, command=lambda: self.Next(-1)).pack(side="left", padx=(4, 0))
+        Tk.Button(f, text="▼", width=2, command=lambda: self.Next(1)).pack(side="left")
+        Tk.Button(f, text="✕", width=2, command=self.Hide).pack(side="left", padx=(2, 0))
+        self.Count = Tk.Label(f, text="", fg="#6b7280", font=("Adobe Song Std L", 9), width=14, anchor="w")
+        self.Count.pack(side="left", padx=(6, 0))
+        self.Query.trace_add("write", self.OnChange)
+        self.Ent.bind("<Return>", lambda e: self.Next(1))
+        self.Ent.bind("<Shift-Return>", lambda e: self.Next(-1))
+        self.Ent.bind("<F3>", lambda e: self.Next(1))
+        self.Ent.bind("<Escape>", lambda e: self.Hide())
+        txt = view.Txt
+        txt.tag_configure("find", background=FindHitBg)
+        txt.tag_configure("find_cur", background=FindCurBg, foreground="#000000")
+
+    def Show(self, _=None):
+        if not self.Frame.winfo_ismapped():
+            self.Frame.pack(fill="x", padx=10, pady=(6, 0), before=self.Before)
+        self.Ent.focus_set(); self.Ent.select_range(0, "end")
+        return "break"
+
+    def Hide(self):
+        self.Frame.pack_forget()
+        self.Search.Set("", False, False, False)
+        self.Cur = -1
+        if hasattr(self.View, "Filter") and getattr(self.View, "Only", None) is not None: self.View.Filter(None)
+        self.Mark()
+        self.View.Txt.focus_set()
+        if hasattr(self.View, "FindDone"): self.View.FindDone()
+
+    def OnChange(self, *_):
+        if self._After is not None: self.Frame.after_cancel(self._After)
+        self._After = self.Frame.after(FindDebounceMs, self.Apply)
+
+    def Apply(self):
+        self._After = None
+        self.Cur = -1
+        err = self.Search.Set(self.Query.get(), self.Regex.get(), self.Case.get(), self.Levels.get())
+        if hasattr(self.View, "Filter"):
+            self.View.Filter(self.Search.Hits if self.Levels.get() and not err else None)
+        self.Count.configure(text=err or ("查找中…" if self.Search.Active else ""))
+        self.Mark()
+
+    def OnUpdate(self):
+        n = len(self.Search.Hits)
+        busy = "…" if self.Search.Busy else ""
+        self.Count.configure(text=f"{self.Cur + 1 if self.Cur >= 0 else 0}/{n}{busy}" if n or not busy else "查找中…")
+        if getattr(self.View, "Only", None) is not None: self.View.Filter(self.Search.Hits)
+        if self.Cur < 0 and n: self.Next(1)
+        else: self.Mark()
+
+    def Next(self, step: int):
+        hits = self.Search.Hits
+        if not hits: return "break"
+        self.Cur = (self.Cur + step) % len(hits) if self.Cur >= 0 else (0 if step > 0 else len(hits) - 1)
+        shown = self.View.Goto(hits[self.Cur])
+        busy = "…" if self.Search.Busy else ""
+        self.Count.configure(text=f"{self.Cur + 1}/{len(hits)}{busy}" + ("" if shown else "（已滚出窗口）"))
+        self.Mark()
+        return "break"
+
+    def Mark(self):
+        """只给当前可见的行打高亮"""
+        txt = self.View.Txt
+        txt.tag_remove("find", "1.0", "end"); txt.tag_remove("find_cur", "1.0", "end")
+        if not self.Search.Active or not self.Frame.winfo_ismapped(): return
+        cur = self.Search.Hits[self.Cur] if 0 <= self.Cur < len(self.Search.Hits) else -1
+        a = int(txt.index("@0,0").split(".")[0])
+        b = int(txt.index(f"@0,{txt.winfo_height()}").split(".")[0])
+        pat, levels = self.Search.Pat, self.Search.Levels
+        for ln in range(a, b + 1):
+            s = txt.get(f"{ln}.0", f"{ln}.end")
+            if levels and not _level_pat.search(s): continue
+            spans = [m.span() for m in pat.finditer(s)] if pat is not None else [_level_pat.search(s).span()]
+            tag = "find_cur" if self.View.LineOf(ln) == cur else "find"
+            for x, y in spans:
+                if y > x: txt.tag_add(tag, f"{ln}.{x}", f"{ln}.{y}")
+        txt.tag_raise("find"); txt.tag_raise("find_cur")
+
+def terminal_popup(parent: Tk.Misc, title: str, content, w: int, h: int):
+    """黑底、支持颜色码的结果弹窗（尺寸可传入）。
+       content 为 LogStore 时只懒加载可见行，关闭弹窗后删除日志文件。"""
     win = Tk.Toplevel(parent)
     SetupIcon(win, "Hexo.ico")
     win.title(title); win.geometry(f"{w}x{h}"); win.transient(parent); win.grab_set()
+    if isinstance(content, LogStore):
+        frame = Tk.Frame(win); frame.pack(fill="both", expand=True, padx=10, pady=(10))
+        view = LogView(frame, content)
+        view.Find = FindBar(win, win, content, view, live=False, before=frame)
+        win.bind("<Control-f>", view.Find.Show)
+        win.bind("<Destroy>", lambda e: content.Close() if e.widget is win else None)
+        return
+    from tkinter import scrolledtext
     txt = scrolledtext.ScrolledText(win, wrap="word")
     txt.pack(fill="both", expand=True, padx=10, pady=(10))
     setup_ansi_tags(txt)
-    state = {"fg": "fg_default", "bg": "bg_default", "bold": False, "ul": False}
-    insert_ansi(txt, content, state)
+    insert_ansi(txt, content, AnsiParser(txt), final=True)
     txt.configure(state="disabled")
 
 # =============== 弹窗 ===============
 def PopupText(parent: Tk.Misc, title: str, content: str):
     win = Tk.Toplevel(parent)
     SetupIcon(win, "Hexo.ico")
-    LargeFont = tkfont.Font(family="Microsoft YaHei UI", size=12)
     win.title(title); win.geometry("330x430"); win.transient(parent); win.grab_set()
-    txt = scrolledtext.ScrolledText(win, wrap="word", font=LargeFont)
+    from tkinter import scrolledtext
+    txt = scrolledtext.ScrolledText(win, wrap="word", font=CachedFont(win, family="Microsoft YaHei UI", size=12))
     txt.pack(fill="both", expand=True, padx=10, pady=(10))
     txt.insert("1.0", content); txt.configure(state="disabled")
 
@@ -236,121 +1122,2578 @@ class Tooltip:
             except Exception: pass
             self.tip = None
 
+# =============== 站点配置 ===============
+def SplitCmd(cmd: str):
+    """拆分命令行并去掉成对引号；非 posix 模式保留 Windows 路径里的反斜杠。引号不配对时返回 None"""
+    try: return [a[1:-1] if len(a) > 1 and a[0] == a[-1] and a[0] in "\"'" else a
+                 for a in shlex.split(cmd, posix=False)]
+    except ValueError: return None
+
+def HexoVerb(cmd: str):
+    """返回 hexo 命令的规范子命令名（new/clean/generate/deploy/server），不是 hexo 命令返回 None"""
+    argv = SplitCmd(cmd)
+    if not argv or len(argv) < 2 or argv[0].lower() != "hexo": return None
+    return {"n": "new", "g": "generate", "d": "deploy", "s": "server"}.get(argv[1], argv[1])
+
+def _yaml_scalar(v: str):
+    v = re.sub(r"\s+#.*$", "", v).strip()
+    if len(v) > 1 and v[0] == v[-1] and v[0] in "\"'": return v[1:-1]
+    low = v.lower()
+    if low in ("true", "yes", "on"): return True
+    if low in ("false", "no", "off"): return False
+    if low in ("", "~", "null"): return None
+    if re.fullmatch(r"-?\d+", v): return int(v)
+    return v
+
+def ReadSiteConfig(root: str) -> dict:
+    """读取站点 _config.yml；装了 PyYAML 就完整解析，否则只取顶层的简单键值（够用：theme、source_dir 等）"""
+    path = os.path.join(root, "_config.yml")
+    try:
+        with open(path, encoding="utf-8-sig", errors="replace") as f: text = f.read()
+    except OSError:
+        return {}
+    try:
+        import yaml  # 可选依赖
+        data = yaml.safe_load(text)
+        return data if isinstance(data, dict) else {}
+    except ImportError:
+        pass
+    except Exception:
+        return {}
+    cfg = {}
+    for m in re.finditer(r"^([A-Za-z_][\w-]*):[ \t]*(.*)$", text, re.M):
+        cfg[m.group(1)] = _yaml_scalar(m.group(2))
+    return cfg
+
+# =============== 原生新建（不启动 Node） ===============
+class NativeUnsupported(Exception):
+    """原生新建处理不了的情况（自定义 --path、复杂模板等），调用方改用 hexo new"""
+
+_DefaultScaffolds = {
+    "post":  "---\ntitle: {{ title }}\ndate: {{ date }}\ntags:\n---\n",
+    "draft": "---\ntitle: {{ title }}\ntags:\n---\n",
+    "page":  "---\ntitle: {{ title }}\ndate: {{ date }}\n---\n",
+}
+_DiacriticExtra = {"ß": "ss", "æ": "ae", "Æ": "AE", "ø": "o", "Ø": "O", "œ": "oe", "Œ": "OE",
+                   "đ": "d", "Đ": "D", "ł": "l", "Ł": "L", "þ": "th", "Þ": "TH"}
+_slug_special = re.compile(r"[\s~`!@#$%^&*()\-_+=\[\]{}|\\;:\"'<>,.?/]+")
+
+def Slugize(s: str, transform: int = 0) -> str:
+    """与 hexo-util 的 slugize 一致：去掉拉丁字母的变音符号，特殊字符折叠成 -，filename_case 1/2 转小写/大写"""
+    out = []
+    for c in s:
+        if c.isascii(): out.append(c)
+        elif c in _DiacriticExtra: out.append(_DiacriticExtra[c])
+        else:
+            base = unicodedata.normalize("NFD", c)[0]
+            out.append(base if base.isascii() and base.isalpha() else c)
+    r = _slug_special.sub("-", re.sub(r"[\x00-\x1f]", "", "".join(out))).strip("-")
+    return r.lower() if transform == 1 else r.upper() if transform == 2 else r
+
+def _yaml_escape(v: str) -> str:
+    """与 Hexo 的 prepareFrontMatter 一致：含冒号、引号、括号等时加双引号"""
+    if ":" in v or v.startswith(("#", "!!")) or any(c in v for c in "{}[]'\""):
+        return '"' + v.replace('"', '\\"') + '"'
+    return v
+
+def _unused_path(path: str) -> str:
+    """与 hexo-fs ensurePath 一致：已存在时取 name-N.ext，N 为现有最大编号 + 1"""
+    if not os.path.exists(path): return path
+    d, name = os.path.split(path)
+    base, ext = os.path.splitext(name)
+    pat = re.compile(rf"^{re.escape(base)}(?:-(\d+))?{re.escape(ext)}$")
+    num = -1
+    for f in os.listdir(d):
+        m = pat.match(f)
+        if m: num = max(num, int(m.group(1) or 0))
+    return os.path.join(d, f"{base}-{num + 1}{ext}")
+
+def ParseNewCmd(cmd: str):
+    """解析 hexo new [layout] <title> [--slug x] [--replace]；不是 new 命令返回 None，有不支持的参数抛 NativeUnsupported"""
+    argv = SplitCmd(cmd)
+    if not argv or len(argv) < 3 or argv[0].lower() != "hexo" or argv[1] not in ("new", "n"): return None
+    pos, slug, replace, i = [], None, False, 2
+    while i < len(argv):
+        a = argv[i]
+        if a in ("-s", "--slug") and i + 1 < len(argv): slug = argv[i + 1]; i += 1
+        elif a.startswith("--slug="): slug = a[7:]
+        elif a in ("-r", "--replace"): replace = True
+        elif a.startswith("-"): raise NativeUnsupported(a)
+        else: pos.append(a)
+        i += 1
+    if not pos: raise NativeUnsupported("缺少标题")
+    return {"layout": pos[0] if len(pos) > 1 else None, "title": pos[-1], "slug": slug, "replace": replace}
+
+class PostMaker:
+    """按 _config.yml 与 scaffolds/ 直接生成文章文件，规则与 hexo new 一致；一次读取配置，可批量创建"""
+    def __init__(self, root: str):
+        self.Root = root
+        self.Cfg = ReadSiteConfig(root)
+        if not self.Cfg: raise NativeUnsupported("找不到 _config.yml")
+        self.SourceDir = os.path.join(root, str(self.Cfg.get("source_dir") or "source"))
+        self.NewPostName = str(self.Cfg.get("new_post_name") or ":title.md")
+        self.DefaultLayout = str(self.Cfg.get("default_layout") or "post")
+        self.FilenameCase = int(self.Cfg.get("filename_case") or 0)
+        self.Scaffolds = {}
+        self.Tz = None
+        tz = self.Cfg.get("timezone")
+        if tz:
+            try:
+                from zoneinfo import ZoneInfo
+                self.Tz = ZoneInfo(str(tz))
+            except Exception:
+                raise NativeUnsupported(f"timezone {tz}")
+
+    def Scaffold(self, layout: str) -> str:
+        if layout not in self.Scaffolds:
+            path = os.path.join(self.Root, str(self.Cfg.get("scaffold_dir") or "scaffolds"), f"{layout}.md")
+            try:
+                with open(path, encoding="utf-8") as f: self.Scaffolds[layout] = f.read()
+            except OSError:
+                if layout not in _DefaultScaffolds: raise NativeUnsupported(f"缺少模板 {layout}.md")
+                self.Scaffolds[layout] = _DefaultScaffolds[layout]
+        return self.Scaffolds[layout]
+
+    def Target(self, layout: str, slug: str, now) -> str:
+        if layout == "page":
+            target = os.path.join(self.SourceDir, slug, "index")
+        elif layout == "draft":
+            target = os.path.join(self.SourceDir, "_drafts", slug)
+        else:
+            data = {"year": now.strftime("%Y"), "month": now.strftime("%m"), "i_month": str(now.month),
+                    "day": now.strftime("%d"), "i_day": str(now.day), "title": slug}
+            def sub(m):
+                if m.group(1) not in data: raise NativeUnsupported(f"new_post_name :{m.group(1)}")
+                return data[m.group(1)]
+            target = os.path.join(self.SourceDir, "_posts", re.sub(r":(\w+)", sub, self.NewPostName))
+        if not os.path.splitext(target)[1]:
+            target += os.path.splitext(self.NewPostName)[1] or ".md"
+        return os.path.normpath(target)
+
+    def Render(self, scaffold: str, data: dict) -> str:
+        """只渲染 front-matter 部分的 {{ key }}；出现过滤器、控制语句等复杂模板时交回 Hexo"""
+        m = re.match(r"(---\s*\n)(.*?\n)(---\s*(?:\n|$))", scaffold, re.S)
+        head, fm, tail = (m.group(1), m.group(2), scaffold[m.end(2):]) if m else ("", scaffold, "")
+        if "{%" in fm: raise NativeUnsupported("模板含控制语句")
+        def sub(mm):
+            if not re.fullmatch(r"\w+", mm.group(1).strip()): raise NativeUnsupported("模板含表达式")
+            return str(data.get(mm.group(1).strip(), ""))
+        return head + re.sub(r"\{\{(.*?)\}\}", sub, fm) + tail
+
+    def Create(self, title: str, layout: str = None, slug: str = None, replace: bool = False) -> str:
+        layout = layout or self.DefaultLayout
+        scaffold = self.Scaffold(layout)
+        now = datetime.now(self.Tz) if self.Tz else datetime.now()
+        slug = Slugize(slug or title, self.FilenameCase)
+        if not slug: raise NativeUnsupported("标题为空")
+        target = self.Target(layout, slug, now)
+        if not replace: target = _unused_path(target)
+        data = {"title": _yaml_escape(title), "date": now.strftime("%Y-%m-%d %H:%M:%S"), "layout": layout}
+        text = self.Render(scaffold, data)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8", newline="") as f: f.write(text)
+        if self.Cfg.get("post_asset_folder") and layout != "page":
+            os.makedirs(os.path.splitext(target)[0], exist_ok=True)
+        return target
+
+def NativeNew(cmd: str, emit, maker: PostMaker = None):
+    """原生执行一条 hexo new；返回 0 表示已创建，返回 None 表示需要交给 hexo 命令"""
+    try:
+        spec = ParseNewCmd(cmd)
+        if spec is None: return None
+        path = (maker or PostMaker(BaseDir)).Create(**spec)
+    except NativeUnsupported as e:
+        emit(f"\x1b[90m[原生新建] 不支持（{e}），改用 hexo new\x1b[0m\n")
+        return None
+    emit(f"\x1b[32mINFO\x1b[39m  Created: {path}\n")
+    return 0
+
+# =============== 原生清理（改名后后台删除） ===============
+def FormatBytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+_TrashPool = None
+def _trash_pool() -> ThreadPoolExecutor:
+    global _TrashPool
+    if _TrashPool is None:
+        _TrashPool = ThreadPoolExecutor(max_workers=TrashWorkers, thread_name_prefix="HexoDashTrash")
+    return _TrashPool
+
+def _unlink(path: str) -> bool:
+    """删除单个文件；Windows 上的只读文件先去掉只读属性再删"""
+    try:
+        os.unlink(path)
+    except PermissionError:
+        try: os.chmod(path, stat.S_IWRITE); os.unlink(path)
+        except OSError: return False
+    except OSError:
+        return False
+    return True
+
+def _rm_tree(path: str, counter: list, lock: threading.Lock):
+    """递归删除目录（或单个文件），累加到 counter = [文件数, 字节数]"""
+    if not os.path.isdir(path) or os.path.islink(path):
+        try: n = os.lstat(path).st_size
+        except OSError: n = 0
+        if _unlink(path):
+            with lock: counter[0] += 1; counter[1] += n
+        return
+    files = size = 0
+    try:
+        with os.scandir(path) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    _rm_tree(e.path, counter, lock)
+                    continue
+                try: n = e.stat(follow_symlinks=False).st_size
+                except OSError: n = 0
+                if _unlink(e.path):
+                    files += 1; size += n
+                if files >= 256:
+                    with lock: counter[0] += files; counter[1] += size
+                    files = size = 0
+    except OSError:
+        pass
+    with lock: counter[0] += files; counter[1] += size
+    try: os.rmdir(path)
+    except OSError: pass
+
+def DeleteInBackground(paths: list[str], on_progress=None, on_done=None):
+    """在线程池里并行删除若干目录（按顶层子项拆分任务）；
+       on_progress(文件数, 字节数) 定期回调，on_done(文件数, 字节数, 秒) 结束时回调，均在后台线程调用"""
+    def Run():
+        t0, counter, lock, futs = time.perf_counter(), [0, 0], threading.Lock(), []
+        pool = _trash_pool()
+        for root in paths:
+            try:
+                with os.scandir(root) as it:
+                    for e in it:
+                        futs.append(pool.submit(_rm_tree, e.path, counter, lock))
+            except OSError:
+                pass
+        pending = set(futs)
+        while pending:
+            _, pending = wait_futures(pending, timeout=TrashReportSec)
+            if on_progress:
+                with lock: on_progress(counter[0], counter[1])
+        for root in paths:
+            _rm_tree(root, counter, lock)  # 收尾：删掉空的顶层目录
+        if on_done: on_done(counter[0], counter[1], time.perf_counter() - t0)
+    threading.Thread(target=Run, daemon=True).start()
+
+def NativeClean(root: str, emit, note=None) -> int:
+    """原生 hexo clean：删除 db.json，把 public 目录原子改名成墓碑目录后立即返回，墓碑在后台线程池删除。
+       不会执行插件的 after_clean 过滤器；改名失败（如文件被占用）时抛 NativeUnsupported 交回 hexo clean。"""
+    cfg = ReadSiteConfig(root)
+    if not cfg: raise NativeUnsupported("找不到 _config.yml")
+    public = os.path.normpath(os.path.join(root, str(cfg.get("public_dir") or "public")))
+    parent, name = os.path.split(public)
+    prefix = f".{name}.trash-"
+    tombs = []
+    if os.path.isdir(public):
+        tomb = os.path.join(parent, f"{prefix}{time.time_ns()}")
+        try: os.rename(public, tomb)
+        except OSError as e: raise NativeUnsupported(f"无法移走 {name}：{e}")
+        tombs.append(tomb)
+    db = os.path.join(root, "db.json")
+    if os.path.exists(db):
+        os.remove(db)
+        emit("\x1b[32mINFO\x1b[39m  Deleted database.\n")
+    try:  # 顺带清掉上次没删完的墓碑
+        tombs += [os.path.join(parent, f) for f in os.listdir(parent) if f.startswith(prefix) and os.path.join(parent, f) not in tombs]
+    except OSError:
+        pass
+    if not tombs: return 0
+    emit(f"\x1b[32mINFO\x1b[39m  Deleted public folder.\x1b[90m（后台删除中）\x1b[0m\n")
+    def Progress(files, size):
+        if note: note(f"后台清理：{files} 个文件，{FormatBytes(size)}")
+    def Done(files, size, secs):
+        if note: note(f"清理完成：释放 {FormatBytes(size)}")
+        emit(f"\x1b[90m[清理] 后台删除完成：{files} 个文件，释放 {FormatBytes(size)}，用时 {secs:.1f}s\x1b[0m\n")
+    DeleteInBackground(tombs, Progress, Done)
+    return 0
+
+# =============== 文件清单与改动检测 ===============
+def StatePath(root: str, name: str) -> str:
+    d = os.path.join(root, StateDirName)
+    os.makedirs(d, exist_ok=True)
+    return os.path.join(d, name)
+
+def FileHash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for b in iter(lambda: f.read(1 << 20), b""):
+            h.update(b)
+    return h.hexdigest()
+
+def _scan_dir(base: str, rel: str, skip: set) -> dict:
+    """单线程遍历一棵子树，返回 {相对路径: (mtime_ns, size)}；相对路径统一用 /"""
+    out, stack = {}, [rel]
+    while stack:
+        cur = stack.pop()
+        try:
+            with os.scandir(os.path.join(base, cur)) as it:
+                for e in it:
+                    r = f"{cur}/{e.name}" if cur else e.name
+                    if e.is_dir(follow_symlinks=False):
+                        if e.name not in skip: stack.append(r)
+                    elif e.is_file():
+                        try: st = e.stat()
+                        except OSError: continue
+                        out[r] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+    return out
+
+def ScanTree(base: str, roots: list[str], skip: set = frozenset({"node_modules", ".git"})) -> dict:
+    """并行扫描 base 下的若干目录：按第二层子目录拆成任务交给线程池"""
+    result, tasks = {}, []
+    with ThreadPoolExecutor(max_workers=ScanWorkers) as pool:
+        for root in roots:
+            try:
+                with os.scandir(os.path.join(base, root)) as it:
+                    for e in it:
+                        r = f"{root}/{e.name}"
+                        if e.is_dir(follow_symlinks=False):
+                            if e.name not in skip: tasks.append(pool.submit(_scan_dir, base, r, skip))
+                        elif e.is_file():
+                            try: st = e.stat(); result[r] = (st.st_mtime_ns, st.st_size)
+                            except OSError: pass
+            except OSError:
+                pass
+        for t in tasks:
+            result.update(t.result())
+    return result
+
+def HashChanged(base: str, old: dict, new: dict) -> dict:
+    """对 mtime/size 变了的文件和新文件并行算哈希，返回 {相对路径: 哈希}；
+       未变且已有哈希的沿用旧哈希。新文件第一次登记就算好，它之后只改 mtime 时才能认出没变"""
+    hashes, todo = {}, []
+    for r, v in new.items():
+        c = old.get(r)
+        if c and tuple(c[:2]) == v and c[2]: hashes[r] = c[2]
+        else: todo.append(r)
+    def One(r):
+        try: return r, FileHash(os.path.join(base, r))
+        except OSError: return r, None
+    with ThreadPoolExecutor(max_workers=ScanWorkers) as pool:
+        hashes.update(pool.map(One, todo))
+    return hashes
+
+def HashTree(base: str, roots: list[str], cache: dict) -> dict:
+    """并行扫描并给每个文件算哈希，(mtime, size) 与缓存一致的直接沿用缓存。返回 {相对路径: [mtime_ns, size, 哈希]}"""
+    stats = ScanTree(base, roots, skip=frozenset())
+    out, todo = {}, []
+    for r, (m, n) in stats.items():
+        c = cache.get(r)
+        if c and c[0] == m and c[1] == n and c[2]: out[r] = c
+        else: todo.append(r)
+    def One(r):
+        try: return r, FileHash(os.path.join(base, r))
+        except OSError: return r, None
+    with ThreadPoolExecutor(max_workers=ScanWorkers) as pool:
+        for r, h in pool.map(One, todo):
+            if h is not None: out[r] = [*stats[r], h]
+    return out
+
+def _load_json(path: str, default):
+    try:
+        with open(path, encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def _save_json(path: str, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f: json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+class SiteManifest:
+    """站点源文件清单（source/、themes/、scaffolds/ 与配置文件），持久化在 .hexodash/manifest.json。
+       以 (mtime, size) 判断，只对新文件和 mtime/size 变了的文件算哈希，确认内容是否真的变化。
+       Check() 给出决策：clean（配置/主题变了）、generate（源文件变了）、skip（无改动）；
+       运行成功后 Commit() 才写入新清单，失败的运行不会让下次误判为“无改动”。"""
+    def __init__(self, root: str):
+        self.Root = root
+        self.Path = StatePath(root, "manifest.json")
+        self.Old = _load_json(self.Path, {}).get("files", {})
+        self.New = None
+
+    def Scan(self) -> dict:
+        cfg = ReadSiteConfig(self.Root)
+        source = str(cfg.get("source_dir") or "source")
+        stats = ScanTree(self.Root, [source, "themes", "scaffolds"])
+        try:
+            for name in os.listdir(self.Root):
+                if any(fnmatch.fnmatch(name, pat) for pat in ConfigPatterns):
+                    try: st = os.stat(os.path.join(self.Root, name)); stats[name] = (st.st_mtime_ns, st.st_size)
+                    except OSError: pass
+        except OSError:
+            pass
+        hashes = HashChanged(self.Root, self.Old, stats)
+        self.New = {r: [m, n, hashes.get(r)] for r, (m, n) in stats.items()}
+        return self.New
+
+    def Changes(self) -> list[str]:
+        """真正变化的文件（新增、删除、内容变化）；哈希相同只是 mtime 变了的不算"""
+        old, new = self.Old, self.New
+        changed = [r for r in new if r not in old or (tuple(old[r][:2]) != tuple(new[r][:2])
+                   and (old[r][2] is None or old[r][2] != new[r][2]))]
+        return sorted(changed + [r for r in old if r not in new])
+
+    def Check(self) -> dict:
+        t0 = time.perf_counter()
+        self.Scan()
+        changes = self.Changes()
+        public = os.path.join(self.Root, str(ReadSiteConfig(self.Root).get("public_dir") or "public"))
+        hard = [r for r in changes if "/" not in r or r.startswith("themes/")]
+        if not self.Old:
+            action, reason, files = "generate", "首次运行，还没有清单", []
+        elif hard:
+            action, reason, files = "clean", "配置或主题有改动，需要清理后重新生成", hard
+        elif changes:
+            action, reason, files = "generate", "源文件有改动，增量生成即可", changes
+        elif not os.path.isdir(public):
+            action, reason, files = "generate", "public 目录不存在", []
+        else:
+            action, reason, files = "skip", "没有任何改动，跳过生成", []
+        return {"action": action, "reason": reason, "files": files,
+                "count": len(self.New), "secs": time.perf_counter() - t0}
+
+    def Commit(self):
+        if self.New is None: return
+        _save_json(self.Path, {"version": 1, "files": self.New})
+        self.Old = self.New
+
+class DeployCheck:
+    """上传前检查：并行哈希 public/ 并与上次成功上传时的清单比较，得出新增/修改/删除的文件。
+       哈希按 (路径, mtime, size) 缓存在 .hexodash/public-hashes.json，重复检查只哈希变过的文件；
+       差异写到 .hexodash/deploy-diff.json，部署脚本可据此只同步变化的文件；上传成功后 Commit() 更新清单。"""
+    def __init__(self, root: str):
+        self.Root = root
+        self.Public = str(ReadSiteConfig(root).get("public_dir") or "public").strip("/\\")
+        self.CachePath = StatePath(root, "public-hashes.json")
+        self.ManifestPath = StatePath(root, "deploy-manifest.json")
+        self.DiffPath = StatePath(root, "deploy-diff.json")
+        self.Hashes = None
+
+    def Check(self) -> dict:
+        t0 = time.perf_counter()
+        entries = HashTree(self.Root, [self.Public], _load_json(self.CachePath, {}))
+        _save_json(self.CachePath, entries)
+        self.Hashes = {r[len(self.Public) + 1:]: v[2] for r, v in entries.items()}
+        last = _load_json(self.ManifestPath, None)
+        if last is None:
+            diff = {"first": True, "added": sorted(self.Hashes), "changed": [], "removed": []}
+        else:
+            diff = {"first": False,
+                    "added":   sorted(r for r in self.Hashes if r not in last),
+                    "changed": sorted(r for r, h in self.Hashes.items() if r in last and last[r] != h),
+                    "removed": sorted(r for r in last if r not in self.Hashes)}
+        diff.update(count=len(self.Hashes), secs=time.perf_counter() - t0, time=time.strftime("%Y-%m-%d %H:%M:%S"))
+        _save_json(self.DiffPath, diff)
+        return diff
+
+    def Commit(self):
+        if self.Hashes is not None:
+            _save_json(self.ManifestPath, self.Hashes)
+
+# =============== 文章索引（front matter 缓存） ===============
+_fm_key = re.compile(r"^([A-Za-z_][\w-]*):[ \t]*(.*)$")
+
+def _fm_flow(v: str) -> list:
+    """[a, "b, c", d] 形式的行内列表"""
+    return [_yaml_scalar(x) for x in re.findall(r'"[^"]*"|\'[^\']*\'|[^,\s][^,]*', v)]
+
+def _fm_list(v) -> list:
+    """tags/categories 可能是字符串、列表或嵌套列表（分类层级），摊平成字符串列表"""
+    if v is None or v == []: return []
+    if isinstance(v, (list, tuple)): return [x for item in v for x in _fm_list(item)]
+    if isinstance(v, dict): return [str(k) for k in v]
+    return [str(v)]
+
+def ParseFrontMatter(text: str) -> dict:
+    """解析文章开头的 front matter（开头的 --- 可省略，与 hexo-front-matter 一致）；
+       装了 PyYAML 用它（优先 C 实现），否则只认顶层键值、行内列表与 "- 项" 列表。"""
+    text = text.lstrip("\ufeff")
+    m = re.match(r"(?:---[ \t]*\r?\n)?(.*?)\r?\n---[ \t]*(?:\r?\n|$)", text, re.S)
+    if not m: return {}
+    body = m.group(1)
+    try:
+        import yaml  # 可选依赖
+        d = yaml.load(body, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+        return d if isinstance(d, dict) else {}
+    except ImportError:
+        pass
+    except Exception:
+        return {}
+    d, key = {}, None
+    for ln in body.splitlines():
+        km = _fm_key.match(ln)
+        if km:
+            key, v = km.group(1), km.group(2).strip()
+            d[key] = _fm_flow(v[1:-1]) if v.startswith("[") and v.endswith("]") else (_yaml_scalar(v) if v else [])
+            continue
+        item = ln.strip()
+        if key and item.startswith("- "):
+            item = item[2:].strip()
+            if not isinstance(d.get(key), list): d[key] = []
+            d[key].append(_fm_flow(item[1:-1]) if item.startswith("[") and item.endswith("]") else _yaml_scalar(item))
+    return d
+
+def _index_one(root: str, rel: str):
+    """读取一篇文章的 front matter，返回索引条目 [mtime_ns, 大小, 标题, 日期, 标签, 分类]"""
+    path = os.path.join(root, rel)
+    try:
+        st = os.stat(path)
+        with open(path, "rb") as f: head = f.read(IndexHeadBytes)
+        text = head.decode("utf-8", "replace")
+        if len(head) == IndexHeadBytes and "\n---" not in text[3:]:
+            with open(path, "rb") as f: text = f.read().decode("utf-8", "replace")
+    except OSError:
+        return None
+    fm = ParseFrontMatter(text)
+    title = fm.get("title")
+    date = fm.get("date")
+    if isinstance(date, datetime): date = date.strftime("%Y-%m-%d %H:%M:%S")
+    return [st.st_mtime_ns, st.st_size, "" if title is None else str(title), "" if date is None else str(date),
+            _fm_list(fm.get("tags")), _fm_list(fm.get("categories"))]
+
+def _index_batch(root: str, rels: list) -> list:
+    """（子进程）批量解析"""
+    return [(rel, _index_one(root, rel)) for rel in rels]
+
+class PostIndex:
+    """source/_posts 与 source/_drafts 的 front matter 索引，持久化在 .hexodash/posts.json。
+       Load() 只读 JSON（万篇级别几十毫秒），Refresh() 按 mtime/大小增量更新，首次建立时并行解析。
+       Posts：{相对路径: [mtime_ns, 大小, 标题, 日期, 标签, 分类]}；Refresh 在后台线程，整体替换后界面线程读。"""
+    Version = 1
+
+    def __init__(self, root: str):
+        self.Root = root
+        self.Path = StatePath(root, "posts.json")
+        self.Posts = {}
+        self.Titles = []      # [(小写标题, 小写文件名, 相对路径)]，搜索用
+        self.Tags, self.Cats, self.Dups = {}, {}, {}
+        self.Loaded = False
+        self.Maker = None     # 推算 hexo new 会用的文件名（Refresh 时按当前配置重建）
+        self.LoadMs = self.RefreshMs = 0.0
+        self.Lock = threading.Lock()
+
+    def Dirs(self) -> list[str]:
+        source = str(ReadSiteConfig(self.Root).get("source_dir") or "source").strip("/\\")
+        return [f"{source}/_posts", f"{source}/_drafts"]
+
+    def Load(self):
+        t = time.perf_counter()
+        data = _load_json(self.Path, {})
+        if data.get("version") == self.Version:
+            self.Rebuild(data.get("posts", {}))
+        self.Loaded = True
+        self.LoadMs = (time.perf_counter() - t) * 1000
+
+    def Rebuild(self, posts: dict):
+        titles, tags, cats, by_title = [], {}, {}, {}
+        for rel, e in posts.items():
+            stem = os.path.splitext(os.path.basename(rel))[0]
+            low = e[2].casefold()
+            titles.append((low, stem.casefold(), rel))
+            if low: by_title.setdefault(low, []).append(rel)
+            for t in e[4]: tags[t] = tags.get(t, 0) + 1
+            for c in e[5]: cats[c] = cats.get(c, 0) + 1
+        titles.sort()
+        self.Posts, self.Titles, self.Tags, self.Cats = posts, titles, tags, cats
+        self.Dups = {k: v for k, v in by_title.items() if len(v) > 1}
+
+    def Refresh(self) -> int:
+        """（后台线程）扫描并重新解析 mtime/大小变了的文件，返回变化的文章数"""
+        with self.Lock:
+            t = time.perf_counter()
+            if not self.Loaded: self.Load()
+            try: self.Maker = PostMaker(self.Root)
+            except NativeUnsupported: self.Maker = None
+            stats = {r: v for r, v in ScanTree(self.Root, self.Dirs()).items() if r.lower().endswith(IndexExts)}
+            old = self.Posts
+            posts = {r: old[r] for r, (m, n) in stats.items() if r in old and old[r][0] == m and old[r][1] == n}
+            todo = [r for r in stats if r not in posts]
+            if len(todo) > IndexProcessMin:
+                chunks = [todo[i:i + 256] for i in range(0, len(todo), 256)]
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+                    for res in pool.map(_index_batch, [self.Root] * len(chunks), chunks):
+                        posts.update((r, e) for r, e in res if e is not None)
+            elif todo:
+                with ThreadPoolExecutor(max_workers=ScanWorkers) as pool:
+                    for r, e in zip(todo, pool.map(lambda r: _index_one(self.Root, r), todo)):
+                        if e is not None: posts[r] = e
+            changed = len(todo) + sum(1 for r in old if r not in stats)
+            if changed:
+                self.Rebuild(posts)
+                try: _save_json(self.Path, {"version": self.Version, "posts": posts})
+                except OSError: pass
+            self.RefreshMs = (time.perf_counter() - t) * 1000
+            return changed
+
+    def Search(self, q: str, limit: int = IndexSuggestRows) -> list[str]:
+        """标题或文件名包含 q 的文章（前缀匹配优先，新的在前），返回相对路径"""
+        q = q.strip().casefold()
+        if not q: return []
+        head, rest = [], []
+        for low, stem, rel in self.Titles:
+            if low.startswith(q) or stem.startswith(q): head.append(rel)
+            elif q in low or q in stem: rest.append(rel)
+        key = lambda r: self.Posts[r][3]
+        return (sorted(head, key=key, reverse=True) + sorted(rest, key=key, reverse=True))[:limit]
+
+    def Duplicates(self, title: str, layout: str = "post") -> list[str]:
+        """新建 title 时会撞上的已有文章：同名标题，或 hexo new 会生成的文件名已被占用（否则会变成 xxx-1.md）"""
+        low = title.strip().casefold()
+        if not low: return []
+        hits = [rel for t, _, rel in self.Titles if t == low]
+        maker = self.Maker
+        if maker is None: return hits
+        try:
+            target = maker.Target(layout, Slugize(title.strip(), maker.FilenameCase), datetime.now())
+            rel = os.path.relpath(target, self.Root).replace("\\", "/")
+            if (rel in self.Posts or os.path.exists(target)) and rel not in hits: hits.append(rel)
+        except (NativeUnsupported, OSError, ValueError):
+            pass
+        return hits
+
+def OpenFile(path: str, parent: Tk.Misc):
+    """用系统默认程序打开文件"""
+    try:
+        if os.name == "nt": os.startfile(path)  # type: ignore[attr-defined]
+        else: subprocess.Popen(["open" if sys.platform == "darwin" else "xdg-open", path])
+    except OSError as e:
+        messagebox.showerror("错误", f"无法打开：{e}", parent=parent)
+
+class TitleSuggest:
+    """输入框下方的搜索结果下拉：边输入边列出匹配的文章，双击用默认程序打开"""
+    def __init__(self, entry: Tk.Misc, index: PostIndex):
+        self.Entry, self.Index = entry, index
+        self.Win = None
+        self.Rels = []
+
+    def Show(self, rels: list[str], warn: list[str]):
+        if not rels and not warn:
+            self.Hide(); return
+        if self.Win is None:
+            self.Win = Tk.Toplevel(self.Entry)
+            self.Win.wm_overrideredirect(True)
+            self.Win.attributes("-topmost", True)
+            self.Warn = Tk.Label(self.Win, fg="#CD3131", bg="#FFF4E5", anchor="w", justify="left",
+                                 font=("Adobe Song Std L", 9))
+            self.List = Tk.Listbox(self.Win, height=IndexSuggestRows, font=("Adobe Song Std L", 9),
+                                   activestyle="none", bd=1, relief="solid")
+            self.List.pack(fill="both", expand=True)
+            self.List.bind("<Double-Button-1>", self.Open)
+        if warn:
+            self.Warn.configure(text="⚠ 已存在：" + "\n    ".join(warn[:3]))
+            self.Warn.pack(fill="x", before=self.List)
+        else:
+            self.Warn.pack_forget()
+        self.Rels = rels
+        self.List.delete(0, "end")
+        for rel in rels:
+            e = self.Index.Posts.get(rel)
+            self.List.insert("end", f"{e[2] or os.path.basename(rel)}  {e[3][:10]}" if e else rel)
+        self.List.configure(height=max(1, min(len(rels), IndexSuggestRows)))
+        if not rels: self.List.pack_forget()
+        elif not self.List.winfo_ismapped(): self.List.pack(fill="both", expand=True)
+        x, y = self.Entry.winfo_rootx(), self.Entry.winfo_rooty() + self.Entry.winfo_height()
+        self.Win.geometry(f"+{x}+{y}")
+
+    def Open(self, _=None):
+        sel = self.List.curselection()
+        if sel: OpenFile(os.path.join(self.Index.Root, self.Rels[sel[0]]), self.Entry)
+
+    def Hide(self, _=None):
+        if self.Win is not None:
+            try: self.Win.destroy()
+            except Exception: pass
+            self.Win = None
+
+# =============== 常驻 Hexo 进程 ===============
+def WorkerArgv(cmd: str):
+    """把 "hexo generate --debug" 这类命令转成常驻进程的参数列表；不适合交给常驻进程时返回 None"""
+    argv = SplitCmd(cmd)
+    if argv is None or len(argv) < 2 or argv[0].lower() != "hexo" or argv[1] not in WorkerCommands: return None
+    if any(a in ("--watch", "-w", "--cwd") for a in argv): return None
+    return [WorkerCommands[argv[1]]] + argv[2:]
+
+def _split_global_opts(argv: list[str]) -> tuple[list[str], list[str]]:
+    """拆出启动 Hexo 时就要确定的全局参数，返回 (全局参数, 任务参数)"""
+    glob, rest, i = [], [], 0
+    while i < len(argv):
+        a = argv[i]
+        if a in WorkerGlobalOpts: glob.append(a)
+        elif a in WorkerGlobalValOpts and i + 1 < len(argv): glob += argv[i:i + 2]; i += 1
+        else: rest.append(a)
+        i += 1
+    return glob, rest
+
+class HexoWorker:
+    """常驻 Hexo 进程：Node 与 Hexo/插件只加载一次，之后通过 stdin/stdout 行协议派发 new/clean/generate/deploy。
+       请求：每行一个 JSON {"id": n, "argv": [...]}；普通输出原样转发，控制行以 Marker 开头：
+       {"ready": true} 表示加载完成，{"id": n, "rc": 0} 表示任务结束。
+       _config.yml、主题配置、package.json 或全局参数变化时自动重启；环境变量 HEXODASH_WORKER 可替换启动命令。"""
+    Marker = "\x1e"
+
+    def __init__(self, cwd: str):
+        self.Cwd = cwd
+        self.Proc = None
+        self.Sig = None
+        self.Ready = False
+        self.Results = None   # 当前进程的控制消息队列
+        self.Sink = None      # 当前任务的输出回调
+        self.Seq = 0
+        self.Lock = threading.Lock()
+
+    def Command(self, glob: list[str]) -> str:
+        base = os.environ.get("HEXODASH_WORKER") or f'node "{ResourcePath(WorkerScript)}"'
+        quote = subprocess.list2cmdline if os.name == "nt" else (lambda a: " ".join(map(shlex.quote, a)))
+        return " ".join([base] + ([quote(glob)] if glob else []))
+
+    def WatchFiles(self) -> list[str]:
+        files = [os.path.join(self.Cwd, "_config.yml"), os.path.join(self.Cwd, "package.json")]
+        theme = ReadSiteConfig(self.Cwd).get("theme")
+        if theme:
+            files += [os.path.join(self.Cwd, "themes", str(theme), "_config.yml"),
+                      os.path.join(self.Cwd, f"_config.{theme}.yml"),
+                      os.path.join(self.Cwd, "themes", str(theme), "package.json")]
+        return files
+
+    def Signature(self, glob: list[str]) -> tuple:
+        sig = [tuple(glob)]
+        for f in self.WatchFiles():
+            try: st = os.stat(f); sig.append((f, st.st_mtime_ns, st.st_size))
+            except OSError: sig.append((f, None))
+        return tuple(sig)
+
+    def Alive(self) -> bool:
+        return self.Proc is not None and self.Proc.poll() is None
+
+    def Ensure(self, glob: list[str], emit):
+        sig = self.Signature(glob)
+        if self.Alive() and sig == self.Sig: return
+        if self.Alive():
+            emit("\x1b[90m[常驻进程] 配置或参数已变化，重新加载 Hexo…\x1b[0m\n")
+            self.Kill()
+        else:
+            emit("\x1b[90m[常驻进程] 启动并加载 Hexo…\x1b[0m\n")
+        self.Sig, self.Ready = sig, False
+        self.Results = results = queue.SimpleQueue()
+        self.Proc = proc = Supervisor.Track(SilentPopen(self.Command(glob), new_group=True, stdin=subprocess.PIPE),
+                                            self.Command(glob), owner=self)
+        threading.Thread(target=self.ReadLoop, args=(proc, results), daemon=True).start()
+
+    def ReadLoop(self, proc: subprocess.Popen, results):
+        dec, tail = StreamDecoder(), ""
+        try:
+            fd = proc.stdout.fileno()
+            while True:
+                b = os.read(fd, ReadChunkBytes)
+                if not b: break
+                s, tail = tail + dec.Decode(b), ""
+                while s:
+                    i = s.find(self.Marker)
+                    if i == -1:
+                        self.Out(s); break
+                    if i: self.Out(s[:i])
+                    j = s.find("\n", i)
+                    if j == -1:
+                        tail = s[i:]; break
+                    self.Control(s[i + 1:j], results)
+                    s = s[j + 1:]
+        except Exception:
+            pass
+        results.put(("exit", Supervisor.Wait(proc)[0]))
+
+    def Out(self, s: str):
+        sink = self.Sink
+        if sink is not None: sink(s)
+
+    def Control(self, line: str, results):
+        try: msg = json.loads(line)
+        except ValueError: return
+        if msg.get("ready"): self.Ready = True
+        elif "id" in msg: results.put(("done", msg["id"], int(msg.get("rc", 1))))
+
+    def Run(self, argv: list[str], emit):
+        """（后台线程）执行一个任务并把输出交给 emit，返回退出码；进程没能加载好 Hexo 时返回 None"""
+        glob, args = _split_global_opts(argv)
+        with self.Lock:
+            self.Sink = emit
+            try:
+                self.Ensure(glob, emit)
+                self.Seq += 1
+                job, results = self.Seq, self.Results
+                try:
+                    self.Proc.stdin.write((json.dumps({"id": job, "argv": args}) + "\n").encode("utf-8"))
+                    self.Proc.stdin.flush()
+                except OSError:
+                    pass  # 进程已退出，下面会收到 exit
+                while True:
+                    msg = results.get()
+                    if msg[0] == "done" and msg[1] == job:
+                        if args[:1] == ["clean"]: self.Retire()  # clean 后 worker 会自行退出
+                        return msg[2]
+                    if msg[0] == "exit":
+                        return (msg[1] or 1) if self.Ready else None
+            finally:
+                self.Sink = None
+
+    def Retire(self):
+        """等待进程自行退出，避免下一个任务发给正在退出的进程"""
+        proc, self.Proc = self.Proc, None
+        if proc is not None and not Supervisor.Join(proc, 5): Supervisor.Stop(proc)
+
+    def Kill(self):
+        proc, self.Proc = self.Proc, None
+        if proc is None: return
+        try: proc.stdin.close()
+        except Exception: pass
+        Supervisor.Stop(proc)
+
+# =============== 原生预览（直接托管 public/） ===============
+def ParseServeCmd(cmd: str):
+    """解析 hexo server [-p 端口] [-i 地址] [-l] [-s] [-o]；有其它参数（--draft 等需要 Hexo 渲染的）抛 NativeUnsupported"""
+    argv = SplitCmd(cmd)
+    if not argv or HexoVerb(cmd) != "server": return None
+    opt, i = {"port": ServeDefaultPort, "host": ServeDefaultHost, "log": False, "open": False}, 2
+    while i < len(argv):
+        a, val = argv[i], None
+        if "=" in a and a.startswith("--"): a, val = a.split("=", 1)
+        if a in ("-p", "--port", "-i", "--ip", "--host"):
+            if val is None:
+                if i + 1 >= len(argv): raise NativeUnsupported(f"{a} 缺少值")
+                val = argv[i + 1]; i += 1
+            if a in ("-p", "--port"):
+                if not val.isdigit(): raise NativeUnsupported(f"端口 {val}")
+                opt["port"] = int(val)
+            else:
+                opt["host"] = val
+        elif a in ("-l", "--log"): opt["log"] = True
+        elif a in ("-o", "--open"): opt["open"] = True
+        elif a in ("-s", "--static"): pass  # 本来就只托管静态文件
+        else: raise NativeUnsupported(a)
+        i += 1
+    return opt
+
+class ServeCache:
+    """小文件的内存 LRU：键为 (路径, 编码)，按 mtime/大小校验，总量超过 ServeCacheBytes 时淘汰最久未用的"""
+    def __init__(self):
+        self.Items = OrderedDict()
+        self.Bytes = 0
+        self.Lock = threading.Lock()
+
+    def Get(self, key, st):
+        with self.Lock:
+            it = self.Items.get(key)
+            if it is None or it[0] != (st.st_mtime_ns, st.st_size): return None
+            self.Items.move_to_end(key)
+            return it[1]
+
+    def Put(self, key, st, data: bytes):
+        if len(data) > ServeCacheFileMax: return
+        with self.Lock:
+            old = self.Items.pop(key, None)
+            if old is not None: self.Bytes -= len(old[1])
+            self.Items[key] = ((st.st_mtime_ns, st.st_size), data)
+            self.Bytes += len(data)
+            while self.Bytes > ServeCacheBytes and self.Items:
+                _, (_, dropped) = self.Items.popitem(last=False)
+                self.Bytes -= len(dropped)
+
+def AcceptEncodings(header: str) -> dict:
+    """解析 Accept-Encoding，返回 {编码: q}；q=0 表示明确拒绝，* 代表没列出的编码"""
+    out = {}
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name: continue
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.partition("=")
+            if k.strip().lower() == "q":
+                try: q = min(1.0, max(0.0, float(v)))
+                except ValueError: q = 0.0
+        out[name] = q
+    return out
+
+_PreviewHandler = None
+
+def PreviewHandlerClass():
+    """http.server / email.utils / mimetypes 导入要几十毫秒，开原生预览时才定义处理类"""
+    global _PreviewHandler
+    if _PreviewHandler is not None: return _PreviewHandler
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import unquote, urlsplit
+    from email.utils import formatdate, parsedate_to_datetime
+    import mimetypes
+
+    class PreviewHandler(BaseHTTPRequestHandler):
+        """只读静态文件：目录取 index.html，支持 ETag / Last-Modified 协商与预压缩的 .br/.gz"""
+        server_version = "HexoDash"
+        protocol_version = "HTTP/1.1"
+
+        def do_HEAD(self): self.Serve(head=True)
+        def do_GET(self): self.Serve(head=False)
+
+        def log_message(self, fmt, *args): pass  # 无控制台时 stderr 不可用，统计由 PreviewServer 汇总
+
+        def Resolve(self):
+            """把 URL 映射到 public 下的文件，越界或不存在返回 None"""
+            srv = self.server.Owner
+            path = unquote(urlsplit(self.path).path)
+            if not path.startswith(srv.UrlRoot):
+                return None
+            rel = os.path.normpath(path[len(srv.UrlRoot):].lstrip("/")).replace("\\", "/")
+            if rel.startswith("..") or os.path.isabs(rel): return None
+            full = os.path.join(srv.Public, "" if rel == "." else rel)
+            if os.path.isdir(full):
+                if not path.endswith("/"): return ("redirect", path + "/")
+                full = os.path.join(full, "index.html")
+            return full if os.path.isfile(full) else None
+
+        def Serve(self, head: bool):
+            t0, srv = time.perf_counter(), self.server.Owner
+            full, status, size, hit = self.Resolve(), 200, 0, False
+            try:
+                if isinstance(full, tuple):
+                    status = 301
+                    self.send_response(301); self.send_header("Location", full[1])
+                    self.send_header("Content-Length", "0"); self.end_headers()
+                    return
+                if full is None:
+                    status = 404
+                    body = b"404 Not Found"
+                    page = os.path.join(srv.Public, "404.html")
+                    ctype = "text/plain; charset=utf-8"
+                    if os.path.isfile(page):
+                        with open(page, "rb") as f: body = f.read()
+                        ctype = "text/html; charset=utf-8"
+                    self.send_response(404); self.send_header("Content-Type", ctype)
+                    self.send_header("Content-Length", str(len(body))); self.end_headers()
+                    if not head: self.wfile.write(body)
+                    size = len(body)
+                    return
+                st = os.stat(full)
+                send, enc, sst = full, None, st
+                accept = AcceptEncodings(self.headers.get("Accept-Encoding", ""))
+                best = 0.0
+                for name, ext in (("br", ".br"), ("gzip", ".gz")):  # q 相同时优先 br
+                    q = accept.get(name, accept.get("*", 0.0))
+                    if q <= best: continue
+                    try: cst = os.stat(full + ext)
+                    except OSError: continue
+                    if cst.st_mtime_ns >= st.st_mtime_ns:  # 比源文件旧的预压缩文件视为过期
+                        send, enc, sst, best = full + ext, name, cst, q
+                # 三种表示的字节不同，ETag 按编码区分
+                tag = {"br": "-br", "gzip": "-gz"}.get(enc, "")
+                etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}{tag}"'
+                last = formatdate(st.st_mtime, usegmt=True)
+                if self.NotModified(etag, st.st_mtime):
+                    status = 304
+                    self.send_response(304); self.send_header("ETag", etag); self.send_header("Last-Modified", last)
+                    self.send_header("Vary", "Accept-Encoding")
+                    self.end_headers()
+                    return
+                data = srv.Cache.Get((send, enc), sst)
+                hit = data is not None
+                if data is None and sst.st_size <= ServeCacheFileMax:
+                    with open(send, "rb") as f: data = f.read()
+                    srv.Cache.Put((send, enc), sst, data)
+                ctype = mimetypes.guess_type(full)[0] or "application/octet-stream"
+                if ctype.startswith("text/") or ctype in ("application/javascript", "application/json", "image/svg+xml"):
+                    ctype += "; charset=utf-8"
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(sst.st_size if data is None else len(data)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last)
+                self.send_header("Cache-Control", "no-cache")  # 每次都协商，重新生成后立即生效
+                self.send_header("Vary", "Accept-Encoding")
+                if enc: self.send_header("Content-Encoding", enc)
+                self.end_headers()
+                size = sst.st_size
+                if head: return
+                if data is not None:
+                    self.wfile.write(data)
+                else:
+                    with open(send, "rb") as f: shutil.copyfileobj(f, self.wfile, ReadChunkBytes)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                srv.Record(self, status, size, (time.perf_counter() - t0) * 1000, hit)
+
+        def NotModified(self, etag: str, mtime: float) -> bool:
+            inm = self.headers.get("If-None-Match")
+            if inm is not None:
+                return etag in [t.strip().removeprefix("W/") for t in inm.split(",")] or inm.strip() == "*"
+            ims = self.headers.get("If-Modified-Since")
+            if ims:
+                try: return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+                except (TypeError, ValueError): return False
+            return False
+
+    _PreviewHandler = PreviewHandler
+    return PreviewHandler
+
+class PreviewServer:
+    """用多线程 HTTP 服务托管已生成的 public/，代替 hexo server；Run 阻塞到 Shutdown"""
+    def __init__(self, root: str, cmd: str):
+        opt = ParseServeCmd(cmd)
+        if opt is None: raise NativeUnsupported("不是 hexo server")
+        cfg = ReadSiteConfig(root)
+        self.Public = os.path.join(root, str(cfg.get("public_dir") or "public"))
+        if not os.path.isfile(os.path.join(self.Public, "index.html")):
+            raise NativeUnsupported("public 里还没有生成好的页面")
+        self.UrlRoot = "/" + str(cfg.get("root") or "/").strip("/")
+        self.UrlRoot = self.UrlRoot.rstrip("/") + "/"
+        self.Opt = opt
+        self.Cache = ServeCache()
+        self.Lock = threading.Lock()
+        self.Count, self.Total, self.Hits, self.Bytes, self.Recent = 0, 0.0, 0, 0, []
+        self.Emit = None
+        t = time.perf_counter()
+        from http.server import ThreadingHTTPServer
+        self.Httpd = ThreadingHTTPServer((opt["host"], opt["port"]), PreviewHandlerClass())
+        self.Httpd.daemon_threads = True
+        self.Httpd.Owner = self
+        self.StartMs = (time.perf_counter() - t) * 1000
+
+    def Url(self) -> str:
+        host = self.Opt["host"]
+        host = "localhost" if host in ("0.0.0.0", "::", "") else host
+        return f"http://{host}:{self.Opt['port']}{self.UrlRoot}"
+
+    def Record(self, req, status: int, size: int, ms: float, hit: bool):
+        with self.Lock:
+            self.Count += 1; self.Total += ms; self.Bytes += size; self.Hits += hit
+            self.Recent = (self.Recent + [ms])[-500:]
+        if self.Opt["log"] and self.Emit is not None:
+            col = "32" if status < 300 else "36" if status < 400 else "31"
+            self.Emit(f"\x1b[{col}m{status}\x1b[0m {req.command} {req.path} \x1b[90m{ms:.1f} ms\x1b[0m\n")
+
+    def Stats(self) -> str:
+        with self.Lock:
+            if not self.Count: return "等待请求…"
+            recent = sorted(self.Recent)
+            p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))]
+            return (f"请求 {self.Count}  平均 {self.Total / self.Count:.1f} ms  p95 {p95:.1f} ms  "
+                    f"缓存命中 {self.Hits * 100 // self.Count}%  {FormatBytes(self.Bytes)}")
+
+    def Run(self, emit, note, stopped):
+        """（后台线程）服务直到 Shutdown；stopped() 为真时也会退出。每 ServeStatsSec 秒刷新一次统计"""
+        self.Emit = emit
+        emit(f"\x1b[36m[原生预览]\x1b[0m {self.Url()} （托管 {self.Public}，启动 {self.StartMs:.0f} ms）\n")
+        if self.Opt["open"]:
+            import webbrowser
+            webbrowser.open(self.Url())
+        th = threading.Thread(target=self.Httpd.serve_forever, kwargs={"poll_interval": 0.2}, daemon=True)
+        th.start()
+        last = None
+        while th.is_alive() and not stopped():
+            th.join(ServeStatsSec)
+            text = self.Stats()
+            if text != last: note(text); last = text
+        self.Shutdown()
+
+    def Shutdown(self):
+        threading.Thread(target=self.Close, daemon=True).start()  # shutdown() 会等 serve_forever 返回，不在界面线程里等
+
+    def Close(self):
+        try: self.Httpd.shutdown(); self.Httpd.server_close()
+        except Exception: pass
+
+# =============== 文件监听（代替 --watch） ===============
+_IN_MODIFY, _IN_CLOSE_WRITE, _IN_MOVED_FROM, _IN_MOVED_TO = 0x2, 0x8, 0x40, 0x80
+_IN_CREATE, _IN_DELETE, _IN_DELETE_SELF = 0x100, 0x200, 0x400
+_IN_Q_OVERFLOW, _IN_IGNORED, _IN_ONLYDIR, _IN_ISDIR = 0x4000, 0x8000, 0x01000000, 0x40000000
+_IN_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF
+
+def WatchIgnored(rel: str) -> bool:
+    """编辑器临时文件、备份文件、node_modules 等不触发生成"""
+    parts = rel.split("/")
+    if any(p in WatchSkipDirs for p in parts[:-1]): return True
+    return any(fnmatch.fnmatch(parts[-1], pat) for pat in WatchIgnore)
+
+class FileWatcher:
+    """监听 source/、themes/ 与站点根目录的配置文件：Linux 用 inotify（ctypes，逐目录添加监听），
+       其它平台或 inotify 不可用（监听数上限等）时定时扫描比对。
+       Next() 阻塞到一批改动安静下来（Debounce 秒内没有新事件），返回改动文件的相对路径集合，"*" 表示事件溢出。"""
+    def __init__(self, root: str, debounce_ms: int = WatchDebounceMs):
+        self.Root, self.Debounce = root, debounce_ms / 1000
+        self.Dirs = [str(ReadSiteConfig(root).get("source_dir") or "source"), "themes"]
+        self.Closed = False
+        self.Fd, self.Wds, self.Libc = None, {}, None
+        self.Mode, self.Why = "poll", ""
+        if sys.platform.startswith("linux"):
+            try:
+                self.InitInotify()
+                self.Mode = "inotify"
+            except OSError as e:
+                self.Why = str(e)
+                self.CloseFd()
+        if self.Mode == "poll":
+            self.Snap, self.NextScan = self.Snapshot(), time.perf_counter() + WatchPollSec
+
+    # ---- inotify ----
+    def InitInotify(self):
+        import ctypes, ctypes.util
+        self.Libc = libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0: raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.Fd = fd
+        self.AddWatch("")  # 根目录只看配置文件
+        for d in self.Dirs:
+            if os.path.isdir(os.path.join(self.Root, d)): self.AddTree(d)
+
+    def AddWatch(self, rel: str):
+        import ctypes
+        wd = self.Libc.inotify_add_watch(self.Fd, os.fsencode(os.path.join(self.Root, rel)), _IN_MASK | _IN_ONLYDIR)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (2, 20): return  # ENOENT / ENOTDIR：刚被删掉
+            raise OSError(err, "inotify 监听数已达上限（fs.inotify.max_user_watches）" if err == 28 else os.strerror(err))
+        self.Wds[wd] = rel
+
+    def AddTree(self, rel: str):
+        stack = [rel]
+        while stack:
+            cur = stack.pop()
+            self.AddWatch(cur)
+            try:
+                with os.scandir(os.path.join(self.Root, cur)) as it:
+                    for e in it:
+                        if e.is_dir(follow_symlinks=False) and e.name not in WatchSkipDirs:
+                            stack.append(f"{cur}/{e.name}")
+            except OSError:
+                pass
+
+    def ReadEvents(self, timeout: float) -> set:
+        try:
+            if not select.select([self.Fd], [], [], timeout)[0]: return set()
+            data = os.read(self.Fd, 65536)
+        except (BlockingIOError, InterruptedError):
+            return set()
+        except (OSError, ValueError):
+            self.Closed = True
+            return set()
+        out, i = set(), 0
+        while i + 16 <= len(data):
+            wd, mask, _, n = struct.unpack_from("iIII", data, i)
+            name = os.fsdecode(data[i + 16:i + 16 + n].rstrip(b"\0"))
+            i += 16 + n
+            if mask & _IN_Q_OVERFLOW:
+                out.add("*"); continue
+            base = self.Wds.get(wd)
+            if base is None: continue
+            if mask & _IN_IGNORED:
+                self.Wds.pop(wd, None); continue
+            if base == "":  # 根目录
+                if not any(fnmatch.fnmatch(name, pat) for pat in ConfigPatterns): continue
+                out.add(name); continue
+            rel = f"{base}/{name}" if name else base
+            if WatchIgnored(rel): continue
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                try: self.AddTree(rel)
+                except OSError: pass
+            out.add(rel)
+        return out
+
+    # ---- 轮询 ----
+    def Snapshot(self) -> dict:
+        snap = ScanTree(self.Root, self.Dirs, skip=frozenset(WatchSkipDirs))
+        try:
+            for name in os.listdir(self.Root):
+                if any(fnmatch.fnmatch(name, pat) for pat in ConfigPatterns):
+                    try: st = os.stat(os.path.join(self.Root, name)); snap[name] = (st.st_mtime_ns, st.st_size)
+                    except OSError: pass
+        except OSError:
+            pass
+        return snap
+
+    def PollChanges(self, timeout: float) -> set:
+        wait = self.NextScan - time.perf_counter()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            if time.perf_counter() < self.NextScan: return set()
+        new = self.Snapshot()
+        self.NextScan = time.perf_counter() + WatchPollSec
+        old, self.Snap = self.Snap, new
+        return {r for r in set(old) | set(new) if old.get(r) != new.get(r) and not WatchIgnored(r)}
+
+    # ---- 对外 ----
+    def Next(self, stopped) -> set:
+        """阻塞到下一批安静下来的改动；Close() 或 stopped() 为真时返回 None"""
+        batch, first, last = set(), 0.0, 0.0
+        while not (self.Closed or stopped()):
+            got = self.ReadEvents(0.2) if self.Mode == "inotify" else self.PollChanges(0.2)
+            now = time.perf_counter()
+            if got:
+                if not batch: first = now
+                batch |= got; last = now
+            if batch and (now - last >= self.Debounce or now - first >= WatchMaxWaitSec):
+                return batch
+        return None
+
+    def CloseFd(self):
+        if self.Fd is not None:
+            try: os.close(self.Fd)
+            except OSError: pass
+            self.Fd = None
+
+    def Close(self):
+        """（任意线程）Next 最多 0.2 秒后返回 None"""
+        self.Closed = True
+
+# =============== 生成后处理：站内搜索索引 ===============
+_meta_pat = re.compile(r'<meta\s+[^>]*?(?:property|name)="([^"]+)"[^>]*?content="([^"]*)"', re.I)
+_meta_pat2 = re.compile(r'<meta\s+[^>]*?content="([^"]*)"[^>]*?(?:property|name)="([^"]+)"', re.I)
+_drop_blocks = re.compile(r"<(script|style|noscript|svg|template)\b.*?</\1\s*>|<!--.*?-->", re.S | re.I)
+_any_tag = re.compile(r"<[^>]+>")
+
+def ExtractPage(html: str):
+    """从生成好的页面取 (标题, 正文纯文本, 标签)；不是文章页（og:type 不是 article 且没有 <article>）返回 None"""
+    import html as htmllib
+    metas = {}
+    for k, v in _meta_pat.findall(html): metas.setdefault(k.lower(), []).append(v)
+    for v, k in _meta_pat2.findall(html): metas.setdefault(k.lower(), []).append(v)
+    og_type = (metas.get("og:type") or [""])[0].lower()
+    lo = html.lower()
+    a, b = lo.find("<article"), lo.rfind("</article>")
+    if og_type and og_type != "article": return None
+    if not og_type and a == -1: return None
+    title = (metas.get("og:title") or [""])[0]
+    if not title:
+        m = re.search(r"<title[^>]*>(.*?)</title>", html, re.S | re.I)
+        title = m.group(1) if m else ""
+    region = html[a:b] if a != -1 and b > a else html
+    text = _any_tag.sub(" ", _drop_blocks.sub(" ", region))
+    text = re.sub(r"\s+", " ", htmllib.unescape(text)).strip()
+    tags = [htmllib.unescape(t) for t in metas.get("article:tag", [])]
+    return htmllib.unescape(title).strip(), text, tags
+
+def _search_batch(public: str, rels: list) -> list:
+    """（子进程）返回 [(相对路径, [mtime, 大小, 条目或 None] 或 None)]"""
+    out = []
+    for rel in rels:
+        path = os.path.join(public, rel)
+        try:
+            st = os.stat(path)
+            with open(path, "rb") as f: page = ExtractPage(f.read().decode("utf-8", "replace"))
+            out.append((rel, [st.st_mtime_ns, st.st_size, list(page) if page else None]))
+        except OSError:
+            out.append((rel, None))
+    return out
+
+def ReadSearchConfig(root: str) -> dict:
+    """hexo-generator-search / searchdb 的 search: 配置，取 path；没装 PyYAML 时用正则读这一节"""
+    sec = ReadSiteConfig(root).get("search")
+    if not isinstance(sec, dict):
+        sec = {}
+        try:
+            with open(os.path.join(root, "_config.yml"), encoding="utf-8-sig", errors="replace") as f: text = f.read()
+            m = re.search(r"^search:[ \t]*\r?\n((?:[ \t]+.*(?:\r?\n|$))+)", text, re.M)
+            if m:
+                for km in re.finditer(r"^[ \t]+([A-Za-z_]\w*):[ \t]*(.*)$", m.group(1), re.M):
+                    sec[km.group(1)] = _yaml_scalar(km.group(2))
+        except OSError:
+            pass
+    return sec
+
+class SearchIndexer:
+    """从 public/ 里生成好的文章页提取标题、URL 与正文，写出本地搜索索引，可代替 hexo-generator-search(db)：
+       输出路径取 _config.yml 的 search.path（默认 search.json），.xml 写成插件的 XML 格式，其它写紧凑 JSON 数组
+       [{"title", "url", "content", "categories", "tags"}]，主题不用改。
+       .hexodash/search.json 缓存每页的提取结果，只重新提取 mtime/大小变了的页面。"""
+    def __init__(self, root: str):
+        self.Root = root
+        cfg = ReadSiteConfig(root)
+        self.PublicRel = str(cfg.get("public_dir") or "public").strip("/\\")
+        self.Public = os.path.join(root, self.PublicRel)
+        self.UrlRoot = "/" + str(cfg.get("root") or "/").strip("/")
+        self.UrlRoot = self.UrlRoot.rstrip("/") + "/"
+        self.Out = str(ReadSearchConfig(root).get("path") or "search.json").lstrip("/")
+        self.CachePath = StatePath(root, "search.json")
+        self.Cache = _load_json(self.CachePath, {}).get("pages", {})
+
+    def Pages(self) -> dict:
+        k = len(self.PublicRel) + 1
+        out = {}
+        for r, v in ScanTree(self.Root, [self.PublicRel], skip=frozenset()).items():
+            rel = r[k:]
+            if not rel.lower().endswith(".html") or rel.split("/", 1)[0] in SearchSkipDirs: continue
+            if rel == "index.html" or rel == "404.html": continue
+            out[rel] = v
+        return out
+
+    def Url(self, rel: str) -> str:
+        return self.UrlRoot + (rel[:-len("index.html")] if rel.endswith("index.html") else rel)
+
+    def Run(self, emit) -> dict:
+        import html as htmllib
+        t0 = time.perf_counter()
+        if not os.path.isdir(self.Public):
+            emit("\x1b[33m[搜索索引] 没有 public 目录，跳过\x1b[0m\n")
+            return {}
+        pages = self.Pages()
+        cache = {r: self.Cache[r] for r, (m, n) in pages.items()
+                 if r in self.Cache and self.Cache[r][0] == m and self.Cache[r][1] == n}
+        todo = [r for r in pages if r not in cache]
+        if len(todo) > SearchProcessMin:
+            chunks = [todo[i:i + 64] for i in range(0, len(todo), 64)]
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(chunks))) as pool:
+                for res in pool.map(_search_batch, [self.Public] * len(chunks), chunks):
+                    cache.update((r, e) for r, e in res if e is not None)
+        elif todo:
+            cache.update((r, e) for r, e in _search_batch(self.Public, todo) if e is not None)
+        entries = []
+        for rel in sorted(cache):
+            page = cache[rel][2]
+            # content 与插件一样是 HTML（主题用 innerHTML 插入），XML/JSON 两种格式都转义纯文本
+            if page: entries.append({"title": page[0], "url": self.Url(rel), "content": htmllib.escape(page[1], quote=False),
+                                     "categories": [], "tags": page[2]})
+        path = os.path.join(self.Public, self.Out)
+        data = self.RenderXml(entries) if self.Out.lower().endswith(".xml") else \
+            json.dumps(entries, ensure_ascii=False, separators=(",", ":"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f: f.write(data)
+        os.replace(path + ".tmp", path)
+        try: _save_json(self.CachePath, {"pages": cache})
+        except OSError: pass
+        secs = time.perf_counter() - t0
+        size = os.path.getsize(path)
+        emit(f"\x1b[36m[搜索索引]\x1b[0m {self.Out}：{len(entries)} 篇，重新提取 {len(todo)} 页，"
+             f"{FormatBytes(size)}，用时 {secs:.2f}s\n")
+        return {"entries": len(entries), "extracted": len(todo), "bytes": size, "secs": secs, "path": self.Out}
+
+    @staticmethod
+    def RenderXml(entries: list) -> str:
+        """与 hexo-generator-search 的 search.xml 结构一致"""
+        from xml.sax.saxutils import escape, quoteattr
+        cdata = lambda s: "<![CDATA[" + s.replace("]]>", "]]]]><![CDATA[>") + "]]>"
+        out = ['<?xml version="1.0" encoding="utf-8"?>', "<search>"]
+        for e in entries:
+            out.append(f"<entry><title>{escape(e['title'])}</title><link href={quoteattr(e['url'])}/>"
+                       f"<url>{escape(e['url'])}</url><content type=\"html\">{cdata(e['content'])}</content>"
+                       f"<categories>{''.join(f'<category>{escape(c)}</category>' for c in e['categories'])}</categories>"
+                       f"<tags>{''.join(f'<tag>{escape(t)}</tag>' for t in e['tags'])}</tags></entry>")
+        out.append("</search>")
+        return "\n".join(out)
+
+# =============== 生成后处理：压缩代码（minify） ===============
+class MinifyError(Exception):
+    """拿不准的输入（未闭合的 <pre>、字符串、注释等），原文件保持不动"""
+
+_html_keep = re.compile(r"""<(pre|textarea|script|style|code|kbd|samp)\b(?:"[^"]*"|'[^']*'|[^'">])*>.*?</\1\s*>|<!--\[if.*?<!\[endif\]-->|<!--.*?-->""", re.S | re.I)
+_html_open = re.compile(r"<(pre|textarea|script|style|code|kbd|samp)\b", re.I)
+_html_pre_style = re.compile(r"""\sstyle\s*=\s*(?:"[^"]*|'[^']*|[^\s>]*)white-space\s*:\s*(?:pre|break-spaces)""", re.I)
+_html_tag = re.compile(r"""<(?:"[^"]*"|'[^']*'|[^'">])*>""")  # 引号里的 > 不算标签结束
+
+def _html_text_ws(seg: str) -> str:
+    """标签之间的空白：含换行的折叠成一个换行，否则折叠成一个空格；标签内部（属性值）原样保留"""
+    out, pos = [], 0
+    for m in _html_tag.finditer(seg):
+        out.append(re.sub(r"\s+", lambda w: "\n" if "\n" in w.group() else " ", seg[pos:m.start()]))
+        out.append(m.group())
+        pos = m.end()
+    out.append(re.sub(r"\s+", lambda w: "\n" if "\n" in w.group() else " ", seg[pos:]))
+    return "".join(out)
+
+def MinifyHtml(text: str) -> str:
+    """保守的 HTML 压缩：去掉普通注释、折叠标签间空白；<pre>/<textarea>/<script>/<code>/<kbd>/<samp> 原样保留，
+       <style> 内按 CSS 压缩；有行内 white-space:pre 样式的页面不动（那些元素里的空白有意义）"""
+    if _html_pre_style.search(text): raise MinifyError("有 white-space:pre 的行内样式")
+    out, pos = [], 0
+    for m in _html_keep.finditer(text):
+        seg = text[pos:m.start()]
+        if _html_open.search(seg): raise MinifyError("有未闭合的 pre/textarea/script/style/code")  # 块外面还有开标签 = 没闭合
+        out.append(_html_text_ws(seg))
+        block, tag = m.group(), (m.group(1) or "").lower()
+        if tag:
+            if tag == "style":
+                head = block[:block.index(">") + 1]
+                tail = block[block.lower().rindex("</style"):]
+                block = head + MinifyCss(block[len(head):len(block) - len(tail)]) + tail
+            out.append(block)
+        elif block.startswith("<!--[if") or block.startswith("<!--!"):
+            out.append(block)  # 条件注释、显式保留的注释
+        pos = m.end()
+    if _html_open.search(text, pos): raise MinifyError("有未闭合的 pre/textarea/script/style/code")
+    out.append(_html_text_ws(text[pos:]))
+    return "".join(out).strip() + "\n"
+
+_css_tok = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|url\(\s*[^)"\']*\)|/\*.*?\*/|\s+|[{};,>]|[^\s"\'{};,>/]+|/', re.S | re.I)
+
+def MinifyCss(text: str) -> str:
+    """去注释（/*! 保留）、折叠空白、去掉 { } ; , > 两侧及声明里冒号后的空格；字符串与 url() 原样保留"""
+    toks, pos, depth = [], 0, 0
+    for m in _css_tok.finditer(text):
+        if m.start() != pos: raise MinifyError("无法解析的 CSS")
+        t, pos = m.group(), m.end()
+        if t.startswith("/*"):
+            if t.startswith("/*!"): toks.append(t)
+            continue
+        if t[0] in "\"'" and (len(t) < 2 or t[-1] != t[0]): raise MinifyError("未闭合的字符串")
+        if t.isspace():
+            if toks and toks[-1] not in ("{", "}", ";", ",", ">", " ") and not (depth > 0 and toks[-1].endswith(":")):
+                toks.append(" ")
+            continue
+        if t == "{": depth += 1
+        elif t == "}": depth -= 1
+        if t in ("{", "}", ";", ",", ">") and toks and toks[-1] == " ": toks.pop()
+        if t == "}" and toks and toks[-1] == ";": toks.pop()
+        toks.append(t)
+    if pos != len(text) or depth != 0: raise MinifyError("CSS 括号不配对")
+    return "".join(toks).strip()
+
+_js_kw_before_regex = {"return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw",
+                       "case", "do", "else", "yield", "await"}
+_js_tight = set("{}()[];,:=")
+
+def MinifyJs(text: str) -> str:
+    """保守的 JS 压缩：去注释（/*! 保留）与缩进、合并空行、去掉括号/分号/逗号/等号两侧的空格；
+       换行全部保留（不依赖自动补分号的判断）。字符串、模板字符串、正则字面量原样保留，拿不准就抛 MinifyError。"""
+    out, i, n = [], 0, len(text)
+    prev = ""          # 上一个有意义的记号（判断 / 是除号还是正则）
+    stack = []         # 模板字符串 ${ 的嵌套层数
+    def regex_ok():
+        return prev == "" or prev in "(,=:[!&|?{};+-*%<>~^" or prev in _js_kw_before_regex
+    while i < n:
+        c = text[i]
+        if c in " \t\r\f\v":
+            j = i
+            while j < n and text[j] in " \t\r\f\v": j += 1
+            if out and out[-1] not in ("\n", " "): out.append(" ")
+            i = j; continue
+        if c == "\n":
+            if out and out[-1] == " ": out.pop()
+            if out and out[-1] != "\n": out.append("\n")
+            i += 1; continue
+        if text.startswith("//", i):
+            j = text.find("\n", i)
+            i = n if j == -1 else j; continue
+        if text.startswith("/*", i):
+            j = text.find("*/", i + 2)
+            if j == -1: raise MinifyError("未闭合的注释")
+            if text.startswith("/*!", i): out.append(text[i:j + 2])
+            elif "\n" in text[i:j] and out and out[-1] != "\n": out.append("\n")  # 多行注释按换行处理（可能承担分号）
+            i = j + 2; continue
+        if c in "\"'":
+            j = i + 1
+            while j < n and text[j] != c:
+                if text[j] == "\\": j += 1
+                elif text[j] == "\n": raise MinifyError("字符串中有换行")
+                j += 1
+            if j >= n: raise MinifyError("未闭合的字符串")
+            out.append(text[i:j + 1]); prev = "str"; i = j + 1; continue
+        if c == "`" or (c == "}" and stack and stack[-1] == 0):
+            if c == "}": stack.pop()
+            j = i + 1
+            while j < n and text[j] != "`":
+                if text[j] == "\\": j += 1
+                elif text.startswith("${", j): break
+                j += 1
+            if j >= n: raise MinifyError("未闭合的模板字符串")
+            if text[j] == "$":
+                stack.append(0); out.append(text[i:j + 2]); prev = "{"; i = j + 2
+            else:
+                out.append(text[i:j + 1]); prev = "str"; i = j + 1
+            continue
+        if c == "/" and regex_ok():
+            j, in_class = i + 1, False
+            while j < n:
+                ch = text[j]
+                if ch == "\\": j += 2; continue
+                if ch == "\n": raise MinifyError("无法确定的正则字面量")
+                if ch == "[": in_class = True
+                elif ch == "]": in_class = False
+                elif ch == "/" and not in_class: break
+                j += 1
+            if j >= n: raise MinifyError("未闭合的正则字面量")
+            j += 1
+            while j < n and (text[j].isalnum() or text[j] == "_"): j += 1
+            out.append(text[i:j]); prev = "re"; i = j; continue
+        if c.isalnum() or c in "_$" or ord(c) > 127:
+            j = i
+            while j < n and (text[j].isalnum() or text[j] in "_$" or ord(text[j]) > 127): j += 1
+            word = text[i:j]
+            out.append(word); prev = word if not word[0].isdigit() else "num"; i = j
+            if prev not in _js_kw_before_regex: prev = "id"
+            continue
+        if stack:
+            if c == "{": stack[-1] += 1
+            elif c == "}": stack[-1] -= 1
+        if c in _js_tight and out and out[-1] == " ": out.pop()
+        out.append(c); prev = c; i += 1
+        if c in _js_tight:
+            while i < n and text[i] in " \t": i += 1
+    if stack: raise MinifyError("模板字符串未闭合")
+    return "".join(out).strip() + "\n"
+
+_Minifiers = {".html": MinifyHtml, ".css": MinifyCss, ".js": MinifyJs}
+
+def _minify_batch(public: str, store: str, items: list) -> list:
+    """（子进程）items 为 [(相对路径, 缓存记录 [mtime, 大小, 输入哈希（带 MinifyRules）, 输出哈希])]。
+       文件内容就是上次的输出 → 跳过；输入哈希在 store 里有结果 → 直接套用；否则压缩并存入 store。
+       返回 [(相对路径, 类型, 状态 minified/cached/skipped/failed, mtime, 大小, 输入哈希, 输出哈希, 原大小, 秒, 错误)]"""
+    out = []
+    for rel, entry in items:
+        t0, path = time.perf_counter(), os.path.join(public, rel)
+        ext = os.path.splitext(rel)[1].lower()
+        try:
+            with open(path, "rb") as f: raw = f.read()
+            h = hashlib.blake2b(raw, digest_size=16).hexdigest()
+            if entry and h == entry[3]:
+                st = os.stat(path)
+                out.append((rel, ext, "skipped", st.st_mtime_ns, st.st_size, entry[2], h, len(raw), 0.0, None))
+                continue
+            key = hashlib.blake2b(raw, digest_size=16, person=MinifyRules).hexdigest()  # 结果缓存的键带规则版本
+            cached = os.path.join(store, key[:2], key)
+            state = "cached"
+            try:
+                with open(cached, "rb") as f: data = f.read()
+            except OSError:
+                state = "minified"
+                try:
+                    data = _Minifiers[ext](raw.decode("utf-8")).encode("utf-8")
+                except (MinifyError, UnicodeDecodeError, RecursionError) as e:
+                    st = os.stat(path)  # 记下 mtime/大小，文件不变就不再重试
+                    out.append((rel, ext, "failed", st.st_mtime_ns, st.st_size, None, None, len(raw),
+                                time.perf_counter() - t0, str(e)))
+                    continue
+                if len(data) >= len(raw): data = raw  # 没变小就不改
+                os.makedirs(os.path.dirname(cached), exist_ok=True)
+                with open(cached + ".tmp", "wb") as f: f.write(data)
+                os.replace(cached + ".tmp", cached)
+            if data != raw:
+                with open(path + ".tmp", "wb") as f: f.write(data)
+                os.replace(path + ".tmp", path)
+            st = os.stat(path)
+            out.append((rel, ext, state, st.st_mtime_ns, st.st_size, key,
+                        hashlib.blake2b(data, digest_size=16).hexdigest(), len(raw), time.perf_counter() - t0, None))
+        except OSError as e:
+            out.append((rel, ext, "failed", None, None, None, None, 0, time.perf_counter() - t0, str(e)))
+    return out
+
+class Minifier:
+    """生成后用多进程压缩 public/ 里的 HTML/CSS/JS（纯 Python，保守规则，失败的文件保持原样）。
+       .hexodash/minify.json 记录 {相对路径: [mtime, 大小, 输入哈希, 输出哈希]}，.hexodash/minify/ 按输入哈希存结果：
+       文件没被重新生成的跳过，重新生成但内容与以前相同的直接套用旧结果（hexo clean 之后也是）。"""
+    def __init__(self, root: str):
+        self.Root = root
+        self.PublicRel = str(ReadSiteConfig(root).get("public_dir") or "public").strip("/\\")
+        self.Public = os.path.join(root, self.PublicRel)
+        self.CachePath = StatePath(root, "minify.json")
+        self.Store = StatePath(root, "minify")
+        data = _load_json(self.CachePath, {})
+        self.Cache, self.Runs = data.get("files", {}), data.get("runs", [])
+        if data.get("rules") != MinifyRules.decode():  # 规则变了：以前失败的文件再试一次
+            self.Cache = {rel: c for rel, c in self.Cache.items() if c[2]}
+
+    def Eligible(self) -> dict:
+        k = len(self.PublicRel) + 1
+        stats = ScanTree(self.Root, [self.PublicRel], skip=frozenset())
+        return {r[k:]: v for r, v in stats.items()
+                if r.lower().endswith(MinifyExts) and not re.search(r"\.min\.(js|css)$", r, re.I)}
+
+    def Run(self, emit) -> dict:
+        t0 = time.perf_counter()
+        if not os.path.isdir(self.Public):
+            emit("\x1b[33m[压缩代码] 没有 public 目录，跳过\x1b[0m\n")
+            return {}
+        cache, todo, per = {}, [], {}
+        for rel, (m, n) in self.Eligible().items():
+            c = self.Cache.get(rel)
+            if c and c[0] == m and c[1] == n:
+                cache[rel] = c
+                per.setdefault(os.path.splitext(rel)[1].lower(), {"files": 0, "minified": 0, "cached": 0, "skipped": 0,
+                                                                   "failed": 0, "secs": 0.0, "before": 0, "after": 0})["skipped"] += 1
+            else:
+                todo.append((rel, c))
+        failed = []
+        if todo:
+            batches = [todo[i:i + MinifyBatch] for i in range(0, len(todo), MinifyBatch)]
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(batches))) as pool:
+                for res in pool.map(_minify_batch, [self.Public] * len(batches), [self.Store] * len(batches), batches):
+                    for rel, ext, state, m, n, hin, hout, before, secs, err in res:
+                        d = per.setdefault(ext, {"files": 0, "minified": 0, "cached": 0, "skipped": 0,
+                                                 "failed": 0, "secs": 0.0, "before": 0, "after": 0})
+                        d[state] += 1; d["secs"] += secs
+                        if state == "failed":
+                            failed.append(f"{rel}: {err}")
+                            if m is not None: cache[rel] = [m, n, None, None]
+                            continue
+                        if state != "skipped": d["before"] += before; d["after"] += n
+                        cache[rel] = [m, n, hin, hout]
+        self.Cache = cache
+        self.Prune()
+        try: _save_json(self.CachePath, {"files": cache, "runs": self.Runs, "rules": MinifyRules.decode()})
+        except OSError as e: failed.append(str(e))
+        secs = time.perf_counter() - t0
+        total = {k: sum(d[k] for d in per.values()) for k in ("minified", "cached", "skipped", "failed", "before", "after")}
+        bad = f"失败 {total['failed']} 个（保持原样），" if total["failed"] else ""
+        emit(f"\x1b[36m[压缩代码]\x1b[0m 压缩 {total['minified']} 个，复用 {total['cached']} 个，跳过 {total['skipped']} 个，"
+             f"{bad}节省 {FormatBytes(total['before'] - total['after'])}，用时 {secs:.2f}s\n")
+        for ext, d in sorted(per.items()):
+            if not (d["minified"] or d["cached"] or d["failed"]): continue
+            emit(f"\x1b[90m    {ext[1:]:<5} 处理 {d['minified'] + d['cached']:>5} 个  {d['secs']:.2f}s（各进程合计）"
+                 f"  {FormatBytes(d['before'])} → {FormatBytes(d['after'])}\x1b[0m\n")
+        for e in failed[:ManifestShowFiles]:
+            emit(f"\x1b[33m    {e}\x1b[0m\n")
+        return {"types": per, "secs": secs, **total}
+
+    def Prune(self):
+        """只保留最近 MinifyKeepCache 次运行引用过的结果，避免 .hexodash/minify 无限增长"""
+        used = sorted({c[2] for c in self.Cache.values() if c[2]})
+        self.Runs = (self.Runs + [used])[-MinifyKeepCache:]
+        keep = set().union(*map(set, self.Runs))
+        try:
+            for sub in os.listdir(self.Store):
+                d = os.path.join(self.Store, sub)
+                for name in os.listdir(d):
+                    if name not in keep and not name.endswith(".tmp"):
+                        try: os.unlink(os.path.join(d, name))
+                        except OSError: pass
+        except OSError:
+            pass
+
+# =============== 生成后处理：预压缩 ===============
+def _brotli():
+    """brotli / brotlicffi 都是可选依赖，没有就只生成 .gz"""
+    for name in ("brotli", "brotlicffi"):
+        try: return __import__(name)
+        except ImportError: pass
+    return None
+
+def _write_variant(path: str, data, src_mtime_ns: int) -> int:
+    """写入压缩副本并让它的 mtime 不早于源文件（原生预览据此判断是否过期）；data 为 None 时删掉旧副本"""
+    if data is None:
+        try: os.unlink(path)
+        except OSError: pass
+        return 0
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f: f.write(data)
+    os.utime(tmp, ns=(src_mtime_ns, src_mtime_ns))
+    os.replace(tmp, path)
+    return len(data)
+
+def _variants_ok(path: str, entry, want_br: bool) -> bool:
+    """缓存记录对应的压缩副本是否都还在；大小记 0 表示压缩后不更小、本就不生成副本"""
+    if not entry: return False
+    gz_ok = entry[3] == 0 or (entry[3] is not None and os.path.exists(path + ".gz"))
+    br_ok = not want_br or entry[4] == 0 or (entry[4] is not None and os.path.exists(path + ".br"))
+    return gz_ok and br_ok
+
+def _compress_batch(public: str, items: list, want_br: bool) -> list:
+    """（子进程）items 为 [(相对路径, 缓存记录), ...]；内容哈希没变且副本都在的跳过。
+       返回 [(相对路径, 哈希, mtime_ns, 原大小, gz 大小, br 大小, 是否实际压缩, 错误)]"""
+    br = _brotli() if want_br else None
+    out = []
+    for rel, entry in items:
+        path = os.path.join(public, rel)
+        try:
+            with open(path, "rb") as f: data = f.read()
+            mtime = os.stat(path).st_mtime_ns
+            h = hashlib.blake2b(data, digest_size=16).hexdigest()
+            if entry and h == entry[2] and _variants_ok(path, entry, br is not None):
+                for ext in (".gz", ".br"):  # 内容没变但源文件被重写过（generate --force）：副本跟上新 mtime，预览才不会当成过期
+                    try: os.utime(path + ext, ns=(mtime, mtime))
+                    except OSError: pass
+                out.append((rel, h, mtime, len(data), entry[3], entry[4], False, None))
+                continue
+            gz = gzip.compress(data, 9, mtime=0)
+            gz_n = _write_variant(path + ".gz", gz if len(gz) < len(data) else None, mtime)
+            br_n = None
+            if br is not None:
+                b = br.compress(data, quality=11)
+                br_n = _write_variant(path + ".br", b if len(b) < len(data) else None, mtime)
+            out.append((rel, h, mtime, len(data), gz_n, br_n, True, None))
+        except OSError as e:
+            out.append((rel, None, None, 0, None, None, False, str(e)))
+    return out
+
+class Precompressor:
+    """生成后把 public/ 里的 html/css/js/xml/json/svg 预压缩成 .gz（装了 brotli 再加 .br），用多进程跑满所有核。
+       缓存 .hexodash/compress.json 记录 {相对路径: [mtime_ns, 大小, 内容哈希, gz 大小, br 大小]}：
+       mtime/大小没变且副本都在的直接跳过，变了的再比内容哈希（hexo clean 后内容没变的文件也只需补回副本）。"""
+    def __init__(self, root: str):
+        self.Root = root
+        self.PublicRel = str(ReadSiteConfig(root).get("public_dir") or "public").strip("/\\")
+        self.Public = os.path.join(root, self.PublicRel)
+        self.CachePath = StatePath(root, "compress.json")
+        self.Cache = _load_json(self.CachePath, {}).get("files", {})
+        self.Brotli = _brotli() is not None
+
+    def Eligible(self) -> dict:
+        k = len(self.PublicRel) + 1
+        stats = ScanTree(self.Root, [self.PublicRel], skip=frozenset())
+        return {r[k:]: v for r, v in stats.items() if r.lower().endswith(PostExts) and v[1] >= CompressMinBytes}
+
+    def Run(self, emit) -> dict:
+        t0 = time.perf_counter()
+        if not os.path.isdir(self.Public):
+            emit("\x1b[33m[预压缩] 没有 public 目录，跳过\x1b[0m\n")
+            return {}
+        files = self.Eligible()
+        cache, todo, skipped = {}, [], 0
+        for rel, (m, n) in files.items():
+            c = self.Cache.get(rel)
+            if c and c[0] == m and c[1] == n and _variants_ok(os.path.join(self.Public, rel), c, self.Brotli):
+                cache[rel] = c; skipped += 1
+            else:
+                todo.append((rel, c))
+        done, errors = 0, []
+        orig = gz = br = 0
+        if todo:
+            batches = [todo[i:i + CompressBatch] for i in range(0, len(todo), CompressBatch)]
+            workers = min(os.cpu_count() or 1, len(batches))
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for res in pool.map(_compress_batch, [self.Public] * len(batches), batches, [self.Brotli] * len(batches)):
+                    for rel, h, m, n, g, b, did, err in res:
+                        if err:
+                            errors.append(f"{rel}: {err}"); continue
+                        if did:
+                            done += 1; orig += n; gz += g or n; br += (b or n) if self.Brotli else 0
+                        else:
+                            skipped += 1
+                        cache[rel] = [m, n, h, g, b]
+        self.Cache = cache
+        try: _save_json(self.CachePath, {"files": cache})
+        except OSError as e: errors.append(str(e))
+        secs = time.perf_counter() - t0
+        msg = f"\x1b[36m[预压缩]\x1b[0m 压缩 {done} 个，跳过 {skipped} 个（未变化）"
+        if done:
+            msg += f"，gzip 节省 {FormatBytes(orig - gz)}（{100 - gz * 100 // max(orig, 1)}%）"
+            if self.Brotli: msg += f"，brotli 节省 {FormatBytes(orig - br)}（{100 - br * 100 // max(orig, 1)}%）"
+        msg += f"，用时 {secs:.2f}s" + ("" if self.Brotli else "（未安装 brotli，仅 .gz）")
+        emit(msg + "\n")
+        for e in errors[:ManifestShowFiles]:
+            emit(f"\x1b[33m    {e}\x1b[0m\n")
+        return {"compressed": done, "skipped": skipped, "saved_gzip": orig - gz,
+                "saved_brotli": orig - br if self.Brotli else None, "secs": secs, "errors": len(errors)}
+
+# =============== 逐步耗时 ===============
+def StepName(cmd: str) -> str:
+    return {"new": "新建", "clean": "清理缓存", "generate": "生成页面", "deploy": "上传仓库",
+            "server": "运行预览"}.get(HexoVerb(cmd) or "", cmd.split()[0] if cmd.split() else cmd)
+
+class StepTimeline:
+    """命令链的逐步记录：每步的墙钟时间、CPU 时间、子进程峰值 RSS、退出码与执行方式（shell/worker/native）。
+       后台线程写，UI 线程读来画时间线；ToDict() 可导出为 JSON。"""
+    def __init__(self, steps: list[str]):
+        self.Cmds = list(steps)
+        self.Started = time.time()
+        self.T0 = time.perf_counter()
+        self.Steps = []
+        self.Lock = threading.Lock()
+
+    def Begin(self, cmd: str) -> dict:
+        step = {"cmd": cmd, "name": StepName(cmd), "verb": HexoVerb(cmd), "kind": "native",
+                "start": time.perf_counter() - self.T0, "wall": None, "cpu": None, "rss_mb": None, "rc": None}
+        with self.Lock: self.Steps.append(step)
+        return step
+
+    def End(self, step: dict, rc: int, kind: str, usage: dict = None):
+        step.update(kind=kind, rc=rc, wall=time.perf_counter() - self.T0 - step["start"])
+        if usage: step.update(cpu=usage.get("cpu"), rss_mb=usage.get("rss_mb"))
+
+    def Snapshot(self) -> tuple[float, list[dict]]:
+        with self.Lock: return time.perf_counter() - self.T0, [dict(x) for x in self.Steps]
+
+    def Summary(self) -> str:
+        total, steps = self.Snapshot()
+        lines = ["\x1b[90m── 步骤耗时 ──\x1b[0m"]
+        for x in steps:
+            wall = x["wall"] if x["wall"] is not None else total - x["start"]
+            bar = "█" * max(1, round(20 * wall / total)) if total > 0 else ""
+            extra = ""
+            if x["cpu"] is not None: extra += f"  CPU {x['cpu']:.1f}s"
+            if x["rss_mb"]: extra += f"  RSS {x['rss_mb']:.0f}MB"
+            rc = "" if x["rc"] in (0, None) else f"  \x1b[31mrc={x['rc']}\x1b[0m"
+            lines.append(f"{x['name']:<6} \x1b[36m{bar:<20}\x1b[0m {wall:7.2f}s  [{x['kind']}]{extra}{rc}")
+        lines.append(f"\x1b[90m合计 {total:.2f}s\x1b[0m")
+        return "\n".join(lines) + "\n"
+
+    def ToDict(self) -> dict:
+        total, steps = self.Snapshot()
+        return {"started": datetime.fromtimestamp(self.Started).strftime("%Y-%m-%d %H:%M:%S"),
+                "total": round(total, 3), "chain": self.Cmds,
+                "steps": [{k: (round(v, 3) if isinstance(v, float) else v) for k, v in x.items()} for x in steps]}
+
+# =============== 生成性能分析（hexo --debug） ===============
+_debug_line = re.compile(r"^(\d\d):(\d\d):(\d\d)\.(\d{3})\s+(DEBUG|INFO|WARN|ERROR|FATAL)\s+(.*)$")
+_debug_events = (  # (正则, 类别, 耗时归属：before = 与上一行的间隔，after = 到下一行的间隔)
+    (re.compile(r"^Plugin loaded:\s*(.+)$"), "plugin", "before"),
+    (re.compile(r"^Script loaded:\s*(.+)$"), "plugin", "before"),
+    (re.compile(r"^Processed:\s*(.+)$"), "source", "before"),
+    (re.compile(r"^Generator:\s*(.+)$"), "generator", "after"),
+    (re.compile(r"^Rendering (?:HTML )?(\S+?):\s*(.+)$"), "render", "after"),
+    (re.compile(r"^Generated:\s*(.+)$"), "write", None),  # 写出时间已算在渲染里，只计数
+)
+ProfilePhases = ("load", "process", "generate", "render", "save")
+ProfileKinds = {"phase": "阶段", "plugin": "插件", "source": "源文件", "generator": "生成器",
+                "layout": "布局", "render": "渲染页面"}
+
+class DebugProfiler:
+    """流式解析 hexo --debug 的带时间戳输出，统计各阶段与每个文件的耗时：
+       load（配置、插件）→ process（Processed: 源文件）→ generate（Generator: 各生成器）→ render（Rendering …）→ save。
+       单行耗时取相邻两行时间戳之差，Hexo 内部是并发的，所以是近似值，用来找最慢的文件和插件足够了。"""
+    def __init__(self):
+        self.Pending = ""
+        self.Events = []   # [时间 ms, 类别, 名称, 附加（布局）]
+        self.Marks = {}    # 阶段 -> 开始时间 ms
+        self.Day = 0.0     # 跨午夜补偿
+
+    def Feed(self, text: str):
+        """（读线程）喂一段输出，可以在行中间截断"""
+        text = self.Pending + text
+        lines = text.split("\n")
+        self.Pending = lines.pop()
+        for ln in lines: self.Line(ln)
+
+    def Line(self, ln: str):
+        m = _debug_line.match(_ansi_pat.sub("", ln).strip("\r "))
+        if not m: return
+        h, mi, sec, ms, level, msg = m.groups()
+        t = ((int(h) * 60 + int(mi)) * 60 + int(sec)) * 1000 + int(ms) + self.Day
+        if self.Events and t < self.Events[-1][0] - 12 * 3600 * 1000:
+            self.Day += 24 * 3600 * 1000; t += 24 * 3600 * 1000
+        kind, name, extra = None, msg, None
+        for pat, k, _ in _debug_events:
+            em = pat.match(msg)
+            if em:
+                kind = k
+                if k == "render": extra, name = em.group(1), em.group(2)
+                else: name = em.group(1)
+                break
+        if not self.Marks: self.Marks["load"] = t
+        phase = {"source": "process", "generator": "generate", "render": "render", "write": "render"}.get(kind)
+        if msg.startswith("Start processing"): phase = "process"
+        if phase and phase not in self.Marks and self.Order(phase) > self.Last():
+            self.Marks[phase] = t
+        if re.match(r"^\d+ files? generated in", msg) or msg.startswith("Database saved"):
+            self.Marks.setdefault("save", t)
+        self.Events.append([t, kind, name.strip(), extra])
+
+    @staticmethod
+    def Order(phase: str) -> int:
+        return ProfilePhases.index(phase)
+
+    def Last(self) -> int:
+        return max((self.Order(p) for p in self.Marks), default=-1)
+
+    def Report(self) -> dict:
+        """{total_ms, phases, items: [{kind, name, ms, start_ms, count}]}，时间相对第一行；
+           items 含阶段、每个插件/源文件/生成器/页面/写出文件，以及按布局汇总的渲染耗时"""
+        ev = self.Events
+        if not ev: return {"total_ms": 0, "phases": [], "items": []}
+        t0, end = ev[0][0], ev[-1][0]
+        attach = {k: how for _, k, how in _debug_events}
+        items, layouts, written = [], {}, 0
+        for i, (t, kind, name, layout) in enumerate(ev):
+            if kind == "write": written += 1
+            if attach.get(kind) is None: continue
+            if attach[kind] == "before": a, b = (ev[i - 1][0] if i else t), t
+            else: a, b = t, (ev[i + 1][0] if i + 1 < len(ev) else t)
+            items.append({"kind": kind, "name": name, "ms": b - a, "start_ms": a - t0, "count": 1})
+            if layout:
+                x = layouts.setdefault(layout, {"kind": "layout", "name": layout, "ms": 0, "start_ms": a - t0, "count": 0})
+                x["ms"] += b - a; x["count"] += 1
+        counted = {"load": "plugin", "process": "source", "generate": "generator"}
+        marks = sorted(self.Marks.items(), key=lambda kv: kv[1])
+        phases = []
+        for j, (name, t) in enumerate(marks):
+            nxt = marks[j + 1][1] if j + 1 < len(marks) else end
+            cnt = written if name == "render" else sum(1 for x in items if x["kind"] == counted.get(name))
+            phases.append({"kind": "phase", "name": name, "ms": nxt - t, "start_ms": t - t0, "count": cnt})
+        return {"total_ms": end - t0, "phases": phases, "items": phases + items + list(layouts.values())}
+
+    @staticmethod
+    def ChromeTrace(report: dict) -> dict:
+        """chrome://tracing / Perfetto 可读的 trace：每个类别一条轨道"""
+        tids = {k: i for i, k in enumerate(ProfileKinds, 1)}
+        events = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": ProfileKinds[k]}}
+                  for k, tid in tids.items()]
+        for x in report["items"]:
+            if x["kind"] == "layout": continue
+            events.append({"name": x["name"], "cat": x["kind"], "ph": "X", "pid": 1, "tid": tids[x["kind"]],
+                           "ts": int(x["start_ms"] * 1000), "dur": max(1, int(x["ms"] * 1000))})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+# =============== 运行历史 ===============
+def _log_codec():
+    """(名称, 压缩函数)：有 zstd（Python 3.14 的 compression.zstd 或 zstandard 包）用 zstd，否则 gzip"""
+    try:
+        from compression import zstd  # type: ignore
+        return "zstd", lambda b: zstd.compress(b, 9)
+    except ImportError:
+        pass
+    try:
+        import zstandard  # 可选依赖
+        return "zstd", zstandard.ZstdCompressor(level=9).compress
+    except ImportError:
+        return "gzip", lambda b: gzip.compress(b, 6, mtime=0)
+
+def _log_decompress(codec: str, data: bytes) -> bytes:
+    if codec == "gzip": return gzip.decompress(data)
+    if codec == "zstd":
+        try:
+            from compression import zstd  # type: ignore
+            return zstd.decompress(data)
+        except ImportError:
+            pass
+        import zstandard  # 可选依赖；没装时由调用方提示
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+class RunHistory:
+    """运行历史：.hexodash/history.db（SQLite）。每个实时终端结束时记一行：标题、命令链、起止时间、退出码、
+       逐步耗时和其中生成步骤的耗时；输出压缩后单独存在 logs 表，查看时才读。
+       写入在后台线程里排队完成，不占界面线程；只保留最近 HistoryKeep 次。"""
+    Schema = """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY, title TEXT, chain TEXT, started REAL, ended REAL,
+            rc INTEGER, aborted INTEGER, steps TEXT, gen_secs REAL, log_bytes INTEGER);
+        CREATE TABLE IF NOT EXISTS logs (run_id INTEGER PRIMARY KEY, codec TEXT, data BLOB);
+        CREATE INDEX IF NOT EXISTS runs_started ON runs(started);
+    """
+
+    def __init__(self, root: str):
+        self.Path = StatePath(root, "history.db")
+        self.Queue = queue.SimpleQueue()
+        self.Thread = None
+        self.Lock = threading.Lock()
+
+    def Connect(self):
+        import sqlite3
+        db = sqlite3.connect(self.Path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(self.Schema)
+        return db
+
+    def Record(self, term):
+        """（UI 线程）LiveTerm 结束、日志关闭之前调用；只收集数据，压缩和写库交给后台"""
+        tl = term.Timeline
+        steps = tl.ToDict()["steps"] if tl is not None else []
+        gen = [x["wall"] for x in steps if x.get("verb") == "generate" and x.get("rc") == 0 and x.get("wall") is not None
+               and not any(a in ("--watch", "-w") for a in (SplitCmd(x["cmd"]) or []))]
+        rec = {"title": term.Title, "chain": json.dumps(tl.Cmds if tl is not None else [term.Cmd], ensure_ascii=False),
+               "started": term.Started, "ended": time.time(), "rc": None if term.Aborted else term.ExitCode,
+               "aborted": int(term.Aborted), "steps": json.dumps(steps, ensure_ascii=False),
+               "gen_secs": round(sum(gen), 3) if gen else None}
+        self.Queue.put((rec, term.Log.Retain()))
+        with self.Lock:
+            if self.Thread is None:
+                self.Thread = threading.Thread(target=self.WriterLoop, daemon=True)
+                self.Thread.start()
+
+    def WriterLoop(self):
+        db = None
+        codec, compress = _log_codec()
+        while True:
+            item = self.Queue.get()
+            if item is None: break
+            rec, log = item
+            try:
+                raw = b"".join(log.IterBytes())
+                blob = compress(raw)
+                db = db or self.Connect()
+                with db:
+                    cur = db.execute("INSERT INTO runs (title, chain, started, ended, rc, aborted, steps, gen_secs, log_bytes) "
+                                     "VALUES (:title, :chain, :started, :ended, :rc, :aborted, :steps, :gen_secs, :log_bytes)",
+                                     dict(rec, log_bytes=len(raw)))
+                    db.execute("INSERT INTO logs (run_id, codec, data) VALUES (?, ?, ?)", (cur.lastrowid, codec, blob))
+                    old = f"SELECT id FROM runs ORDER BY id DESC LIMIT -1 OFFSET {HistoryKeep}"
+                    db.execute(f"DELETE FROM logs WHERE run_id IN ({old})")
+                    db.execute(f"DELETE FROM runs WHERE id IN ({old})")
+            except Exception as e:
+                print(f"警告：保存运行历史失败：{e}")
+            finally:
+                log.Close()
+        if db is not None: db.close()
+
+    def Flush(self, timeout: float = 3.0):
+        """退出前把排队的记录写完（最多等 timeout 秒）"""
+        with self.Lock: t = self.Thread
+        if t is None: return
+        self.Queue.put(None)
+        t.join(timeout)
+
+    def Runs(self, limit: int = HistoryKeep) -> list[dict]:
+        """最近的运行（新的在前），不含日志内容"""
+        if not os.path.exists(self.Path): return []
+        db = self.Connect()
+        try:
+            db.row_factory = lambda c, r: {d[0]: v for d, v in zip(c.description, r)}
+            return db.execute("SELECT r.*, length(l.data) AS stored, l.codec FROM runs r LEFT JOIN logs l ON l.run_id = r.id "
+                              "ORDER BY r.id DESC LIMIT ?", (limit,)).fetchall()
+        finally:
+            db.close()
+
+    def LoadLog(self, run_id: int) -> str:
+        db = self.Connect()
+        try:
+            row = db.execute("SELECT codec, data FROM logs WHERE run_id = ?", (run_id,)).fetchone()
+        finally:
+            db.close()
+        if row is None: return ""
+        return _log_decompress(row[0], row[1]).decode("utf-8", "replace")
+
 # =============== 实时终端 ===============
 class LiveTerm:
-    """实时终端窗口滚动显示输出；Ctrl+C/关闭结束后回调 OnFinish(rc, out)
-       备注：用户主动关闭（点X或“停止/Ctrl+C”）不弹出任何完成/错误提示。"""
-    def __init__(self, root: Tk.Tk, cmd: str, title: str, on_finish):
+    """实时终端窗口滚动显示输出；Ctrl+C/关闭结束后回调 OnFinish(rc, log)
+       备注：用户主动关闭（点X或“停止/Ctrl+C”）不弹出任何完成/错误提示。
+       读线程只负责把输出写入 LogStore 并放进队列，UI 线程按固定帧率合并渲染，避免逐行回调卡死界面；
+       窗口内只保留最近 TermScrollbackLines 行，完整输出在 Log 里，log 的所有权交给 OnFinish。"""
+    def __init__(self, root: Tk.Tk, cmd: str, title: str, on_finish, job=None, parent: Tk.Misc = None, site: str = None):
+        """job(term) -> rc 在后台线程执行（可多次调用 term.RunProc / term.Emit）；缺省为用 shell 运行 cmd。
+           给了 parent 时嵌在 parent 里（多站点面板），结束后保留输出、不关窗口；site 为站点根目录，缺省 BaseDir"""
         self.Root, self.Cmd, self.OnFinish = root, cmd, on_finish
-        self.Buf = []
+        self.Title, self.Started = title, time.time()
+        self.Site = site or BaseDir   # 站点根目录，子进程与原生步骤都在这里运行
+        self.Embedded = parent is not None
+        self.Job = job or (lambda term: term.RunProc(term.Cmd))
+        self.Proc = None      # 当前正在跟随的子进程
+        self.ProcUsage = None # 上一个子进程的资源用量（WaitUsage）
+        self.StepKind = None  # 当前步骤的执行方式（shell/worker/native）
+        self.OnStop = None    # 停止时额外回调（如结束常驻进程）
+        self.Timeline = None  # StepTimeline，由 job 设置后在顶部画时间线
+        self.Log = LogStore()
         self.Aborted = False  # 主动终止标记
+        self.OnDone = None    # 窗口结束后的回调（无论是否中止），调度器用来释放位置
+        self.QueueJob = None  # 所属的队列任务
+        self.OnRecord = None  # 结束时、日志关闭之前的回调(term)，运行历史用
+        self.Tap = None       # （读线程）输出旁路，如 DebugProfiler.Feed
+        self.Stopping = False # 停止中：进程树全部结束前不关窗口
+        self.Queue = queue.SimpleQueue()  # 读线程 -> UI 线程
+        self.ExitCode = None  # 进程结束且输出读完后才置位
+        self.Stats = {"lines": 0, "chars": 0, "frames": 0, "lps": 0.0, "pending": 0, "peak_pending": 0}
+        self._StatT, self._StatLines = time.perf_counter(), 0
 
-        self.Win = Tk.Toplevel(root)
-        SetupIcon(self.Win, "Hexo.ico")
-        self.Win.title(title); self.Win.geometry(f"{TermLive_W}x{TermLive_H}"); self.Win.transient(root)
+        if self.Embedded:
+            self.Win = Tk.Frame(parent)
+            self.Win.pack(fill="both", expand=True)
+        else:
+            self.Win = Tk.Toplevel(root)
+            SetupIcon(self.Win, "Hexo.ico")
+            self.Win.title(title); self.Win.geometry(f"{TermLive_W}x{TermLive_H}"); self.Win.transient(root)
+        self.TlCanvas = Tk.Canvas(self.Win, height=TimelineH, bg=TermBg, highlightthickness=0)
+        from tkinter import scrolledtext
         self.Txt = scrolledtext.ScrolledText(self.Win, wrap="word")
         self.Txt.pack(fill="both", expand=True, padx=10, pady=(10,0))
         setup_ansi_tags(self.Txt)
+        self.Shown = 0        # 已渲染进文本控件的换行数，用来把日志行号换算成控件里的行
+        self.Follow = True    # 新输出时自动滚到底；查找跳转后暂停，滚回底部或关闭查找栏后恢复
+        self.Txt.configure(yscrollcommand=self.OnYView)
+        self.Find = FindBar(self.Win, root, self.Log, self, live=True, before=self.Txt)
+        self.Txt.bind("<Control-f>", self.Find.Show)
 
         bar = Tk.Frame(self.Win); bar.pack(fill="x", padx=10, pady=8)
-        Tk.Button(bar, text="停止（Ctrl+C）", command=self.Stop).pack(side="left")
+        self.StopBtn = Tk.Button(bar, text="停止（Ctrl+C）", command=self.Stop)
+        self.StopBtn.pack(side="left")
         Tk.Button(bar, text="复制全部", command=self.CopyAll).pack(side="left", padx=(8,0))
-        self.Win.bind("<Control-c>", lambda e: self.Stop())
-        self.Win.protocol("WM_DELETE_WINDOW", self.Stop)
+        Tk.Button(bar, text="查找", command=self.Find.Show).pack(side="left", padx=(8,0))
+        self.StatLbl = Tk.Label(bar, text="", fg="#6b7280", font=("Adobe Song Std L", 9))
+        self.StatLbl.pack(side="right")
+        self.NoteLbl = Tk.Label(bar, text="", fg="#6b7280", font=("Adobe Song Std L", 9))
+        self.NoteLbl.pack(side="right", padx=(0, 8))
+        if not self.Embedded:
+            self.Win.bind("<Control-c>", lambda e: self.Stop())
+            self.Win.bind("<Control-f>", self.Find.Show)
+            self.Win.protocol("WM_DELETE_WINDOW", self.Stop)
 
         self.Win.update_idletasks()
-        self.State = {"fg": "fg_default", "bg": "bg_default", "bold": False, "ul": False}
+        self.Ansi = AnsiParser(self.Txt)
         self.Append("\x1b[90m$ " + self.Cmd + "\x1b[0m\n")
 
-        self.Proc = SilentPopen(self.Cmd, new_group=True)
-        self.State = {"fg": "fg_default", "bg": "bg_default", "bold": False, "ul": False}
-        threading.Thread(target=self.ReadLoop, daemon=True).start()
-        threading.Thread(target=self.WaitLoop, daemon=True).start()
+        self.Ansi.Reset()
+        threading.Thread(target=self.JobLoop, daemon=True).start()
+        self._FrameJob = self.Win.after(TermFrameMs, self.Pump)
 
     def Append(self, s: str):
+        """UI 线程直接渲染一段文本（读线程请走 Queue）"""
         if isinstance(s, (bytes, bytearray)):
             s = _decode_best(s)
-        insert_ansi(self.Txt, s, self.State)
-        self.Buf.append(s)
-        self.Txt.see("end")
+        insert_ansi(self.Txt, s, self.Ansi)
+        self.Log.Append(s)
+        self.Shown += s.count("\n")
+        if self.Follow: self.Txt.see("end")
 
-    def ReadLoop(self):
+    def Emit(self, s: str):
+        """读线程：写入日志并交给 UI 线程渲染"""
+        if self.Tap is not None: self.Tap(s)
+        self.Log.Append(s)
+        self.Queue.put(s)
+
+    def Note(self, text: str):
+        """（任意线程）在底栏显示一条状态，如后台清理进度"""
+        def Set():
+            try: self.NoteLbl.configure(text=text)
+            except Exception: pass
+        try: self.Root.after(0, Set)
+        except Exception: pass
+
+    def JobLoop(self):
+        try:
+            rc = self.Job(self)
+        except Exception as e:
+            self.Emit(f"\n[运行异常] {e}\n")
+            rc = 1
+        self.ExitCode = rc
+
+    def RunProc(self, cmd: str) -> int:
+        """（后台线程）用 shell 启动 cmd 并把输出接入本终端，返回退出码"""
+        if self.Aborted: return 130
+        self.StepKind = "shell"
+        self.Proc = proc = Supervisor.Track(SilentPopen(cmd, new_group=True, cwd=self.Site), cmd, owner=self)
+        if self.Aborted: Supervisor.Stop(proc, self.OnProcState)  # 启动的同时被停止
+        reader = threading.Thread(target=self.ReadLoop, args=(proc,), daemon=True)
+        reader.start()
+        rc, self.ProcUsage = Supervisor.Wait(proc)
+        reader.join(timeout=2)  # 等读线程把剩余输出放入队列（孙进程占着管道时不无限等）
+        return rc
+
+    def ReadLoop(self, proc: subprocess.Popen):
+        """按块读取（有多少读多少，不等换行），进度条等无换行输出也能实时显示"""
+        dec = StreamDecoder()
         try:
+            if proc.stdout is None: return
+            fd = proc.stdout.fileno()
             while True:
-                if self.Proc.stdout is None: break
-                line = self.Proc.stdout.readline()
-                if not line: break
-                self.Root.after(0, self.Append, line)
+                b = os.read(fd, ReadChunkBytes)
+                if not b: break
+                s = dec.Decode(b)
+                if s: self.Emit(s)
+            s = dec.Decode(b"", final=True)
+            if s: self.Emit(s)
         except Exception as e:
-            self.Root.after(0, self.Append, f"\n[读取输出异常] {e}\n")
+            self.Emit(f"\n[读取输出异常] {e}\n")
 
-    def WaitLoop(self):
-        rc = self.Proc.wait()
-        out_bytes = b"".join([x.encode("utf-8", "replace") if isinstance(x, str) else x for x in []])  # 占位（已在读循环累计到 Buf）
-        out = "".join(self.Buf)
-        def Done():
-            try: self.Win.destroy()
-            except Exception: pass
-            if not self.Aborted:
-                self.OnFinish(rc, out)
-        self.Root.after(0, Done)
+    def Pump(self):
+        """每帧取空队列（有上限），合并为一次插入，最多滚动一次"""
+        self._FrameJob = None
+        parts, size = [], 0
+        try:
+            while size < TermFrameMaxChars:
+                s = self.Queue.get_nowait()
+                parts.append(s); size += len(s)
+        except queue.Empty:
+            pass
+        if parts:
+            chunk = "".join(parts)
+            if "\r" in chunk:  # 单独的 \r：回到行首覆盖（npm 进度条等）
+                for k, seg in enumerate(chunk.split("\r")):
+                    if k: self.Txt.delete("end-1c linestart", "end-1c")
+                    insert_runs(self.Txt, self.Ansi.Feed(seg))
+            else:
+                insert_runs(self.Txt, self.Ansi.Feed(chunk))
+            self.TrimScrollback()
+            if self.Follow: self.Txt.see("end")
+            self.Shown += chunk.count("\n")
+            self.Stats["lines"] += chunk.count("\n")
+            if self.Find.Search.Active: self.Find.Mark()
+            self.Stats["chars"] += size
+            self.Stats["frames"] += 1
+        self.UpdateStats()
+        if self.ExitCode is not None and self.Queue.empty() and not self.Stopping:
+            insert_runs(self.Txt, self.Ansi.Feed("", final=True))  # 输出结束：丢掉末尾没收全的转义序列
+            self.Finish()
+            return
+        self._FrameJob = self.Win.after(TermFrameMs, self.Pump)
+
+    def TrimScrollback(self):
+        """超过上限 10% 时一次性删掉最早的行，避免每帧都删"""
+        lines = int(self.Txt.index("end-1c").split(".")[0])
+        if lines > TermScrollbackLines * 1.1:
+            self.Txt.delete("1.0", f"{lines - TermScrollbackLines + 1}.0")
+
+    def UpdateStats(self):
+        pending = self.Queue.qsize()
+        self.Stats["pending"] = pending
+        self.Stats["peak_pending"] = max(self.Stats["peak_pending"], pending)
+        now = time.perf_counter()
+        if (now - self._StatT) * 1000 < TermStatsMs: return
+        self.Stats["lps"] = (self.Stats["lines"] - self._StatLines) / (now - self._StatT)
+        self._StatT, self._StatLines = now, self.Stats["lines"]
+        try: self.StatLbl.configure(text=f"{self.Stats['lps']:.0f} 行/秒  待渲染 {pending}")
+        except Exception: pass
+        if self.Timeline is not None: self.DrawTimeline()
+        self.Find.Search.Poll()  # 查找栏开着时只扫新来的行
+
+    def DrawTimeline(self):
+        """顶部时间线：每步一段，宽度按耗时比例，正在运行的一段实时增长"""
+        c = self.TlCanvas
+        if not c.winfo_ismapped():
+            c.pack(fill="x", padx=10, pady=(8, 0), before=self.Txt)
+        total, steps = self.Timeline.Snapshot()
+        c.delete("all")
+        w = max(1, c.winfo_width())
+        if total <= 0: return
+        for x in steps:
+            wall = x["wall"] if x["wall"] is not None else total - x["start"]
+            x0, x1 = x["start"] / total * w, (x["start"] + wall) / total * w
+            col = "#CD3131" if x["rc"] not in (0, None) else TimelineColors.get(x["verb"], "#666666")
+            c.create_rectangle(x0, 1, max(x0 + 1, x1 - 1), TimelineH - 1, fill=col, width=0)
+            label = f"{x['name']} {wall:.1f}s"
+            if x1 - x0 > 7 * len(label):
+                c.create_text((x0 + x1) / 2, TimelineH // 2, text=label, fill="#000000", font=(TermFontFamily, 7))
+
+    def Finish(self):
+        try:
+            if self.Embedded: self.StopBtn.configure(state="disabled")
+            else: self.Win.destroy()
+        except Exception: pass
+        Supervisor.Reap(self)  # 窗口关了还活着的子孙进程
+        if self.OnDone is not None: self.OnDone()
+        if self.OnRecord is not None:
+            try: self.OnRecord(self)
+            except Exception as e: print(f"警告：记录运行历史失败：{e}")
+        if self.Aborted:
+            self.Log.Close()
+        else:
+            self.OnFinish(self.ExitCode, self.Log)
 
     def Stop(self):
+        """不阻塞：逐级结束交给 Supervisor 的后台线程，进程树结束后窗口自行关闭"""
+        if self.Aborted: return
         self.Aborted = True  # 主动终止
-        try:
-            if os.name != "nt":
-                try:
-                    os.killpg(self.Proc.pid, signal.SIGINT)
-                except Exception:
-                    try: self.Proc.terminate()
-                    except Exception: pass
-
-                for _ in range(40):  # ~2s
-                    if self.Proc.poll() is not None:
-                        break
-                    time.sleep(0.05)
-
-                if self.Proc.poll() is None:
-                    try: os.killpg(self.Proc.pid, signal.SIGTERM)
-                    except Exception: pass
-                    for _ in range(20):  # ~1s
-                        if self.Proc.poll() is not None:
-                            break
-                        time.sleep(0.05)
-
-                if self.Proc.poll() is None:
-                    try: os.killpg(self.Proc.pid, signal.SIGKILL)
-                    except Exception: pass
-            else:
-                try:
-                    subprocess.run(
-                        f'taskkill /PID {self.Proc.pid} /T /F',
-                        shell=True, cwd=BaseDir,
-                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
-                        creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
-                    )
-                except Exception:
-                    pass
-                try:
-                    self.Proc.terminate()
-                except Exception:
-                    pass
-        except Exception:
-            pass
+        if self.OnStop is not None:
+            try: self.OnStop()
+            except Exception: pass
+        if self.Proc is not None:
+            self.Stopping = True
+            Supervisor.Stop(self.Proc, self.OnProcState)
+
+    def OnProcState(self, state: str, info: dict):
+        """（后台线程）Supervisor 的停止进度"""
+        if state == "stopped": self.Stopping = False
+        def Set():
+            try:
+                if state == "stopping":
+                    self.StopBtn.configure(text="正在停止…", state="disabled")
+                    self.NoteLbl.configure(text="正在结束进程…")
+                else:
+                    self.NoteLbl.configure(text="已停止：" + FormatStop(info))
+            except Exception:
+                pass
+        try: self.Root.after(0, Set)
+        except Exception: pass
+
+    # ------- 查找栏用的视图接口 -------
+    def LineOf(self, ln: int) -> int:
+        """文本控件第 ln 行对应的日志行号（控件只保留最近的行，最后一行就是日志第 Shown 行）"""
+        return self.Shown - (int(self.Txt.index("end-1c").split(".")[0]) - ln)
+
+    def Goto(self, line: int) -> bool:
+        """滚到日志第 line 行；已被裁掉（超出 TermScrollbackLines）时返回 False"""
+        self.Follow = False
+        t = int(self.Txt.index("end-1c").split(".")[0]) - (self.Shown - line)
+        if t < 1:
+            self.Txt.see("1.0"); return False
+        self.Txt.see(f"{t}.0")
+        return True
+
+    def FindDone(self):
+        self.Follow = True
+        self.Txt.see("end")
+
+    def OnYView(self, first, last):
+        self.Txt.vbar.set(first, last)
+        if not self.Follow and float(last) >= 1.0 and not self.Find.Frame.winfo_ismapped():
+            self.Follow = True
+        if self.Find.Search.Active and not getattr(self, "_MarkJob", None):
+            def Run():
+                self._MarkJob = None
+                self.Find.Mark()
+            self._MarkJob = self.Txt.after_idle(Run)
 
     def CopyAll(self):
-        txt = "".join(self.Buf)
-        self.Root.clipboard_clear(); self.Root.clipboard_append(txt)
+        self.Root.clipboard_clear()
+        for chunk in self.Log.IterChunks():
+            self.Root.clipboard_append(chunk)
         Tk.messagebox.showinfo("已复制", "已复制全部运行输出。", parent=self.Win)
 
+# =============== 任务队列 ===============
+def JobKind(steps: list[str]) -> str:
+    """"site"：清理/生成/上传会读写 db.json 与 public/，同一时间只能有一个；"free"：新建、预览等可并发"""
+    return "site" if any(HexoVerb(c) in ("clean", "generate", "deploy") for c in steps) else "free"
+
+class Job:
+    """队列中的一次运行；State 为 queued / running，结束或取消后移出队列"""
+    _Seq = 0
+
+    def __init__(self, steps: list[str], title: str, start):
+        Job._Seq += 1
+        self.Id, self.Steps, self.Title, self.Start = Job._Seq, list(steps), title, start
+        self.Kind = JobKind(steps)
+        self.State = "queued"
+        self.HoldsSite = False  # 正占用站点（串行）位置
+        self.Merged = 0         # 合并进来的重复请求数
+        self.Term = None
+
+    def Label(self) -> str:
+        return self.Title + (f" ×{self.Merged + 1}" if self.Merged else "")
+
+class JobScheduler:
+    """运行队列：site 类任务按提交顺序串行，free 类任务最多 MaxConcurrentJobs 个并发；
+       排队中的相同生成任务合并为一次。只在 UI 线程调用（Release 除外）。
+       队列外的运行（多站点运行里的本站）用 Acquire/Unacquire 占用同一个串行位置。"""
+    def __init__(self, root: Tk.Tk, on_change):
+        self.Root, self.OnChange = root, on_change
+        self.Jobs: list[Job] = []
+        self.Holders = set()    # 占着站点位置的队列外运行
+        self.Waiters = {}       # 等站点位置的队列外运行 -> 空出来时的回调
+
+    def Submit(self, steps: list[str], title: str, start) -> Job:
+        """start(job) -> LiveTerm；返回实际承载这次请求的任务（可能是被合并进去的旧任务）"""
+        if any(HexoVerb(c) == "generate" for c in steps):
+            for j in self.Jobs:
+                if j.State == "queued" and j.Steps == list(steps):
+                    j.Merged += 1
+                    self.OnChange()
+                    return j
+        job = Job(steps, title, start)
+        self.Jobs.append(job)
+        self.Schedule()
+        return job
+
+    def Schedule(self):
+        site_busy = any(j.HoldsSite for j in self.Jobs) or bool(self.Holders)
+        free_running = sum(1 for j in self.Jobs if j.State == "running" and j.Kind == "free")
+        for job in list(self.Jobs):
+            if job.State != "queued": continue
+            if job.Kind == "site":
+                if site_busy: continue
+                site_busy = job.HoldsSite = True
+            else:
+                if free_running >= MaxConcurrentJobs: continue
+                free_running += 1
+            self.Begin(job)
+        if not site_busy and self.Waiters:
+            owner = next(iter(self.Waiters))
+            self.Root.after(0, self.Waiters.pop(owner))
+        self.OnChange()
+
+    def Acquire(self, owner, retry) -> bool:
+        """队列外的运行要改动本站：站点位置空闲则占住并返回 True；
+           否则返回 False，位置空出来后在 UI 线程调用 retry()"""
+        if any(j.HoldsSite for j in self.Jobs) or self.Holders - {owner}:
+            self.Waiters[owner] = retry
+            return False
+        self.Holders.add(owner)
+        self.Waiters.pop(owner, None)
+        return True
+
+    def Unacquire(self, owner):
+        """放弃等待 / 归还站点位置"""
+        self.Waiters.pop(owner, None)
+        if owner in self.Holders:
+            self.Holders.discard(owner)
+            self.Schedule()
+
+    def Begin(self, job: Job):
+        job.State = "running"
+        try:
+            job.Term = term = job.Start(job)
+        except Exception as e:
+            job.State, job.HoldsSite = "queued", False
+            self.Jobs.remove(job)
+            self.Root.after(0, self.Schedule)  # 本轮 Schedule 已把站点位置记为占用，下一轮重新分配
+            messagebox.showerror("错误", f"启动失败：{e}", parent=self.Root)
+            return
+        term.QueueJob = job
+        term.OnDone = lambda: self.Done(job)
+
+    def Done(self, job: Job):
+        if job in self.Jobs: self.Jobs.remove(job)
+        self.Schedule()
+
+    def Release(self, job: Job):
+        """（任意线程）任务进入不再改动站点的阶段（如 hexo server），让出串行位置"""
+        def Apply():
+            if job.HoldsSite:
+                job.HoldsSite = False
+                self.Schedule()
+        try: self.Root.after(0, Apply)
+        except Exception: pass
+
+    def Cancel(self, job: Job):
+        """排队中的直接移除；运行中的等同点了终端里的“停止”"""
+        if job.State == "queued":
+            if job in self.Jobs: self.Jobs.remove(job)
+            self.Schedule()
+        elif job.Term is not None:
+            job.Term.Stop()
+
+# =============== 多站点 ===============
+class SiteRegistry:
+    """多站点登记：.hexodash/sites.json 记 [{name, root, tail}] 与并行数。
+       tail 为该站点自己的尾部参数，留空时用主窗口的尾部参数。"""
+    def __init__(self, root: str):
+        self.Path = StatePath(root, "sites.json")
+        data = _load_json(self.Path, {})
+        self.Sites: list[dict] = [x for x in data.get("sites", []) if isinstance(x, dict) and x.get("root")]
+        self.Parallel = min(self.MaxParallel(), max(1, int(data.get("parallel") or self.MaxParallel())))
+
+    @staticmethod
+    def MaxParallel() -> int:
+        """并行上限：CPU 核数（hexo generate 本身单线程吃满一个核）"""
+        return max(1, os.cpu_count() or 1)
+
+    @staticmethod
+    def IsSite(root: str) -> bool:
+        return os.path.isfile(os.path.join(root, "_config.yml"))
+
+    def Add(self, root: str) -> dict:
+        root = os.path.abspath(root)
+        for x in self.Sites:
+            if os.path.normcase(x["root"]) == os.path.normcase(root): return x
+        names = {x["name"] for x in self.Sites}
+        base = name = os.path.basename(root.rstrip("\\/")) or root
+        i = 2
+        while name in names: name, i = f"{base} ({i})", i + 1
+        site = {"name": name, "root": root, "tail": ""}
+        self.Sites.append(site)
+        return site
+
+    def Save(self):
+        _save_json(self.Path, {"sites": self.Sites, "parallel": self.Parallel})
+
+class MultiSiteRun:
+    """在多个站点上并行跑同一条组合命令链：上方是各站点状态表，下方每个站点一个标签页（嵌入的 LiveTerm）。
+       最多同时运行 parallel 个，其余排队；全部结束后比较并行总耗时与逐个运行耗时之和。"""
+    Marks = {"queued": "⏳", "running": "▶", "ok": "✓", "fail": "✗", "stopped": "■"}
+
+    def __init__(self, app, plan: list[tuple[dict, list[str]]], parallel: int):
+        """plan：[(站点, 该站点的命令链)]"""
+        self.App, self.Plan, self.Parallel = app, plan, parallel
+        self.Pending = list(plan)
+        self.Running: dict[str, LiveTerm] = {}
+        self.Result: dict[str, tuple[str, float]] = {}   # 站点名 -> (状态, 耗时)
+        self.Logs, self.Closing = [], False
+        self.T0 = time.perf_counter()
+        self.Base = next((site["name"] for site, _ in plan
+                          if os.path.normcase(site["root"]) == os.path.normcase(BaseDir)), None)  # 本站要和主窗口队列串行
+
+        self.Win = win = Tk.Toplevel(app.Root)
+        SetupIcon(win, "Hexo.ico")
+        win.title(f"多站点运行（{len(plan)} 个站点，并行 {parallel}）")
+        win.geometry(f"{MultiSite_W}x{MultiSite_H}"); win.transient(app.Root)
+        self.Table = ttk.Treeview(win, columns=("site", "state", "secs", "chain"), show="headings",
+                                  selectmode="browse", height=min(len(plan), 8))
+        for col, text, w in (("site", "站点", 120), ("state", "状态", 80), ("secs", "耗时", 70), ("chain", "命令", 400)):
+            self.Table.heading(col, text=text); self.Table.column(col, width=w, anchor="w")
+        self.Table.pack(fill="x", padx=8, pady=(8, 4))
+        self.Book = ttk.Notebook(win); self.Book.pack(fill="both", expand=True, padx=8)
+        self.Tabs = {}
+        for site, steps in plan:
+            tab = Tk.Frame(self.Book)
+            self.Book.add(tab, text=site["name"])
+            self.Tabs[site["name"]] = tab
+            self.Table.insert("", "end", iid=site["name"], values=(site["name"], "", "", " && ".join(steps)))
+            self.SetState(site["name"], "queued")
+        bar = Tk.Frame(win); bar.pack(fill="x", padx=8, pady=6)
+        self.StopBtn = Tk.Button(bar, text="全部停止", command=self.StopAll); self.StopBtn.pack(side="left")
+        self.Summary = Tk.Label(bar, text="", fg="#374151", font=("Adobe Song Std L", 9), anchor="w")
+        self.Summary.pack(side="left", fill="x", expand=True, padx=(8, 0))
+        self.Table.bind("<<TreeviewSelect>>", self.OnSelect)
+        win.protocol("WM_DELETE_WINDOW", self.OnClose)
+        self.Next()
+
+    def SetState(self, name: str, state: str, secs: float = None):
+        self.Table.set(name, "state", {"queued": "排队中", "running": "运行中", "ok": "成功",
+                                       "fail": "失败", "stopped": "已停止"}.get(state, state))
+        if secs is not None: self.Table.set(name, "secs", f"{secs:.1f}s")
+        self.Book.tab(self.Tabs[name], text=f"{self.Marks.get(state, '')} {name}")
+
+    def Next(self):
+        for site, steps in list(self.Pending):
+            if len(self.Running) >= self.Parallel or self.Closing: break
+            name = site["name"]
+            if name == self.Base and not self.App.Jobs.Acquire(self, self.Next):  # 主窗口任务在改本站，先跑别的
+                self.Table.set(name, "state", "等主窗口任务")
+                continue
+            self.Pending.remove((site, steps))
+            term = LiveTerm(self.App.Root, " && ".join(steps), f"{name}：{self.App._DisplayName(steps[-1])}",
+                            lambda rc, log: self.Logs.append(log), job=lambda t, steps=steps: self.App.RunSteps(steps, t),
+                            parent=self.Tabs[name], site=site["root"])
+            term.OnRecord = self.App.History.Record
+            term.OnDone = lambda name=name, term=term: self.Ended(name, term)
+            self.Running[name] = term
+            self.SetState(name, "running")
+        self.UpdateSummary()
+
+    def Ended(self, name: str, term: LiveTerm):
+        self.Running.pop(name, None)
+        if name == self.Base: self.App.Jobs.Unacquire(self)
+        state = "stopped" if term.Aborted else ("ok" if term.ExitCode == 0 else "fail")
+        secs = time.time() - term.Started
+        self.Result[name] = (state, secs)
+        try: self.SetState(name, state, secs)
+        except Tk.TclError: pass
+        self.Next()
+
+    def UpdateSummary(self):
+        if self.Running or self.Pending:
+            done = len(self.Result)
+            text = f"运行中 {len(self.Running)}，排队 {len(self.Pending)}，已完成 {done}/{len(self.Plan)}"
+        else:
+            wall = time.perf_counter() - self.T0
+            seq = sum(secs for _, secs in self.Result.values())
+            ok = sum(1 for st, _ in self.Result.values() if st == "ok")
+            text = (f"完成 {ok}/{len(self.Plan)}：并行总耗时 {wall:.1f}s，逐个运行合计 {seq:.1f}s"
+                    + (f"，快了 {seq / wall:.1f} 倍" if wall > 0 and seq > wall else ""))
+            self.StopBtn.configure(state="disabled")
+            if self.Closing: self.Destroy(); return
+        try: self.Summary.configure(text=text)
+        except Tk.TclError: pass
+
+    def OnSelect(self, _=None):
+        sel = self.Table.selection()
+        if sel: self.Book.select(self.Tabs[sel[0]])
+
+    def StopAll(self):
+        for site, _ in self.Pending:
+            self.Result[site["name"]] = ("stopped", 0.0)
+            self.SetState(site["name"], "stopped")
+        self.Pending.clear()
+        if self.Base not in self.Running: self.App.Jobs.Unacquire(self)
+        for term in list(self.Running.values()): term.Stop()
+        self.UpdateSummary()
+
+    def OnClose(self):
+        if self.Running or self.Pending:
+            if not messagebox.askyesno("多站点运行", "还有站点在运行，停止全部并关闭？", parent=self.Win): return
+            self.Closing = True
+            self.StopAll()  # 进程树都结束后由 UpdateSummary 关窗口
+            return
+        self.Destroy()
+
+    def Destroy(self):
+        for log in self.Logs: log.Close()
+        self.Logs = []
+        try: self.Win.destroy()
+        except Tk.TclError: pass
+
 # =============== 主程序 ===============
 class HexoDashApp:
     """
     HexoDash 主应用类。
     负责构建主窗口 UI、绑定控件事件、处理变量以及管理命令的构建和执行。
     """
-    def __init__(self, root: Tk.Tk):
+    def __init__(self, root: Tk.Tk, timer: StartupTimer = None):
         self.Root = root
+        self.Startup = timer or StartupTimer()   # 启动各阶段耗时
         root.title("HexoDash"); root.geometry(f"{WinW}x{WinH}"); root.resizable(False, False)
         SetupIcon(root, "Hexo.ico")
         root.update_idletasks()
@@ -364,16 +3707,45 @@ class HexoDashApp:
         self.ServerVar = Tk.BooleanVar(root, False)
         self.CleanVar  = Tk.BooleanVar(root, False)
         self.TailVar   = Tk.StringVar(root)
+        self.WarmVar   = Tk.BooleanVar(root, False)   # 常驻 Hexo 进程
+        self.NativeNewVar = Tk.BooleanVar(root, True) # 原生新建文章
+        self.NativeCleanVar = Tk.BooleanVar(root, True) # 原生清理缓存
+        self.SmartGenVar = Tk.BooleanVar(root, False) # 按改动决定清理/生成
+        self.DeployCheckVar = Tk.BooleanVar(root, False) # 上传前比对 public，无变化跳过
+        self.NativeServeVar = Tk.BooleanVar(root, False) # 预览直接托管 public，不启动 hexo server
+        self.NativeWatchVar = Tk.BooleanVar(root, False) # generate --watch 由 HexoDash 监听文件
+        self.SearchIndexVar = Tk.BooleanVar(root, False) # 生成后由 HexoDash 生成站内搜索索引
+        self.MinifyVar = Tk.BooleanVar(root, False)      # 生成后压缩 HTML/CSS/JS
+        self.PrecompressVar = Tk.BooleanVar(root, False) # 生成后预压缩 public（.gz/.br）
+        self.ProfileVar = Tk.BooleanVar(root, False)     # 生成时加 --debug 并统计各阶段、各文件耗时
+        self.Worker    = HexoWorker(BaseDir)
+        self.LastTimings = None                        # 最近一次运行的逐步耗时
+        self.LastProfile = None                        # 最近一次生成性能分析
+        self.History   = RunHistory(BaseDir)           # 运行历史（SQLite）
+        self.Jobs      = JobScheduler(root, self.DrawQueue)
+        self.Index     = PostIndex(BaseDir)            # 文章 front matter 索引
+        self.Suggest   = {}                            # 输入框 -> TitleSuggest
+        self.RefreshIndex(then=lambda: self.StartupPhase("index"))
+        self.QueueRows = []                            # 队列视图的控件
 
         # 防粘边
         self.Style = ttk.Style(root)
         self.Style.configure("Dash.TEntry", padding=EntryInnerPadding)
         self.BuildUi()
+        self.Startup.Mark("ui")
+        root.after_idle(lambda: self.StartupPhase("first_paint"))
 
         # 双向置灰
         self._MutualLock = False
         self.ServerVar.trace_add("write", self.OnServerChange)
         self.DeployVar.trace_add("write", self.OnDeployChange)
+        root.protocol("WM_DELETE_WINDOW", self.OnClose)
+
+    def OnClose(self):
+        self.Worker.Kill()
+        self.Root.destroy()
+        self.History.Flush()
+        Supervisor.Shutdown()  # 窗口已关，等后台把所有进程树（含孤儿）结束掉
 
     # ---------- 组合命令区 ----------
     def PlaceRightCheck(self, text: str, var: Tk.BooleanVar, lx: int, bx: int, y: int):
@@ -396,20 +3768,30 @@ class HexoDashApp:
     def BuildUi(self):
         r = self.Root
         Tk.Label(r, text="新建文章", font=FontMain).place(x=LblX, y=RowY0)
-        ttk.Entry(r, textvariable=self.PostVar, font=FontMain, style="Dash.TEntry")\
-            .place(x=EntX, y=RowY0 + EntryYOffset, width=EntryWidthPx, height=EntryHeightPx)
+        self.PostEnt = ttk.Entry(r, textvariable=self.PostVar, font=FontMain, style="Dash.TEntry")
+        self.PostEnt.place(x=EntX, y=RowY0 + EntryYOffset, width=EntryWidthPx, height=EntryHeightPx)
 
         Tk.Label(r, text="新建草稿", font=FontMain).place(x=LblX, y=RowY0+RowStep)
-        ttk.Entry(r, textvariable=self.DraftVar, font=FontMain, style="Dash.TEntry")\
-            .place(x=EntX, y=RowY0+RowStep + EntryYOffset, width=EntryWidthPx, height=EntryHeightPx)
+        self.DraftEnt = ttk.Entry(r, textvariable=self.DraftVar, font=FontMain, style="Dash.TEntry")
+        self.DraftEnt.place(x=EntX, y=RowY0+RowStep + EntryYOffset, width=EntryWidthPx, height=EntryHeightPx)
 
         Tk.Label(r, text="新建页面", font=FontMain).place(x=LblX, y=RowY0+RowStep*2)
-        ttk.Entry(r, textvariable=self.PageVar, font=FontMain, style="Dash.TEntry")\
-            .place(x=EntX, y=RowY0+RowStep*2 + EntryYOffset, width=EntryWidthPx, height=EntryHeightPx)
+        self.PageEnt = ttk.Entry(r, textvariable=self.PageVar, font=FontMain, style="Dash.TEntry")
+        self.PageEnt.place(x=EntX, y=RowY0+RowStep*2 + EntryYOffset, width=EntryWidthPx, height=EntryHeightPx)
+
+        # 边输入边查重 / 搜索已有文章
+        for ent, var, layout in ((self.PostEnt, self.PostVar, "post"), (self.DraftEnt, self.DraftVar, "draft"),
+                                 (self.PageEnt, self.PageVar, "page")):
+            self.Suggest[ent] = TitleSuggest(ent, self.Index)
+            var.trace_add("write", lambda *_, e=ent, v=var, l=layout: self.OnTitleType(e, v, l))
+            ent.bind("<FocusIn>", lambda e: self.RefreshIndex())
+            ent.bind("<FocusOut>", lambda e, w=ent: self.Root.after(200, self.HideSuggest, w))
+            ent.bind("<Escape>", lambda e, w=ent: self.Suggest[w].Hide())
 
         for child in r.place_slaves():
             if isinstance(child, ttk.Entry):
-                child.bind("<Return>", lambda e: self.RunAll())
+                child.bind("<Return>", lambda e, w=child: (self.Suggest[w].Hide() if w in self.Suggest else None,
+                                                           self.RunAll()))
 
         # 虚线
         dash = Tk.Canvas(r, width=WinW-16, height=2, highlightthickness=0)
@@ -440,6 +3822,359 @@ class HexoDashApp:
         Tk.Button(r, text="运行", command=self.RunAll, font=FontMain)\
             .place(x=BtnRightX, y=BtnY, width=BtnW, height=BtnH)
 
+        # 更多选项（中间小按钮 / 右键）
+        self.MoreMenu = Tk.Menu(r, tearoff=0)
+        self.MoreMenu.add_checkbutton(label="原生新建文章（不启动 Node）", variable=self.NativeNewVar)
+        self.MoreMenu.add_checkbutton(label="原生清理缓存（后台删除 public）", variable=self.NativeCleanVar)
+        self.MoreMenu.add_checkbutton(label="智能生成（按改动决定清理/生成）", variable=self.SmartGenVar)
+        self.MoreMenu.add_checkbutton(label="上传前检查（无变化跳过上传）", variable=self.DeployCheckVar)
+        self.MoreMenu.add_checkbutton(label="原生预览（直接托管 public）", variable=self.NativeServeVar)
+        self.MoreMenu.add_checkbutton(label="原生监听（--watch 改由 HexoDash 触发生成）", variable=self.NativeWatchVar)
+        self.MoreMenu.add_checkbutton(label="生成后建立搜索索引（代替 search 插件）", variable=self.SearchIndexVar)
+        self.MoreMenu.add_checkbutton(label="生成后压缩代码（HTML/CSS/JS）", variable=self.MinifyVar)
+        self.MoreMenu.add_checkbutton(label="生成后预压缩（.gz/.br）", variable=self.PrecompressVar)
+        self.MoreMenu.add_checkbutton(label="生成性能分析（--debug）", variable=self.ProfileVar)
+        self.MoreMenu.add_checkbutton(label="常驻 Hexo 进程（加速重复运行）", variable=self.WarmVar,
+                                      command=self.OnWarmChange)
+        self.MoreMenu.add_separator()
+        self.MoreMenu.add_command(label="文章索引（搜索 / 标签分类统计）…", command=self.ShowPostIndex)
+        self.MoreMenu.add_command(label="多站点…", command=self.ShowSites)
+        self.MoreMenu.add_command(label="运行历史…", command=self.ShowHistory)
+        self.MoreMenu.add_command(label="导出最近一次耗时（JSON）…", command=self.ExportTimings)
+        self.MoreMenu.add_command(label="最近一次生成性能分析…", command=lambda: self.ShowProfile(self.LastProfile))
+        self.MoreMenu.add_command(label="启动耗时…", command=self.ShowStartup)
+        more = Tk.Button(r, text="⋯", font=FontMain, command=self.ShowMoreMenu)
+        more.place(x=MoreBtnX, y=BtnY, width=MoreBtnW, height=BtnH)
+        Tooltip(more, "更多选项")
+        r.bind("<Button-3>", lambda e: self.MoreMenu.tk_popup(e.x_root, e.y_root))
+
+    def DrawQueue(self):
+        """主窗口底部的紧凑队列：每个任务一行（● 运行中 / ○ 排队），✕ 取消或停止；没有任务时收起"""
+        for w in self.QueueRows: w.destroy()
+        self.QueueRows = []
+        jobs = self.Jobs.Jobs
+        shown = jobs[:QueueMaxRows]
+        rows = len(shown) + (1 if len(jobs) > QueueMaxRows else 0)
+        self.Root.geometry(f"{WinW}x{WinH + rows * QueueRowH + (6 if rows else 0)}")
+        y = WinH
+        for job in shown:
+            mark = "●" if job.State == "running" else "○"
+            lbl = Tk.Label(self.Root, text=f"{mark} {job.Label()}", font=("Adobe Song Std L", 9), anchor="w",
+                           fg="#0DBC79" if job.State == "running" else "#6b7280")
+            lbl.place(x=LblX, y=y, width=WinW - LblX - 30, height=QueueRowH)
+            btn = Tk.Button(self.Root, text="✕", font=("Adobe Song Std L", 8), bd=0, cursor="hand2",
+                            command=lambda j=job: self.Jobs.Cancel(j))
+            btn.place(x=WinW - 26, y=y + 2, width=16, height=QueueRowH - 4)
+            Tooltip(btn, "停止" if job.State == "running" else "取消排队")
+            self.QueueRows += [lbl, btn]
+            y += QueueRowH
+        if len(jobs) > QueueMaxRows:
+            more = Tk.Label(self.Root, text=f"…另有 {len(jobs) - QueueMaxRows} 个", font=("Adobe Song Std L", 9),
+                            fg="#6b7280", anchor="w")
+            more.place(x=LblX, y=y, width=WinW - LblX * 2, height=QueueRowH)
+            self.QueueRows.append(more)
+
+    # ------- 文章索引 -------
+    def RefreshIndex(self, then=None):
+        """后台增量刷新索引（进行中时不重复启动），完成后在界面线程调用 then()"""
+        if getattr(self, "_IndexBusy", False): return
+        self._IndexBusy = True
+        def Work():
+            try: self.Index.Refresh()
+            except Exception: pass
+            finally: self._IndexBusy = False
+            if then is not None:
+                try: self.Root.after(0, then)
+                except Exception: pass
+        threading.Thread(target=Work, daemon=True).start()
+
+    def OnTitleType(self, ent, var, layout: str):
+        text = var.get().strip()
+        sug = self.Suggest[ent]
+        if not text or not self.Index.Loaded:
+            sug.Hide(); return
+        warn = self.Index.Duplicates(text, layout)
+        rels = [] if layout == "page" else [r for r in self.Index.Search(text) if r not in warn]
+        sug.Show(rels, warn)
+
+    def HideSuggest(self, ent):
+        sug = self.Suggest[ent]
+        try:
+            if sug.Win is not None and self.Root.focus_get() is sug.List: return
+        except Exception:
+            pass
+        sug.Hide()
+
+    def CheckDuplicates(self) -> bool:
+        """新建前查重：有会撞名的标题时询问是否继续"""
+        found = []
+        for var, layout in ((self.PostVar, "post"), (self.DraftVar, "draft"), (self.PageVar, "page")):
+            title = var.get().strip()
+            if title:
+                found += [f"{title} → {rel}" for rel in self.Index.Duplicates(title, layout)]
+        if not found: return True
+        return messagebox.askyesno("已存在同名文章", "以下标题已存在：\n" + "\n".join(found[:8]) +
+                                   "\n\n仍然新建？（文件名会自动加上编号）", parent=self.Root)
+
+    def ShowPostIndex(self):
+        win = Tk.Toplevel(self.Root)
+        SetupIcon(win, "Hexo.ico")
+        win.title("文章索引"); win.geometry("560x380"); win.transient(self.Root)
+        q = Tk.StringVar(win)
+        top = Tk.Frame(win); top.pack(fill="x", padx=8, pady=(8, 4))
+        Tk.Label(top, text="搜索", font=FontMain).pack(side="left")
+        ent = ttk.Entry(top, textvariable=q, font=FontMain); ent.pack(side="left", fill="x", expand=True, padx=(6, 0))
+        body = ttk.PanedWindow(win, orient="horizontal"); body.pack(fill="both", expand=True, padx=8)
+        posts = ttk.Treeview(body, columns=("title", "date", "path"), show="headings", selectmode="browse")
+        for col, text, w in (("title", "标题", 180), ("date", "日期", 90), ("path", "文件", 120)):
+            posts.heading(col, text=text); posts.column(col, width=w, anchor="w")
+        posts.tag_configure("dup", foreground="#CD3131")
+        counts = ttk.Treeview(body, columns=("kind", "name", "n"), show="headings", selectmode="browse")
+        for col, text, w in (("kind", "类型", 40), ("name", "名称", 90), ("n", "篇数", 40)):
+            counts.heading(col, text=text, command=lambda c=col: Sort(c)); counts.column(col, width=w, anchor="w")
+        body.add(posts, weight=3); body.add(counts, weight=1)
+        status = Tk.Label(win, text="", fg="#6b7280", font=("Adobe Song Std L", 9), anchor="w")
+        status.pack(fill="x", padx=8, pady=(2, 6))
+        order = {"col": "n", "desc": True}
+
+        def Fill(*_):
+            idx = self.Index
+            text = q.get().strip()
+            rels = idx.Search(text, limit=500) if text else sorted(idx.Posts, key=lambda r: idx.Posts[r][3], reverse=True)[:500]
+            dups = {r for v in idx.Dups.values() for r in v}
+            posts.delete(*posts.get_children())
+            for rel in rels:
+                e = idx.Posts[rel]
+                posts.insert("", "end", iid=rel, values=(e[2], e[3][:10], rel.split("/", 1)[-1]),
+                             tags=("dup",) if rel in dups else ())
+            FillCounts()
+            status.configure(text=f"共 {len(idx.Posts)} 篇（显示 {len(rels)}），标签 {len(idx.Tags)}，分类 {len(idx.Cats)}，"
+                                  f"重复标题 {len(idx.Dups)} 组；加载 {idx.LoadMs:.0f} ms，刷新 {idx.RefreshMs:.0f} ms")
+
+        def FillCounts():
+            rows = [("标签", k, v) for k, v in self.Index.Tags.items()] + [("分类", k, v) for k, v in self.Index.Cats.items()]
+            i = {"kind": 0, "name": 1, "n": 2}[order["col"]]
+            rows.sort(key=lambda x: x[i], reverse=order["desc"])
+            counts.delete(*counts.get_children())
+            for row in rows: counts.insert("", "end", values=row)
+
+        def Sort(col):
+            order["desc"] = not order["desc"] if order["col"] == col else col == "n"
+            order["col"] = col
+            FillCounts()
+
+        def Open(_=None):
+            sel = posts.selection()
+            if sel: OpenFile(os.path.join(BaseDir, sel[0]), win)
+
+        q.trace_add("write", Fill)
+        posts.bind("<Double-Button-1>", Open)
+        Fill()
+        self.RefreshIndex(then=lambda: win.winfo_exists() and Fill())
+        ent.focus_set()
+
+    def ShowSites(self):
+        reg = SiteRegistry(BaseDir)
+        win = Tk.Toplevel(self.Root)
+        SetupIcon(win, "Hexo.ico")
+        win.title("多站点"); win.geometry("560x320"); win.transient(self.Root)
+        sites = ttk.Treeview(win, columns=("name", "root", "tail"), show="headings", selectmode="extended")
+        for col, text, w in (("name", "站点", 100), ("root", "目录", 280), ("tail", "尾部参数", 120)):
+            sites.heading(col, text=text); sites.column(col, width=w, anchor="w")
+        sites.tag_configure("bad", foreground="#CD3131")
+        sites.pack(fill="both", expand=True, padx=8, pady=(8, 4))
+        bar = Tk.Frame(win); bar.pack(fill="x", padx=8, pady=(0, 8))
+        par = Tk.IntVar(win, reg.Parallel)
+
+        def Fill():
+            sites.delete(*sites.get_children())
+            for i, x in enumerate(reg.Sites):
+                sites.insert("", "end", iid=str(i), values=(x["name"], x["root"], x.get("tail", "")),
+                             tags=() if SiteRegistry.IsSite(x["root"]) else ("bad",))
+            sites.selection_set([str(i) for i in range(len(reg.Sites))])
+
+        def Selected() -> list[dict]:
+            return [reg.Sites[int(i)] for i in sites.selection()]
+
+        def Save():
+            try:
+                reg.Parallel = max(1, min(SiteRegistry.MaxParallel(), int(par.get())))
+            except (Tk.TclError, ValueError):
+                pass
+            try: reg.Save()
+            except OSError as e: messagebox.showerror("错误", f"保存失败：{e}", parent=win)
+
+        def Add():
+            root = filedialog.askdirectory(parent=win, title="选择 Hexo 站点根目录")
+            if not root: return
+            if not SiteRegistry.IsSite(root):
+                messagebox.showwarning("提示", "这个目录里没有 _config.yml，不像 Hexo 站点。", parent=win); return
+            reg.Add(root); Save(); Fill()
+
+        def Remove():
+            drop = {id(x) for x in Selected()}
+            reg.Sites = [x for x in reg.Sites if id(x) not in drop]
+            Save(); Fill()
+
+        def EditTail(_=None):
+            sel = Selected()
+            if not sel: return
+            from tkinter import simpledialog
+            tail = simpledialog.askstring("尾部参数", "所选站点的尾部参数（留空则用主窗口的）：",
+                                          initialvalue=sel[0].get("tail", ""), parent=win)
+            if tail is None: return
+            for x in sel: x["tail"] = tail.strip()
+            Save(); Fill()
+
+        def Run():
+            Save()
+            if self.RunSites(Selected(), reg.Parallel, win): win.destroy()
+
+        Tk.Button(bar, text="添加…", command=Add).pack(side="left")
+        Tk.Button(bar, text="移除", command=Remove).pack(side="left", padx=(6, 0))
+        Tk.Button(bar, text="尾部参数…", command=EditTail).pack(side="left", padx=(6, 0))
+        Tk.Label(bar, text="并行", font=FontMain).pack(side="left", padx=(16, 4))
+        Tk.Spinbox(bar, from_=1, to=SiteRegistry.MaxParallel(), textvariable=par, width=3, command=Save).pack(side="left")
+        Tk.Button(bar, text="运行所选", command=Run).pack(side="right")
+        sites.bind("<Double-Button-1>", EditTail)
+        Fill()
+
+    def RunSites(self, sites: list[dict], parallel: int, parent: Tk.Misc) -> bool:
+        """用主窗口勾选的组合命令在所选站点上并行运行（不含预览：端口会冲突、也不会结束）"""
+        combo = [c for c in self.BuildComboSeq() if HexoVerb(c) != "server"]
+        if not combo:
+            messagebox.showwarning("提示", "请先在主窗口勾选清理/生成/上传。", parent=parent); return False
+        sites = [x for x in sites if SiteRegistry.IsSite(x["root"])]
+        if not sites:
+            messagebox.showwarning("提示", "请先选择有效的站点。", parent=parent); return False
+        plan = []
+        for x in sites:
+            tail = x.get("tail") or self.TailVar.get().strip()
+            plan.append((x, combo[:-1] + [f"{combo[-1]} {tail}" if tail else combo[-1]]))
+        MultiSiteRun(self, plan, max(1, min(parallel, SiteRegistry.MaxParallel(), len(plan))))
+        return True
+
+    def ShowHistory(self):
+        win = Tk.Toplevel(self.Root)
+        SetupIcon(win, "Hexo.ico")
+        win.title("运行历史"); win.geometry("640x460"); win.transient(self.Root)
+        plot = Tk.Canvas(win, height=HistoryPlotH, bg="white", highlightthickness=0)
+        plot.pack(fill="x", padx=8, pady=(8, 4))
+        runs = ttk.Treeview(win, columns=("time", "title", "rc", "total", "gen", "log"), show="headings", selectmode="browse")
+        for col, text, w in (("time", "时间", 130), ("title", "任务", 170), ("rc", "结果", 60),
+                             ("total", "总耗时", 70), ("gen", "生成", 70), ("log", "日志", 90)):
+            runs.heading(col, text=text); runs.column(col, width=w, anchor="w")
+        runs.tag_configure("fail", foreground="#CD3131")
+        runs.pack(fill="both", expand=True, padx=8)
+        status = Tk.Label(win, text="", fg="#6b7280", font=("Adobe Song Std L", 9), anchor="w")
+        status.pack(fill="x", padx=8, pady=(2, 6))
+        data = {"rows": []}
+
+        def Fill(rows):
+            if not win.winfo_exists(): return
+            data["rows"] = rows
+            runs.delete(*runs.get_children())
+            for r in rows:
+                res = "已停止" if r["aborted"] else ("成功" if r["rc"] == 0 else f"rc={r['rc']}")
+                gen = f"{r['gen_secs']:.2f}s" if r["gen_secs"] is not None else ""
+                log = f"{FormatBytes(r['log_bytes'] or 0)} → {FormatBytes(r['stored'] or 0)}" if r["stored"] else ""
+                runs.insert("", "end", iid=str(r["id"]), tags=("fail",) if res not in ("成功", "已停止") else (),
+                            values=(datetime.fromtimestamp(r["started"]).strftime("%Y-%m-%d %H:%M:%S"), r["title"], res,
+                                    f"{r['ended'] - r['started']:.1f}s", gen, log))
+            status.configure(text=f"共 {len(rows)} 次运行（保留最近 {HistoryKeep} 次），双击查看日志")
+            DrawPlot()
+
+        def DrawPlot(_=None):
+            plot.delete("all")
+            pts = [r for r in reversed(data["rows"]) if r["gen_secs"] is not None][-HistoryPlotRuns:]
+            w, h, pad = max(plot.winfo_width(), 100), HistoryPlotH, 28
+            plot.create_text(8, 6, text="生成耗时趋势（秒）", anchor="nw", fill="#374151", font=("Adobe Song Std L", 9))
+            if len(pts) < 2:
+                plot.create_text(w // 2, h // 2, text="至少两次成功的生成后显示趋势", fill="#9ca3af")
+                return
+            ys = [r["gen_secs"] for r in pts]
+            top = max(ys) * 1.1 or 1
+            med = sorted(ys)[len(ys) // 2]
+            X = lambda i: pad + i * (w - 2 * pad) / (len(pts) - 1)
+            Y = lambda v: h - pad + 8 - v / top * (h - pad - 16)
+            plot.create_line(pad, Y(0), w - pad, Y(0), fill="#d1d5db")
+            plot.create_text(pad - 4, Y(top / 1.1), text=f"{top / 1.1:.1f}", anchor="e", fill="#6b7280", font=("Arial", 8))
+            plot.create_line(pad, Y(med), w - pad, Y(med), fill="#9ca3af", dash=(3, 3))
+            plot.create_text(w - pad + 2, Y(med), text=f"中位 {med:.1f}", anchor="w", fill="#6b7280", font=("Arial", 8))
+            plot.create_line(*[c for i, v in enumerate(ys) for c in (X(i), Y(v))], fill="#2472C8", width=2)
+            for i, v in enumerate(ys):
+                slow = v > med * 1.5  # 明显变慢，多半是插件或主题的问题
+                plot.create_oval(X(i) - 3, Y(v) - 3, X(i) + 3, Y(v) + 3, outline="",
+                                 fill="#CD3131" if slow else "#2472C8")
+
+        def Open(_=None):
+            sel = runs.selection()
+            if not sel: return
+            run = next(r for r in data["rows"] if str(r["id"]) == sel[0])
+            def Work():
+                try:
+                    text, err = self.History.LoadLog(run["id"]), None
+                except Exception as e:
+                    text, err = "", e
+                def Show():
+                    if err is not None:
+                        messagebox.showerror("错误", f"读取日志失败：{err}", parent=win); return
+                    log = LogStore(); log.Append(text)
+                    terminal_popup(win, f"{run['title']} - {datetime.fromtimestamp(run['started']):%Y-%m-%d %H:%M}",
+                                   log, TermCombo_W, TermCombo_H)
+                self.Root.after(0, Show)
+            threading.Thread(target=Work, daemon=True).start()
+
+        def Load():
+            try: rows = self.History.Runs()
+            except Exception: rows = []
+            self.Root.after(0, lambda: Fill(rows))
+
+        runs.bind("<Double-Button-1>", Open)
+        plot.bind("<Configure>", DrawPlot)
+        threading.Thread(target=Load, daemon=True).start()
+
+    def ShowMoreMenu(self):
+        r = self.Root
+        self.MoreMenu.tk_popup(r.winfo_rootx() + MoreBtnX, r.winfo_rooty() + BtnY + BtnH)
+
+    def StartupPhase(self, phase: str):
+        """first_paint 与文章索引都完成才算 ready，然后在后台写启动记录"""
+        self.Startup.Mark(phase)
+        if "first_paint" in self.Startup.Marks and "index" in self.Startup.Marks:
+            self.Startup.Mark("ready")
+            threading.Thread(target=self.Startup.Save, daemon=True).start()
+
+    def ShowStartup(self):
+        hist = StartupTimer.History()
+        if not hist or hist[-1].get("time") != self.Startup.Record()["time"]:
+            hist.append(self.Startup.Record())
+        phases = ("boot", "import", "ui", "first_paint", "ready")
+        rows = [f"{'时间':<20}{'类型':<9}" + "".join(f"{p:>12}" for p in phases)]
+        for r in hist[-20:]:
+            cells = "".join(f"{r[p + '_ms']:>12.0f}" if p + "_ms" in r else f"{'-':>12}" for p in phases)
+            rows.append(f"{r.get('time', ''):<20}{r.get('build', ''):<9}{cells}")
+        last = self.Startup.Record()
+        rows += ["", "单位 ms，从 Python 开始执行算起（boot 为进程创建到 Python 开始执行，需要 psutil）。",
+                 f"本次：{last['build']}，ready {last.get('ready_ms', '-')} ms"]
+        terminal_popup(self.Root, "启动耗时", "\n".join(rows) + "\n", 760, 420)
+
+    def ExportTimings(self):
+        if not self.LastTimings:
+            messagebox.showinfo("提示", "还没有运行记录。", parent=self.Root)
+            return
+        path = filedialog.asksaveasfilename(parent=self.Root, title="导出耗时", defaultextension=".json",
+                                            initialfile="hexodash-timings.json", filetypes=[("JSON", "*.json")])
+        if not path: return
+        try:
+            with open(path, "w", encoding="utf-8") as f: json.dump(self.LastTimings, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            messagebox.showerror("错误", f"导出失败：{e}", parent=self.Root)
+
+    def OnWarmChange(self):
+        if not self.WarmVar.get():
+            threading.Thread(target=self.Worker.Kill, daemon=True).start()
+
     # ------- 互斥切换 -------
     def _set_enabled(self, chk: Tk.Checkbutton, lbl: Tk.Label, enabled: bool):
         chk.configure(state="normal" if enabled else "disabled")
@@ -558,51 +4293,365 @@ class HexoDashApp:
 
     # ------- 运行按钮 -------
     def RunAll(self):
+        if not self.CheckDuplicates(): return
         new_seq   = self.BuildNewSeq()
         combo_seq = self.BuildComboSeq()
         if not new_seq and not combo_seq:
             messagebox.showwarning("提示", "请先输入要新建的名称或勾选组合操作。", parent=self.Root)
             return
 
-        def OnFinish(rc, out):
-            terminal_popup(self.Root, "完成" if rc == 0 else "错误", out, TermCombo_W, TermCombo_H)
+        def OnFinish(rc, log):
+            terminal_popup(self.Root, "完成" if rc == 0 else "错误", log, TermCombo_W, TermCombo_H)
 
-        # 仅新建
         if new_seq and not combo_seq:
-            cmd = " && ".join(self.AppendTailEach(new_seq))
+            # 仅新建：每条都带尾部参数
+            steps = self.AppendTailEach(new_seq)
             title = self._NewTitle(new_seq)
-            LiveTerm(self.Root, cmd, title, OnFinish)
-            return
+        else:
+            # 组合：仅最后一条带尾部参数
+            full  = new_seq + combo_seq
+            steps = full[:-1] + [self.AppendTail(full[-1])]
+            title = self._DisplayName(full[-1])
+        self.Jobs.Submit(steps, title, lambda job: self.Launch(job.Steps, job.Title, OnFinish))
 
-        # 组合
-        full = new_seq + combo_seq
-        is_server_last = (len(full) > 0 and full[-1].startswith("hexo server"))
+    def Launch(self, steps: list[str], title: str, on_finish) -> LiveTerm:
+        """打开实时终端，逐步运行命令链并记录每步耗时：
+           新建/清理可原生完成，开启常驻进程时 Hexo 命令交给 HexoWorker，其余每步单独起 shell"""
+        term = LiveTerm(self.Root, " && ".join(steps), title, on_finish, job=lambda term: self.RunSteps(steps, term))
+        term.OnRecord = self.History.Record
+        return term
 
-        if is_server_last:
-            head = full[:-1]
-            server_cmd = self.AppendTail(full[-1])
-            full_cmd = " && ".join(head + [server_cmd]) if head else server_cmd
-            title = self._DisplayName(full[-1])
-            LiveTerm(self.Root, full_cmd, title, OnFinish)
+    def PlanSmart(self, steps: list[str], term: LiveTerm):
+        """（后台线程）扫描改动并调整命令链：按需加/去掉 clean，无改动时跳过 generate。返回 (新命令链, 清单)"""
+        gen = [c for c in steps if HexoVerb(c) == "generate"]
+        if any(a in ("--force", "-f", "--watch", "-w") for c in gen for a in (SplitCmd(c) or [])):
+            return steps, None
+        man = SiteManifest(term.Site)
+        d = man.Check()
+        term.Emit(f"\x1b[36m[智能生成]\x1b[0m {d['reason']}（扫描 {d['count']} 个文件，{d['secs'] * 1000:.0f} ms）\n")
+        for r in d["files"][:ManifestShowFiles]:
+            term.Emit(f"\x1b[90m    {r}\x1b[0m\n")
+        if len(d["files"]) > ManifestShowFiles:
+            term.Emit(f"\x1b[90m    …另有 {len(d['files']) - ManifestShowFiles} 个\x1b[0m\n")
+        has_clean = any(HexoVerb(c) == "clean" for c in steps)
+        if d["action"] == "clean" and not has_clean:
+            i = steps.index(gen[0])
+            steps = steps[:i] + ["hexo clean"] + steps[i:]
+        elif d["action"] != "clean" and has_clean:
+            steps = [c for c in steps if HexoVerb(c) != "clean"]
+        if d["action"] == "skip":
+            steps = [c for c in steps if HexoVerb(c) != "generate"]
+        return steps, man
+
+    def SplitForPost(self, steps: list[str]) -> list[str]:
+        """有生成后处理时，把 generate --deploy / deploy --generate 拆成两步，处理插在生成与上传之间"""
+        if not self.PostStages(BaseDir): return steps
+        out = []
+        for cmd in steps:
+            argv, verb = SplitCmd(cmd) or [], HexoVerb(cmd)
+            flags = ("-d", "--deploy") if verb == "generate" else ("-g", "--generate") if verb == "deploy" else ()
+            if not any(a in flags for a in argv):
+                out.append(cmd); continue
+            rest = [a for a in argv[2:] if a not in flags]
+            quote = subprocess.list2cmdline if os.name == "nt" else (lambda a: " ".join(map(shlex.quote, a)))
+            gen, dep = ["hexo", "generate"], ["hexo", "deploy"]
+            (gen if verb == "generate" else dep).extend(rest)
+            out += [quote(gen), quote(dep)]
+        return out
+
+    def RunSteps(self, steps: list[str], term: LiveTerm) -> int:
+        """（后台线程）逐条执行，遇到非 0 退出码即停止，语义同 &&；结束后输出并保存逐步耗时"""
+        steps = self.SplitForPost(steps)
+        term.Timeline = tl = StepTimeline(steps)
+        rc = 1
+        try:
+            rc = self.RunSmart(steps, term)
+            return rc
+        finally:
+            data = tl.ToDict(); data["rc"] = rc if not term.Aborted else None
+            self.LastTimings = data
+            term.Emit(tl.Summary())
+            try:
+                with open(StatePath(term.Site, "timings.jsonl"), "a", encoding="utf-8") as f:
+                    f.write(json.dumps(data, ensure_ascii=False) + "\n")
+            except OSError:
+                pass
+
+    def RunSmart(self, steps: list[str], term: LiveTerm) -> int:
+        if not (self.SmartGenVar.get() and any(HexoVerb(c) == "generate" for c in steps)):
+            return self.RunChain(steps, term)
+        # 智能生成：先跑完新建等前置步骤，到 clean/generate 时再扫描，新建的文章也算进改动
+        i = next(i for i, c in enumerate(steps) if HexoVerb(c) in ("clean", "generate"))
+        rc = self.RunChain(steps[:i], term)
+        if rc != 0 or term.Aborted: return rc
+        rest, man = self.PlanSmart(steps[i:], term)
+        rc = self.RunChain(rest, term)
+        if rc == 0 and man is not None:
+            try: man.Commit()
+            except OSError as e: term.Emit(f"\x1b[33m[智能生成] 保存清单失败：{e}\x1b[0m\n")
+        return rc
+
+    def RunChain(self, steps: list[str], term: LiveTerm) -> int:
+        rc, maker = 0, None
+        for cmd in steps:
+            if term.Aborted: return 130
+            if len(term.Timeline.Cmds) > 1:
+                term.Emit(f"\x1b[90m$ {cmd}\x1b[0m\n")
+            step = term.Timeline.Begin(cmd)
+            if HexoVerb(cmd) == "server" and term.QueueJob is not None:
+                self.Jobs.Release(term.QueueJob)  # 预览不再改动站点，后面排队的生成可以开始
+            term.StepKind, term.ProcUsage = "native", None
+            rc = None
+            if self.NativeCleanVar.get() and cmd.strip().lower() == "hexo clean":
+                try:
+                    rc = NativeClean(term.Site, term.Emit, term.Note)
+                except NativeUnsupported as e:
+                    term.Emit(f"\x1b[90m[原生清理] {e}，改用 hexo clean\x1b[0m\n")
+                except OSError as e:
+                    term.Emit(f"\x1b[31m[原生清理] 失败：{e}\x1b[0m\n")
+                    rc = 1
+            elif self.NativeNewVar.get() and cmd.lower().startswith("hexo new"):
+                try:
+                    maker = maker or PostMaker(term.Site)  # 同一条链只读一次配置
+                    rc = NativeNew(cmd, term.Emit, maker)
+                except NativeUnsupported as e:
+                    term.Emit(f"\x1b[90m[原生新建] 不支持（{e}），改用 hexo new\x1b[0m\n")
+                except OSError as e:
+                    term.Emit(f"\x1b[31m[原生新建] 写入失败：{e}\x1b[0m\n")
+                    rc = 1
+            elif self.DeployCheckVar.get() and HexoVerb(cmd) == "deploy":
+                rc = self.RunDeployChecked(cmd, term)
+            elif self.NativeServeVar.get() and HexoVerb(cmd) == "server":
+                rc = self.RunPreview(cmd, term)
+            elif self.NativeWatchVar.get() and HexoVerb(cmd) == "generate" and \
+                    any(a in ("-w", "--watch") for a in (SplitCmd(cmd) or [])):
+                rc = self.RunWatch(cmd, term)
+            elif self.ProfileVar.get() and HexoVerb(cmd) == "generate" and \
+                    not any(a in ("-w", "--watch") for a in (SplitCmd(cmd) or [])):
+                rc = self.RunProfiled(cmd, term)
+            if rc is None:
+                rc = self.RunHexoStep(cmd, term)
+            term.Timeline.End(step, rc, term.StepKind, term.ProcUsage)
+            if rc != 0: return rc
+            if HexoVerb(cmd) == "generate":
+                rc = self.RunPostGenerate(term)
+                if rc != 0: return rc
+        return rc
+
+    def PostStages(self, site: str) -> list:
+        """生成成功后依次执行的处理：[(名称, fn(emit) -> 统计)]"""
+        stages = []
+        if self.MinifyVar.get(): stages.append(("压缩代码", lambda emit: Minifier(site).Run(emit)))
+        if self.SearchIndexVar.get(): stages.append(("搜索索引", lambda emit: SearchIndexer(site).Run(emit)))
+        if self.PrecompressVar.get(): stages.append(("预压缩", lambda emit: Precompressor(site).Run(emit)))
+        return stages
+
+    def RunPostGenerate(self, term: LiveTerm) -> int:
+        """（后台线程）生成后处理，每项作为时间线上的一步"""
+        for name, fn in self.PostStages(term.Site):
+            if term.Aborted: return 130
+            step = term.Timeline.Begin(name)
+            term.StepKind, term.ProcUsage = "native", None
+            try:
+                fn(term.Emit); rc = 0
+            except Exception as e:
+                term.Emit(f"\x1b[31m[{name}] 失败：{e}\x1b[0m\n"); rc = 1
+            term.Timeline.End(step, rc, "native")
+            if rc != 0: return rc
+        return 0
+
+    def RunProfiled(self, cmd: str, term: LiveTerm) -> int:
+        """（后台线程）加上 --debug 用 shell 运行 generate（常驻进程里拿不到调试日志），边输出边解析，结束后弹出耗时表"""
+        if "--debug" not in (SplitCmd(cmd) or []): cmd += " --debug"
+        prof = DebugProfiler()
+        term.Tap = prof.Feed
+        try:
+            rc = term.RunProc(cmd)
+        finally:
+            term.Tap = None
+            prof.Feed("\n")
+        report = prof.Report()
+        if not report["items"]:
+            term.Emit("\x1b[33m[性能分析] 没有解析到 --debug 输出\x1b[0m\n")
+            return rc
+        report.update(cmd=cmd, site=term.Site, rc=rc, time=datetime.now().isoformat(timespec="seconds"))
+        self.LastProfile = report
+        phases = "，".join(f"{x['name']} {x['ms']:.0f}ms" for x in report["phases"])
+        term.Emit(f"\x1b[36m[性能分析]\x1b[0m 共 {report['total_ms']:.0f} ms：{phases}\n")
+        for x in sorted((x for x in report["items"] if x["kind"] in ("source", "render", "plugin")),
+                        key=lambda x: -x["ms"])[:5]:
+            term.Emit(f"\x1b[90m    {ProfileKinds[x['kind']]} {x['ms']:>6.0f} ms  {x['name']}\x1b[0m\n")
+        try: self.Root.after(0, lambda: self.ShowProfile(report))
+        except Exception: pass
+        return rc
+
+    def ShowProfile(self, report: dict):
+        if not report:
+            messagebox.showinfo("提示", "还没有性能分析记录：在“⋯”菜单勾选“生成性能分析”后运行生成。", parent=self.Root)
             return
+        win = Tk.Toplevel(self.Root)
+        SetupIcon(win, "Hexo.ico")
+        win.title(f"生成性能分析 - {report.get('time', '')}"); win.geometry("620x420"); win.transient(self.Root)
+        top = Tk.Frame(win); top.pack(fill="x", padx=8, pady=(8, 4))
+        kinds = ["全部"] + list(ProfileKinds.values())
+        kind = Tk.StringVar(win, "全部")
+        Tk.Label(top, text="类别", font=FontMain).pack(side="left")
+        ttk.Combobox(top, textvariable=kind, values=kinds, state="readonly", width=8).pack(side="left", padx=(6, 0))
+        Tk.Button(top, text="导出 Chrome trace…", command=lambda: Export(True)).pack(side="right")
+        Tk.Button(top, text="导出 JSON…", command=lambda: Export(False)).pack(side="right", padx=(0, 6))
+        table = ttk.Treeview(win, columns=("kind", "name", "ms", "share", "count"), show="headings", selectmode="browse")
+        for col, text, w, anchor in (("kind", "类别", 70, "w"), ("name", "名称", 300, "w"), ("ms", "耗时 ms", 80, "e"),
+                                     ("share", "占比", 60, "e"), ("count", "数量", 50, "e")):
+            table.heading(col, text=text, command=lambda c=col: Sort(c)); table.column(col, width=w, anchor=anchor)
+        table.pack(fill="both", expand=True, padx=8)
+        total = report["total_ms"] or 1
+        Tk.Label(win, text=f"{report.get('cmd', '')}  共 {report['total_ms']:.0f} ms（单项耗时按相邻日志时间戳估算）",
+                 fg="#6b7280", font=("Adobe Song Std L", 9), anchor="w").pack(fill="x", padx=8, pady=(2, 6))
+        order = {"col": "ms", "desc": True}
+        names = {v: k for k, v in ProfileKinds.items()}
+
+        def Fill(*_):
+            rows = [x for x in report["items"] if kind.get() == "全部" or x["kind"] == names[kind.get()]]
+            key = {"kind": lambda x: x["kind"], "name": lambda x: x["name"], "ms": lambda x: x["ms"],
+                   "share": lambda x: x["ms"], "count": lambda x: x["count"]}[order["col"]]
+            rows.sort(key=key, reverse=order["desc"])
+            table.delete(*table.get_children())
+            for x in rows[:ProfileMaxRows]:
+                table.insert("", "end", values=(ProfileKinds[x["kind"]], x["name"], f"{x['ms']:.0f}",
+                                                f"{x['ms'] * 100 / total:.1f}%", x["count"]))
 
-        if len(full) == 1:
-            cmd = self.AppendTail(full[0])
+        def Sort(col):
+            order["desc"] = not order["desc"] if order["col"] == col else col in ("ms", "share", "count")
+            order["col"] = col
+            Fill()
+
+        def Export(trace: bool):
+            path = filedialog.asksaveasfilename(parent=win, title="导出性能分析", defaultextension=".json",
+                                                initialfile="hexo-trace.json" if trace else "hexo-profile.json",
+                                                filetypes=[("JSON", "*.json")])
+            if not path: return
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(DebugProfiler.ChromeTrace(report) if trace else report, f, ensure_ascii=False,
+                              indent=None if trace else 2)
+            except OSError as e:
+                messagebox.showerror("错误", f"导出失败：{e}", parent=win)
+
+        kind.trace_add("write", Fill)
+        Fill()
+
+    def RunDeployChecked(self, cmd: str, term: LiveTerm) -> int:
+        """（后台线程）先比对 public/ 与上次上传的清单，无变化则跳过 hexo deploy"""
+        if any(a in ("-g", "--generate") for a in (SplitCmd(cmd) or [])):
+            return self.RunHexoStep(cmd, term)  # 上传前还要生成，现在比对没有意义
+        chk = DeployCheck(term.Site)
+        try:
+            d = chk.Check()
+        except OSError as e:
+            term.Emit(f"\x1b[33m[上传检查] 失败：{e}，直接上传\x1b[0m\n")
+            return self.RunHexoStep(cmd, term)
+        if d["first"]:
+            term.Emit(f"\x1b[36m[上传检查]\x1b[0m 首次检查，{d['count']} 个文件（{d['secs'] * 1000:.0f} ms）\n")
         else:
-            cmd = " && ".join(full[:-1] + [self.AppendTail(full[-1])])
-        title = self._DisplayName(full[-1])
-        LiveTerm(self.Root, cmd, title, OnFinish)
+            term.Emit(f"\x1b[36m[上传检查]\x1b[0m 新增 {len(d['added'])}，修改 {len(d['changed'])}，"
+                      f"删除 {len(d['removed'])}（共 {d['count']} 个文件，{d['secs'] * 1000:.0f} ms）\n")
+            for tag, key in (("+", "added"), ("~", "changed"), ("-", "removed")):
+                for r in d[key][:ManifestShowFiles]:
+                    term.Emit(f"\x1b[90m    {tag} {r}\x1b[0m\n")
+            if not (d["added"] or d["changed"] or d["removed"]):
+                term.Emit("\x1b[36m[上传检查]\x1b[0m 与上次上传相同，跳过 hexo deploy\n")
+                return 0
+        rc = self.RunHexoStep(cmd, term)
+        if rc == 0:
+            try: chk.Commit()
+            except OSError as e: term.Emit(f"\x1b[33m[上传检查] 保存清单失败：{e}\x1b[0m\n")
+        return rc
+
+    def RunWatch(self, cmd: str, term: LiveTerm) -> int:
+        """（后台线程）先生成一次，然后用 FileWatcher 监听，每批安静下来的改动触发一次 hexo generate，直到点“停止”。
+           开启常驻进程时每次都是增量生成，不必重新加载 Hexo。"""
+        argv, debounce, i = SplitCmd(cmd), WatchDebounceMs, 0
+        keep = []
+        while i < len(argv):
+            a = argv[i]
+            if a in ("-w", "--watch"): pass
+            elif a == "--debounce" and i + 1 < len(argv) and argv[i + 1].isdigit(): debounce = int(argv[i + 1]); i += 1
+            elif a.startswith("--debounce=") and a[11:].isdigit(): debounce = int(a[11:])
+            else: keep.append(a)
+            i += 1
+        quote = subprocess.list2cmdline if os.name == "nt" else (lambda a: " ".join(map(shlex.quote, a)))
+        gen = quote(keep)
+        rc = self.RunHexoStep(gen, term)
+        if term.Aborted: return 130
+        watcher = FileWatcher(term.Site, debounce)
+        mode = "inotify" if watcher.Mode == "inotify" else f"轮询 {WatchPollSec:g}s" + (f"（{watcher.Why}）" if watcher.Why else "")
+        term.Emit(f"\x1b[36m[监听]\x1b[0m {', '.join(watcher.Dirs)} 与配置文件（{mode}，防抖 {debounce} ms），等待改动…\n")
+        n = 0
+        try:
+            while True:
+                term.OnStop = watcher.Close
+                batch = watcher.Next(lambda: term.Aborted)
+                if batch is None: break
+                n += 1
+                files = sorted(batch)
+                what = "事件过多，无法逐个列出" if "*" in batch else f"{len(files)} 个文件"
+                term.Emit(f"\n\x1b[36m[监听]\x1b[0m 第 {n} 次：{what}改动\n")
+                for r in [f for f in files if f != "*"][:ManifestShowFiles]:
+                    term.Emit(f"\x1b[90m    {r}\x1b[0m\n")
+                if len(files) > ManifestShowFiles:
+                    term.Emit(f"\x1b[90m    …另有 {len(files) - ManifestShowFiles} 个\x1b[0m\n")
+                t = time.perf_counter()
+                rc = self.RunHexoStep(gen, term)
+                if term.Aborted: break
+                secs = time.perf_counter() - t
+                state = "完成" if rc == 0 else f"\x1b[31m失败（rc={rc}）\x1b[0m"
+                term.Emit(f"\x1b[36m[监听]\x1b[0m 第 {n} 次重新生成{state}，用时 {secs:.2f}s，继续等待改动…\n")
+                term.Note(f"监听中：已重新生成 {n} 次，上次 {secs:.2f}s")
+        finally:
+            term.OnStop = None
+            watcher.CloseFd()
+        return 130 if term.Aborted else rc
+
+    def RunPreview(self, cmd: str, term: LiveTerm):
+        """（后台线程）用 PreviewServer 托管 public/，直到点“停止”；处理不了时返回 None 交给 hexo server"""
+        try:
+            srv = PreviewServer(term.Site, cmd)
+        except NativeUnsupported as e:
+            term.Emit(f"\x1b[90m[原生预览] 不支持（{e}），改用 hexo server\x1b[0m\n")
+            return None
+        except OSError as e:
+            term.Emit(f"\x1b[31m[原生预览] 无法监听：{e}\x1b[0m\n")
+            return 1
+        term.OnStop = srv.Shutdown
+        try: srv.Run(term.Emit, term.Note, lambda: term.Aborted)
+        finally: term.OnStop = None
+        return 130 if term.Aborted else 0
+
+    def RunHexoStep(self, cmd: str, term: LiveTerm) -> int:
+        """（后台线程）运行一条 hexo 命令：开启常驻进程且支持时交给 HexoWorker，否则走 shell"""
+        argv = WorkerArgv(cmd) if self.WarmVar.get() and term.Site == BaseDir else None  # 常驻进程只服务本站
+        if argv is not None:
+            term.OnStop, term.StepKind = self.Worker.Kill, "worker"
+            try: rc = self.Worker.Run(argv, term.Emit)
+            finally: term.OnStop = None
+            if rc is not None: return rc
+            term.Emit("\x1b[33m[常驻进程] 未能加载 Hexo，改用命令行运行\x1b[0m\n")
+        return term.RunProc(cmd)
 
     def InstallHexo(self):
         chain = "npm install hexo-cli -g && hexo init blog && cd blog && npm install"
-        def OnFinish(rc, out):
-            terminal_popup(self.Root, "完成" if rc == 0 else "错误", out, TermCombo_W, TermCombo_H)
-        LiveTerm(self.Root, chain, "安装 Hexo", OnFinish)
+        def OnFinish(rc, log):
+            terminal_popup(self.Root, "完成" if rc == 0 else "错误", log, TermCombo_W, TermCombo_H)
+        LiveTerm(self.Root, chain, "安装 Hexo", OnFinish).OnRecord = self.History.Record
 
 # 入口
 def Main():
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()  # 打包后预压缩等进程池需要
+    timer = StartupTimer()
     root = Tk.Tk()
-    app  = HexoDashApp(root)
+    app  = HexoDashApp(root, timer)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -1,11 +1,17 @@
 # -*- mode: python ; coding: utf-8 -*-
+# 默认打成单文件 exe；设置环境变量 HEXODASH_BUILD=onedir 打成目录版（dist/HexoDash/），
+# 启动时不用每次把整个程序解包到临时目录，冷启动更快：
+#     set HEXODASH_BUILD=onedir && pyinstaller HexoDash.spec
+import os
+
+OneDir = os.environ.get("HEXODASH_BUILD", "").strip().lower() == "onedir"
 
 
 a = Analysis(
     ['HexoDash.py'],
     pathex=[],
     binaries=[],
-    datas=[('Hexo.ico', '.')],
+    datas=[('Hexo.ico', '.'), ('HexoWorker.js', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -19,9 +25,9 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
+    *([] if OneDir else [a.binaries, a.datas]),
     [],
+    exclude_binaries=OneDir,
     name='HexoDash',
     debug=False,
     bootloader_ignore_signals=False,
@@ -38,3 +44,14 @@ exe = EXE(
     icon=['Hexo.ico'],
     version='Version.txt',  
 )
+
+if OneDir:
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,  # 目录版不压缩 dll，省去加载时解压
+        upx_exclude=[],
+        name='HexoDash',
+    )
@@ -0,0 +1,81 @@
+// HexoDash 常驻 Hexo 进程
+// 在站点目录下启动：只加载一次 Hexo 与插件，然后逐行读取 stdin 的 JSON 任务 {"id": n, "argv": [...]}，
+// 用 hexo.call 执行；普通输出直接写 stdout，控制行以 \x1e 开头：
+//   \x1e{"ready":true}          Hexo 加载完成
+//   \x1e{"id":n,"rc":0}          任务 n 结束
+// clean 会删掉 db.json，内存里的缓存随之失效，所以 clean 之后本进程退出，由 HexoDash 按需重启。
+'use strict';
+
+const readline = require('readline');
+
+const cwd = process.cwd();
+const MARK = '\x1e';
+
+function load(name) {
+  return require(require.resolve(name, { paths: [cwd, __dirname] }));
+}
+
+// 与 hexo-cli 相同的参数解析（找不到 minimist 时用简化版）
+function parseArgs(argv) {
+  try {
+    return load('minimist')(argv, { string: ['_', 'p', 'path', 's', 'slug'] });
+  } catch (e) {
+    const args = { _: [] };
+    for (let i = 0; i < argv.length; i++) {
+      const a = argv[i];
+      const m = /^--?(no-)?([^=]+)(?:=(.*))?$/.exec(a);
+      if (!m || a === '-' || a === '--') { args._.push(a); continue; }
+      if (m[1]) { args[m[2]] = false; continue; }
+      if (m[3] !== undefined) { args[m[2]] = m[3]; continue; }
+      const next = argv[i + 1];
+      if (next !== undefined && !next.startsWith('-')) { args[m[2]] = next; i++; } else { args[m[2]] = true; }
+    }
+    return args;
+  }
+}
+
+function control(msg) {
+  process.stdout.write(MARK + JSON.stringify(msg) + '\n');
+}
+
+let Hexo;
+try {
+  Hexo = load('hexo');
+} catch (e) {
+  console.error('[HexoWorker] 当前目录找不到 hexo：' + e.message);
+  process.exit(2);
+}
+
+const opts = parseArgs(process.argv.slice(2));
+delete opts._;
+const hexo = new Hexo(cwd, opts);
+
+let chain = Promise.resolve();
+
+function runJob(job) {
+  const args = parseArgs(job.argv || []);
+  const cmd = args._.shift();
+  return hexo.call(cmd, args).then(() => 0, err => {
+    hexo.log.error(err);
+    return 1;
+  }).then(rc => {
+    control({ id: job.id, rc });
+    if (cmd === 'clean') return hexo.exit().then(() => process.exit(rc));
+  });
+}
+
+hexo.init().then(() => {
+  control({ ready: true });
+  const rl = readline.createInterface({ input: process.stdin });
+  rl.on('line', line => {
+    let job;
+    try { job = JSON.parse(line); } catch (e) { return; }
+    chain = chain.then(() => runJob(job));
+  });
+  rl.on('close', () => {
+    chain.then(() => hexo.exit()).then(() => process.exit(0));
+  });
+}).catch(err => {
+  console.error(err);
+  process.exit(1);
+});
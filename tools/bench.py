@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+HexoDash 终端管线基准：用 tools/fake_hexo.py 产生可复现的输出，驱动 LiveTerm / insert_ansi / 解码器，
+结果写成 JSON，方便跨版本对比。
+    python tools/bench.py --out bench.json
+    python tools/bench.py --scenarios plain,gbk --lines 50000
+
+Linux 无显示时会自动启动 Xvfb（也可以自己 xvfb-run）；没有可用显示时只跑不需要 Tk 的微基准。
+
+指标：
+  throughput_lps / throughput_mbps   从打开 LiveTerm 到 OnFinish 的端到端吞吐
+  first_output_ms                    打开 LiveTerm 到第一段输出渲染出来
+  stall_max_ms / stall_p99_ms        UI 线程心跳（after(1)）之间的最大 / p99 间隔
+  peak_rss_mb                        运行期间本进程的峰值 RSS
+"""
+
+import os, sys, time, json, shutil, platform, argparse, subprocess
+
+Here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(Here))
+sys.path.insert(0, Here)
+
+import HexoDash as H
+import fake_hexo
+
+HeartbeatMs = 1
+
+Scenarios = {
+    "plain":    ["--ansi", "0", "--cjk", "0"],
+    "ansi":     ["--ansi", "0.8"],
+    "gbk":      ["--encoding", "gbk", "--cjk", "0.8"],
+    "progress": ["--progress", "2000", "--lines", "1000"],
+    "burst":    ["--burst", "5000", "--rate", "20"],
+    "trickle":  ["--burst", "1", "--rate", "2000", "--lines", "5000"],
+}
+
+# =============== 工具 ===============
+def Rss() -> float:
+    """当前 RSS（MB）；拿不到时返回峰值 RSS 或 0"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except Exception:
+        pass
+    try:
+        import psutil  # 可选依赖
+        return psutil.Process().memory_info().rss / 2**20
+    except Exception:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except Exception:
+        return 0.0
+
+def Pct(xs: list, p: float) -> float:
+    if not xs: return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+def StartXvfb():
+    """Linux 下没有 DISPLAY 时尝试启动 Xvfb，返回进程（无需时返回 None）"""
+    if not sys.platform.startswith("linux") or os.environ.get("DISPLAY"): return None
+    exe = shutil.which("Xvfb")
+    if not exe: return None
+    disp = ":%d" % (90 + os.getpid() % 100)
+    proc = subprocess.Popen([exe, disp, "-screen", "0", "1280x800x24", "-nolisten", "tcp"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ["DISPLAY"] = disp
+    time.sleep(0.5)
+    return proc
+
+class NullText:
+    """微基准里代替 Text：只测解析，不测 Tk 插入"""
+    def tag_config(self, *a, **k): pass
+
+# =============== 微基准（不需要 Tk） ===============
+def Sample(extra: list[str], lines: int) -> tuple[str, bytes, str]:
+    args = fake_hexo.ParseArgs(["--lines", str(lines)] + extra)
+    text = "".join(fake_hexo.Workload(args))
+    return text, text.encode(args.encoding, "replace"), args.encoding
+
+def MicroDecode(lines: int) -> dict:
+    out = {}
+    for enc_args in (["--encoding", "utf-8"], ["--encoding", "gbk", "--cjk", "0.8"]):
+        _, data, enc = Sample(enc_args, lines)
+        mb = len(data) / 2**20
+        t = time.perf_counter()
+        for ln in data.splitlines(keepends=True): H._decode_best(ln)
+        best = time.perf_counter() - t
+        t = time.perf_counter()
+        dec = H.StreamDecoder()
+        for i in range(0, len(data), H.ReadChunkBytes): dec.Decode(data[i:i + H.ReadChunkBytes])
+        dec.Decode(b"", final=True)
+        stream = time.perf_counter() - t
+        out[enc] = {"mb": round(mb, 2), "decode_best_mbps": round(mb / best, 1),
+                    "stream_decoder_mbps": round(mb / stream, 1)}
+    return out
+
+def MicroAnsi(lines: int, txt=None) -> dict:
+    text, _, _ = Sample(["--ansi", "0.8"], lines)
+    mb = len(text.encode("utf-8")) / 2**20
+    parser = H.AnsiParser(txt or NullText())
+    t = time.perf_counter()
+    runs = 0
+    for i in range(0, len(text), 65536): runs += len(parser.Feed(text[i:i + 65536]))
+    out = {"mb": round(mb, 2), "parse_mbps": round(mb / (time.perf_counter() - t), 1), "runs": runs}
+    if txt is not None:
+        t = time.perf_counter()
+        parser = H.AnsiParser(txt)
+        for i in range(0, len(text), 65536): H.insert_ansi(txt, text[i:i + 65536], parser)
+        txt.update_idletasks()
+        out["insert_mbps"] = round(mb / (time.perf_counter() - t), 1)
+    return out
+
+# =============== LiveTerm 端到端 ===============
+def RunTerm(root, name: str, extra: list[str], lines: int) -> dict:
+    """场景参数放在 --lines 之后，场景里自带的 --lines 会覆盖默认值"""
+    script = os.path.join(Here, "fake_hexo.py")
+    cmd = " ".join([f'"{sys.executable}"', f'"{script}"', "--lines", str(lines)] + extra)
+    res, gaps = {}, []
+    t0 = time.perf_counter()
+    state = {"last": t0, "first": None, "rss": Rss(), "done": False}
+
+    def OnFinish(rc, log):
+        res.update(rc=rc, secs=time.perf_counter() - t0, bytes=log.Size, lines=log.LineCount())
+        log.Close()
+        state["done"] = True
+        root.quit()
+
+    term = H.LiveTerm(root, cmd, f"bench {name}", OnFinish)
+
+    def Beat():
+        now = time.perf_counter()
+        gaps.append((now - state["last"]) * 1000)
+        state["last"] = now
+        if state["first"] is None and term.Stats["chars"] > 0:
+            state["first"] = (now - t0) * 1000
+        if len(gaps) % 50 == 0: state["rss"] = max(state["rss"], Rss())
+        if not state["done"]: root.after(HeartbeatMs, Beat)
+    root.after(HeartbeatMs, Beat)
+    root.mainloop()
+
+    secs = res.get("secs") or 1e-9
+    return {
+        "rc": res.get("rc"),
+        "secs": round(secs, 3),
+        "lines": res.get("lines"),
+        "throughput_lps": round((res.get("lines") or 0) / secs),
+        "throughput_mbps": round((res.get("bytes") or 0) / 2**20 / secs, 2),
+        "first_output_ms": round(state["first"], 1) if state["first"] is not None else None,
+        "stall_max_ms": round(max(gaps, default=0), 1),
+        "stall_p99_ms": round(Pct(gaps, 0.99), 1),
+        "peak_rss_mb": round(max(state["rss"], Rss()), 1),
+        "frames": term.Stats["frames"],
+        "peak_pending": term.Stats["peak_pending"],
+    }
+
+def Main():
+    ap = argparse.ArgumentParser(description="HexoDash terminal pipeline benchmark")
+    ap.add_argument("--scenarios", default=",".join(Scenarios))
+    ap.add_argument("--lines", type=int, default=50000)
+    ap.add_argument("--out", default="-", help="JSON 输出文件，- 为标准输出")
+    args = ap.parse_args()
+
+    report = {
+        "version": H.AppVersion, "python": platform.python_version(), "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"), "lines": args.lines,
+        "micro": {"decode": MicroDecode(args.lines), "ansi": MicroAnsi(args.lines)},
+        "scenarios": {},
+    }
+
+    xvfb = StartXvfb()
+    try:
+        try:
+            root = H.Tk.Tk()
+        except H.Tk.TclError as e:
+            report["scenarios"] = {"error": f"无可用显示，跳过 Tk 部分：{e}"}
+            root = None
+        if root is not None:
+            root.withdraw()
+            txt = H.Tk.Text(root); H.setup_ansi_tags(txt)
+            report["micro"]["ansi"] = MicroAnsi(args.lines, txt)
+            txt.destroy()
+            for name in args.scenarios.split(","):
+                name = name.strip()
+                if name not in Scenarios: continue
+                report["scenarios"][name] = RunTerm(root, name, Scenarios[name], args.lines)
+            root.destroy()
+    finally:
+        if xvfb is not None: xvfb.terminate()
+
+    data = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out == "-":
+        print(data)
+    else:
+        with open(args.out, "w", encoding="utf-8") as f: f.write(data + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(Main())
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+假的 hexo：按参数输出可复现的负载，用于 tools/bench.py 测 HexoDash 自身终端管线的开销。
+    python tools/fake_hexo.py --lines 100000 --ansi 0.5 --encoding gbk --progress 200 --burst 500 --rate 0
+
+--lines      输出行数（仿 Hexo 的 "INFO  Generated: ..."）
+--ansi       带颜色码的行占比 0~1（含少量 256色/真彩色）
+--cjk        含中文的行占比 0~1
+--encoding   输出编码 utf-8 / gbk
+--progress   开头输出多少次无换行的 \r 进度条
+--burst      每次写出的行数
+--rate       每秒写出多少批（0 表示不限速）
+--startup    输出前先等待的秒数（模拟 Node 冷启动）
+--seed       随机种子，同参数同输出
+"""
+
+import sys, time, random, argparse
+
+Colors = ("\x1b[32m", "\x1b[33m", "\x1b[36m", "\x1b[90m", "\x1b[1;31m", "\x1b[38;5;208m", "\x1b[38;2;120;200;80m")
+Words  = ("posts", "tags", "categories", "archives", "page", "2025", "hexo", "theme", "about", "search")
+Cjk    = ("文章", "标签", "分类", "归档", "静水深流", "部署", "生成")
+
+def ParseArgs(argv=None):
+    ap = argparse.ArgumentParser(description="fake hexo workload")
+    ap.add_argument("--lines", type=int, default=10000)
+    ap.add_argument("--ansi", type=float, default=0.5)
+    ap.add_argument("--cjk", type=float, default=0.2)
+    ap.add_argument("--encoding", default="utf-8", choices=("utf-8", "gbk"))
+    ap.add_argument("--progress", type=int, default=0)
+    ap.add_argument("--burst", type=int, default=200)
+    ap.add_argument("--rate", type=float, default=0)
+    ap.add_argument("--startup", type=float, default=0)
+    ap.add_argument("--seed", type=int, default=1)
+    return ap.parse_args(argv)
+
+def Line(rnd: random.Random, i: int, ansi: float, cjk: float) -> str:
+    path = "/".join(rnd.choice(Words) for _ in range(rnd.randint(1, 3)))
+    if rnd.random() < cjk:
+        path += "/" + rnd.choice(Cjk)
+    if rnd.random() < ansi:
+        return f"{rnd.choice(Colors)}INFO\x1b[39m  Generated: \x1b[35m{path}/{i}/index.html\x1b[0m\n"
+    return f"INFO  Generated: {path}/{i}/index.html\n"
+
+def Workload(args):
+    """逐批产出文本块（str），bench.py 也用它生成微基准的样本"""
+    rnd = random.Random(args.seed)
+    for k in range(args.progress):
+        pct = (k + 1) * 100 // args.progress
+        yield f"\r[{'#' * (pct // 5):<20}] {pct:3d}% 安装依赖"
+    if args.progress:
+        yield "\n"
+    batch = []
+    for i in range(args.lines):
+        batch.append(Line(rnd, i, args.ansi, args.cjk))
+        if len(batch) >= args.burst:
+            yield "".join(batch); batch = []
+    if batch:
+        yield "".join(batch)
+
+def Main():
+    args = ParseArgs()
+    if args.startup: time.sleep(args.startup)
+    out = sys.stdout.buffer
+    gap = 1.0 / args.rate if args.rate > 0 else 0
+    for chunk in Workload(args):
+        out.write(chunk.encode(args.encoding, "replace")); out.flush()
+        if gap: time.sleep(gap)
+    return 0
+
+if __name__ == "__main__":
+    try: sys.exit(Main())
+    except (KeyboardInterrupt, BrokenPipeError): sys.exit(130)
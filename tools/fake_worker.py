@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+HexoWorker.js 的本地替身：说同样的 stdin/stdout 行协议，不需要 Node 与 Hexo。
+用法（在 HexoDash 所在目录）：
+    HEXODASH_WORKER="python tools/fake_worker.py" python HexoDash.py
+
+启动时模拟加载耗时，之后每个任务输出几行 Hexo 风格日志；
+argv 里带 --fail 时任务返回 1，clean 之后进程退出（与真实 worker 一致）。
+"""
+
+import sys, json, time
+
+MARK = "\x1e"
+BootDelay = 1.5     # 模拟 Node + Hexo + 插件加载耗时（秒）
+StepDelay = 0.05    # 每行输出间隔（秒）
+
+def Control(msg: dict):
+    sys.stdout.write(MARK + json.dumps(msg) + "\n")
+    sys.stdout.flush()
+
+def Log(s: str):
+    sys.stdout.write(s + "\n")
+    sys.stdout.flush()
+    time.sleep(StepDelay)
+
+def Main():
+    Log(f"\x1b[90m[fake-worker] 全局参数: {sys.argv[1:]}\x1b[0m")
+    time.sleep(BootDelay)
+    Control({"ready": True})
+    for line in sys.stdin:
+        try: job = json.loads(line)
+        except ValueError: continue
+        argv = job.get("argv") or [""]
+        cmd = argv[0]
+        Log(f"\x1b[32mINFO\x1b[39m  [fake-worker] {cmd} {' '.join(argv[1:])}")
+        if cmd == "generate":
+            for i in range(5): Log(f"\x1b[32mINFO\x1b[39m  Generated: post-{i}/index.html")
+        elif cmd == "new":
+            Log(f"\x1b[32mINFO\x1b[39m  Created: source/_posts/{argv[-1]}.md")
+        elif cmd == "clean":
+            Log("\x1b[32mINFO\x1b[39m  Deleted database.")
+        rc = 1 if "--fail" in argv else 0
+        Control({"id": job.get("id"), "rc": rc})
+        if cmd == "clean": return rc
+    return 0
+
+if __name__ == "__main__":
+    try: sys.exit(Main())
+    except KeyboardInterrupt: sys.exit(130)